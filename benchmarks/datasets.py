@@ -0,0 +1,156 @@
+'''
+Generate synthetic gold/compare netCDF pairs for benchmarking. Everything is
+produced offline from a seeded random generator so runs are repeatable.
+'''
+
+from os.path import join
+import os
+
+from netCDF4 import Dataset
+import numpy as np
+
+
+class Case():
+    '''
+    Description of a synthetic dataset.
+
+    Attributes:
+        name: Name of the case, used for the file names
+        nt: Number of timesteps
+        ny: Number of rows
+        nx: Number of columns
+        nvars: Number of 3D variables
+        dtype: Numpy dtype of the variables
+        zlib: Boolean flag to compress the variables
+        chunks: Chunk sizes (time, y, x) or None for contiguous storage
+        masked: Fraction of values to set to the fill value
+        changed: Fraction of the variables that differ in the compare file
+    '''
+
+    def __init__(self, name, nt=24, ny=100, nx=100, nvars=4, dtype='f4',
+                 zlib=False, chunks=None, masked=0.0, changed=0.5):
+        self.name = name
+        self.nt = nt
+        self.ny = ny
+        self.nx = nx
+        self.nvars = nvars
+        self.dtype = dtype
+        self.zlib = zlib
+        self.chunks = chunks
+        self.masked = masked
+        self.changed = changed
+
+    def params(self):
+        return dict(self.__dict__)
+
+    @property
+    def nbytes(self):
+        return self.nt * self.ny * self.nx * self.nvars * \
+            np.dtype(self.dtype).itemsize
+
+
+# Scales roughly sized to run in seconds, minutes and tens of minutes
+SCALES = {
+    'small': [
+        Case('small_f4', nt=24, ny=50, nx=50, nvars=4),
+        Case('small_zlib_masked', nt=24, ny=50, nx=50, nvars=4, zlib=True,
+             chunks=(1, 50, 50), masked=0.2),
+        Case('small_many_vars', nt=4, ny=20, nx=20, nvars=100),
+    ],
+    'medium': [
+        Case('medium_f4', nt=240, ny=200, nx=200, nvars=8),
+        Case('medium_f8_zlib', nt=240, ny=200, nx=200, nvars=8, dtype='f8',
+             zlib=True, chunks=(24, 200, 200)),
+        Case('medium_i2_masked', nt=240, ny=200, nx=200, nvars=8,
+             dtype='i2', masked=0.3),
+        Case('medium_many_vars', nt=24, ny=100, nx=100, nvars=300,
+             zlib=True),
+    ],
+    'large': [
+        Case('large_hourly_year', nt=8760, ny=200, nx=200, nvars=4,
+             zlib=True, chunks=(24, 200, 200), masked=0.1),
+        Case('large_grid', nt=24, ny=2000, nx=2000, nvars=4,
+             chunks=(1, 500, 500)),
+    ],
+}
+
+
+def write_file(path, case, data_fn):
+    '''
+    Write a single netCDF for a case
+
+    Args:
+        path: File to write
+        case: Case describing the file
+        data_fn: Function taking (variable index, time index) returning the
+                 2D array for that timestep
+    '''
+    ds = Dataset(path, 'w')
+    ds.createDimension('time', case.nt)
+    ds.createDimension('y', case.ny)
+    ds.createDimension('x', case.nx)
+
+    ds.createVariable('time', 'f8', ('time',))[:] = np.arange(case.nt)
+    ds.createVariable('y', 'f8', ('y',))[:] = np.arange(case.ny)
+    ds.createVariable('x', 'f8', ('x',))[:] = np.arange(case.nx)
+
+    kwargs = {'zlib': case.zlib}
+
+    if case.chunks is None:
+        kwargs['contiguous'] = not case.zlib
+    else:
+        kwargs['chunksizes'] = case.chunks
+
+    for i in range(case.nvars):
+        v = ds.createVariable('var{:03d}'.format(i), case.dtype,
+                              ('time', 'y', 'x'), fill_value=-9999,
+                              **kwargs)
+
+        # Write a timestep at a time so large cases fit in memory
+        for t in range(case.nt):
+            v[t] = data_fn(i, t)
+
+    ds.close()
+
+
+def make_pair(case, directory, seed=0):
+    '''
+    Write a gold file and a compare file for a case. The compare file
+    has small perturbations in case.changed of the variables.
+
+    Args:
+        case: Case to generate
+        directory: Directory to write gold/ and compare/ into
+        seed: Seed of the random generator
+
+    Returns:
+        tuple: Paths to the gold and compare files
+    '''
+    n_changed = int(round(case.nvars * case.changed))
+    paths = []
+
+    for i, side in enumerate(['gold', 'compare']):
+        d = join(directory, side)
+        os.makedirs(d, exist_ok=True)
+        path = join(d, case.name + '.nc')
+
+        def data_fn(v, t):
+            rng = np.random.default_rng([seed, v, t])
+            values = rng.normal(10, 5, (case.ny, case.nx))
+
+            if side == 'compare' and v < n_changed:
+                values += rng.normal(0, 1e-3, values.shape)
+
+            values = values.astype(case.dtype)
+
+            if case.masked > 0:
+                mask = np.random.default_rng([seed, v]).random(
+                    (case.ny, case.nx)) < case.masked
+                values = np.ma.masked_array(values, mask=mask)
+
+            return values
+
+        write_file(path, case, data_fn)
+        paths.append(path)
+
+    return tuple(paths)
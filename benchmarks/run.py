@@ -0,0 +1,270 @@
+'''
+Benchmark goldmeister against synthetic gold files.
+
+Each case is generated into a scratch directory and then run in its own
+process so the peak resident memory of one case does not hide the next. The
+wall time and peak RSS of each stage are written to a JSON file so runs can
+be compared against each other, e.g.
+
+    python benchmarks/run.py --scale small -o bench.json
+'''
+
+from os.path import abspath, dirname, join
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import queue as queues
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+# Run against the checkout rather than an installed copy
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+from datasets import SCALES, make_pair  # noqa: E402
+
+
+def peak_rss():
+    '''
+    Returns:
+        mb: Peak resident memory of this process in MB
+    '''
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Linux reports KB, macOS reports bytes
+    if sys.platform == 'darwin':
+        return rss / 1024**2
+    return rss / 1024
+
+
+class Timer():
+    '''
+    Record the wall time and peak RSS at the end of each stage. Peak RSS
+    never goes down so it is the high water mark up to and including the
+    stage.
+    '''
+
+    def __init__(self, case):
+        self.case = case
+        self.records = []
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+
+class _Stage():
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.records.append({'case': self.timer.case.name,
+                                   'stage': self.name,
+                                   'wall_s': time.perf_counter() - self.start,
+                                   'peak_rss_mb': peak_rss(),
+                                   'failed': exc[0] is not None})
+
+
+def make_repo(path, gold, compare, name):
+    '''
+    Commit the gold file and then the compare file over it into a new git
+    repository with pygit2.
+
+    Returns:
+        path: Path to the file inside the repository
+    '''
+    import pygit2
+
+    repo = pygit2.init_repository(path, initial_head='main')
+    sig = pygit2.Signature('bench', 'bench@localhost')
+    f = join(path, name)
+    parents = []
+
+    for src, msg in [(gold, 'gold'), (compare, 'compare')]:
+        shutil.copyfile(src, f)
+        repo.index.add(name)
+        repo.index.write()
+        tree = repo.index.write_tree()
+        oid = repo.create_commit('HEAD', sig, sig, msg, tree, parents)
+        parents = [oid]
+
+        if msg == 'gold':
+            repo.branches.local.create('gold', repo[oid])
+
+    return f
+
+
+def run_case(case, directory, args, queue):
+    '''
+    Run every stage of one case and put the records on the queue
+    '''
+    from goldmeister.compare import GoldFilesCompare, GoldGitBranchCompare
+
+    timer = Timer(case)
+    kwargs = {'file_type': 'netcdf',
+              'output_dir': join(directory, 'output'),
+              'workers': args.workers,
+              'log_level': 'ERROR'}
+
+    try:
+        with timer.stage('generate'):
+            gold, compare = make_pair(case, directory)
+
+        with timer.stage('construct'):
+            gc = GoldFilesCompare(gold_files=[gold], compare_files=[compare],
+                                  **kwargs)
+
+        # Rerun the stages done in the constructor with cold file handles
+        gc.pool.close()
+        gc.data = {}
+
+        with timer.stage('initialize'):
+            gc.initialize()
+
+        with timer.stage('read_netcdf_data'):
+            gc.read()
+
+        with timer.stage('compare'):
+            results = gc.compare()
+
+        if args.plot:
+            with timer.stage('plot_results'):
+                gc.plot_results(results, show_plots=False)
+
+        gc.close()
+
+        with timer.stage('stream_compare'):
+            gc = GoldFilesCompare(gold_files=[gold], compare_files=[compare],
+                                  streaming=True, **kwargs)
+            gc.compare()
+            gc.close()
+
+        if args.git:
+            f = make_repo(join(directory, 'repo'), gold, compare,
+                          case.name + '.nc')
+
+            with timer.stage('git_compare'):
+                gc = GoldGitBranchCompare(repo_path=join(directory, 'repo'),
+                                          gold_files=[f], old_branch='gold',
+                                          new_branch='main', checkout=False,
+                                          **kwargs)
+                gc.compare()
+                gc.close()
+
+    finally:
+        queue.put(timer.records)
+
+
+def wait_for_records(case, p, queue, poll=1.0):
+    '''
+    Wait for the records of a case's process. A process killed before it
+    could report, e.g. by running out of memory, is recorded as a failure.
+
+    Returns:
+        records: List of the records of each stage
+    '''
+    records = None
+
+    while records is None:
+        try:
+            records = queue.get(timeout=poll)
+        except queues.Empty:
+            if not p.is_alive():
+                break
+
+    p.join()
+
+    if records is None:
+        records = [{'case': case.name, 'stage': 'process',
+                    'wall_s': None, 'peak_rss_mb': None, 'failed': True,
+                    'exitcode': p.exitcode}]
+
+    return records
+
+
+def environment():
+    import netCDF4
+    import numpy
+
+    return {'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'numpy': numpy.__version__,
+            'netCDF4': netCDF4.__version__}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark goldmeister')
+    parser.add_argument('--scale', choices=sorted(SCALES.keys()),
+                        default='small',
+                        help='Set of cases to run (default: %(default)s)')
+    parser.add_argument('--case', nargs='+',
+                        help='Only run the cases with these names')
+    parser.add_argument('-o', '--output', default='bench.json',
+                        help='JSON file to write (default: %(default)s)')
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help='Workers passed to goldmeister')
+    parser.add_argument('--plot', action='store_true',
+                        help='Also time plot_results')
+    parser.add_argument('--no-git', dest='git', action='store_false',
+                        help='Skip the git revision comparison')
+    parser.add_argument('--keep', action='store_true',
+                        help='Keep the generated files')
+    args = parser.parse_args(argv)
+
+    cases = SCALES[args.scale]
+    if args.case:
+        cases = [c for c in cases if c.name in args.case]
+
+    ctx = multiprocessing.get_context('spawn')
+    report = {'environment': environment(), 'scale': args.scale,
+              'cases': [], 'results': []}
+
+    for case in cases:
+        directory = tempfile.mkdtemp(prefix='goldmeister-bench-')
+        print('{:<24}{:>8.1f} MB'.format(case.name, case.nbytes / 1024**2))
+
+        queue = ctx.Queue()
+        p = ctx.Process(target=run_case, args=(case, directory, args, queue))
+        p.start()
+        records = wait_for_records(case, p, queue)
+
+        for r in records:
+            if r['wall_s'] is None:
+                print('    {:<20} exited with code {}'.format(
+                    r['stage'], r['exitcode']))
+                continue
+
+            print('    {:<20}{:>10.3f} s{:>10.1f} MB{}'.format(
+                r['stage'], r['wall_s'], r['peak_rss_mb'],
+                '  failed' if r['failed'] else ''))
+
+        params = case.params()
+        params['nbytes'] = case.nbytes
+        report['cases'].append(params)
+        report['results'] += records
+
+        if args.keep:
+            print('    files kept in {}'.format(directory))
+        else:
+            shutil.rmtree(directory)
+
+    with open(args.output, 'w') as fp:
+        json.dump(report, fp, indent=2)
+
+    print('Wrote {}'.format(args.output))
+
+
+if __name__ == '__main__':
+    main()
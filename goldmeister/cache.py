@@ -0,0 +1,263 @@
+'''
+Persistent cache of comparison results keyed on the content of the files
+compared, so repeat comparisons against the same gold revision are free.
+'''
+
+from collections import OrderedDict
+from os.path import abspath, dirname, expanduser, isdir
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stats (
+    gold_id TEXT,
+    compare_id TEXT,
+    variable TEXT,
+    mode TEXT,
+    stats TEXT,
+    preview BLOB,
+    size INTEGER,
+    accessed REAL,
+    extras TEXT,
+    PRIMARY KEY (gold_id, compare_id, variable, mode)
+);
+CREATE TABLE IF NOT EXISTS digests (
+    file_id TEXT,
+    variable TEXT,
+    digest TEXT,
+    accessed REAL,
+    PRIMARY KEY (file_id, variable)
+);
+"""
+
+# Bytes counted for a row of the digests table
+DIGEST_SIZE = 'LENGTH(file_id) + LENGTH(variable) + LENGTH(digest)'
+
+
+def variable_digest(d):
+    '''
+    Returns:
+        digest: sha256 hex digest of an array's shape, dtype, data and mask
+    '''
+    # Hash in native byte order so memory mapped netCDF3 data matches data
+    # read through netCDF4
+    dtype = d.dtype.newbyteorder('=')
+    data = np.ascontiguousarray(np.ma.getdata(d)).reshape(-1)
+
+    h = hashlib.sha256()
+    h.update('{}{}'.format(d.shape, dtype).encode())
+
+    if data.dtype.isnative:
+        h.update(data.view(np.uint8))
+    else:
+        for i in range(0, data.size, 2**20):
+            h.update(data[i:i + 2**20].astype(dtype).view(np.uint8))
+
+    if np.ma.getmask(d) is not np.ma.nomask:
+        h.update(np.ascontiguousarray(np.ma.getmaskarray(d)).reshape(-1))
+
+    return h.hexdigest()
+
+
+def to_bytes(d):
+    '''
+    Serialize an array with masked values replaced with NaN
+    '''
+    buf = io.BytesIO()
+    np.save(buf, np.ma.filled(np.ma.asarray(d, dtype=np.float32), np.nan))
+    return buf.getvalue()
+
+
+def from_bytes(b):
+    '''
+    Load an array from to_bytes with NaNs masked
+    '''
+    return np.ma.masked_invalid(np.load(io.BytesIO(b)))
+
+
+class StatsCache():
+    '''
+    SQLite backed store of difference statistics and previews for each
+    (gold content, compare content, variable) and variable digests for each
+    (file content, variable). Content ids are git blob ids or file digests.
+    Least recently used statistics and digests are evicted once the stored
+    statistics, previews and digests exceed max_size bytes.
+
+    Attributes:
+        path: Location of the SQLite database
+        max_size: Maximum bytes of statistics, previews and digests to keep
+    '''
+
+    def __init__(self, path, max_size=100 * 1024**2):
+        self.path = abspath(expanduser(path))
+        self.max_size = max_size
+
+        if not isdir(dirname(self.path)):
+            os.makedirs(dirname(self.path), exist_ok=True)
+
+        self.db = sqlite3.connect(self.path)
+        self.db.executescript(SCHEMA)
+
+        # Caches made before extras were kept
+        columns = [r[1] for r in self.db.execute('PRAGMA table_info(stats)')]
+        if 'extras' not in columns:
+            with self.db:
+                self.db.execute('ALTER TABLE stats ADD COLUMN extras TEXT')
+
+    def get(self, gold_id, compare_id, variable, mode):
+        '''
+        Returns:
+            tuple: The stats dictionary, the preview array or None and the
+                   dictionary of extras or None, all None when nothing is
+                   cached
+        '''
+        row = self.db.execute(
+            'SELECT stats, preview, extras FROM stats WHERE gold_id=? AND '
+            'compare_id=? AND variable=? AND mode=?',
+            (gold_id, compare_id, variable, mode)).fetchone()
+
+        if row is None:
+            return None, None, None
+
+        with self.db:
+            self.db.execute(
+                'UPDATE stats SET accessed=? WHERE gold_id=? AND '
+                'compare_id=? AND variable=? AND mode=?',
+                (time.time(), gold_id, compare_id, variable, mode))
+
+        preview = None
+        if row[1] is not None:
+            preview = from_bytes(row[1])
+
+        extras = None
+        if row[2] is not None:
+            extras = json.loads(row[2], object_pairs_hook=OrderedDict)
+
+        return json.loads(row[0]), preview, extras
+
+    def put(self, gold_id, compare_id, variable, mode, stats, preview=None,
+            extras=None):
+        '''
+        Store the statistics of a comparison, numpy scalars are stored as
+        python numbers.
+
+        Args:
+            extras: Dictionary of anything else recorded for the comparison
+                    that json can write, e.g. the statistics of each
+                    timestep and the index of where the differences are
+        '''
+        stats = json.dumps([(k, v.item() if hasattr(v, 'item') else v)
+                            for k, v in stats.items()])
+        size = len(stats)
+
+        if preview is not None:
+            preview = to_bytes(preview)
+            size += len(preview)
+
+        if extras is not None:
+            extras = json.dumps(extras)
+            size += len(extras)
+
+        with self.db:
+            self.db.execute(
+                'INSERT OR REPLACE INTO stats (gold_id, compare_id, variable, '
+                'mode, stats, preview, size, accessed, extras) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (gold_id, compare_id, variable, mode, stats, preview, size,
+                 time.time(), extras))
+
+    def get_digest(self, file_id, variable):
+        '''
+        Returns:
+            digest: Cached digest of a variable in a file or None
+        '''
+        row = self.db.execute(
+            'SELECT digest FROM digests WHERE file_id=? AND variable=?',
+            (file_id, variable)).fetchone()
+
+        if row is None:
+            return None
+
+        with self.db:
+            self.db.execute(
+                'UPDATE digests SET accessed=? WHERE file_id=? AND '
+                'variable=?', (time.time(), file_id, variable))
+
+        return row[0]
+
+    def put_digest(self, file_id, variable, digest):
+        with self.db:
+            self.db.execute(
+                'INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?)',
+                (file_id, variable, digest, time.time()))
+
+    def size(self):
+        '''
+        Returns:
+            size: Bytes of statistics, previews and digests stored
+        '''
+        stats = self.db.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM stats').fetchone()[0]
+        digests = self.db.execute(
+            'SELECT COALESCE(SUM({}), 0) FROM digests'
+            ''.format(DIGEST_SIZE)).fetchone()[0]
+
+        return stats + digests
+
+    def evict(self):
+        '''
+        Remove the least recently used statistics and digests until the
+        cache is smaller than max_size
+
+        Returns:
+            removed: Number of entries removed
+        '''
+        excess = self.size() - self.max_size
+        removed = 0
+
+        if excess <= 0:
+            return removed
+
+        rows = self.db.execute(
+            "SELECT 'stats', rowid, size, accessed FROM stats UNION ALL "
+            "SELECT 'digests', rowid, {}, accessed FROM digests "
+            "ORDER BY accessed".format(DIGEST_SIZE)).fetchall()
+
+        with self.db:
+            for table, rowid, size, accessed in rows:
+                if excess <= 0:
+                    break
+
+                self.db.execute('DELETE FROM {} WHERE rowid=?'.format(table),
+                                (rowid,))
+                excess -= size
+                removed += 1
+
+        return removed
+
+    def invalidate(self, file_id=None):
+        '''
+        Remove everything cached for a file's content, or everything when no
+        file_id is given
+        '''
+        with self.db:
+            if file_id is None:
+                self.db.execute('DELETE FROM stats')
+                self.db.execute('DELETE FROM digests')
+
+            else:
+                self.db.execute('DELETE FROM stats WHERE gold_id=? OR '
+                                'compare_id=?', (file_id, file_id))
+                self.db.execute('DELETE FROM digests WHERE file_id=?',
+                                (file_id,))
+
+        self.db.execute('VACUUM')
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,502 @@
+'''
+Command line interface for goldmeister. The comparison modules are imported
+after the arguments are parsed and matplotlib only when plots are requested,
+so text only runs start quickly.
+'''
+
+import argparse
+import sys
+
+EPILOG = '''
+exit status:
+  0  no differences found (or everything within tolerance with --verify)
+  1  differences found
+  2  bad arguments
+'''
+
+
+def parse_tolerance(text):
+    '''
+    Parse a tolerance argument of the form PATTERN:atol=1e-6,rtol=0,ulp=4
+
+    Returns:
+        tuple: The pattern and a dictionary of the tolerance keyword arguments
+    '''
+    try:
+        pattern, spec = text.rsplit(':', 1)
+        tol = {}
+
+        for item in spec.split(','):
+            k, v = item.split('=')
+            k = k.strip()
+
+            if k not in ['atol', 'rtol', 'ulp']:
+                raise ValueError(k)
+
+            tol[k] = int(v) if k == 'ulp' else float(v)
+
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            "Tolerances look like PATTERN:atol=1e-6,rtol=0,ulp=4, "
+            "got {}".format(text))
+
+    return pattern, tol
+
+
+def parse_index(text):
+    '''
+    Parse an index selection of the form DIM=START:STOP
+
+    Returns:
+        tuple: The dimension name and the slice of its indices
+    '''
+    from .subset import parse_selection
+
+    try:
+        dim, (start, stop) = parse_selection(text)
+
+        for b in [start, stop]:
+            if b is not None and not isinstance(b, int):
+                raise ValueError(b)
+
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            "Index selections look like time=0:24, got {}".format(text))
+
+    return dim, slice(start, stop)
+
+
+def parse_range(text):
+    '''
+    Parse a coordinate selection of the form DIM=START:STOP
+
+    Returns:
+        tuple: The dimension name and a (start, stop) tuple of the bounds
+    '''
+    from .subset import parse_selection
+
+    try:
+        return parse_selection(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            "Coordinate selections look like x=500000:510000 or "
+            "time=2020-10-01:2020-10-02, got {}".format(text))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='goldmeister',
+        description='Compare gold files between two sets of files or two git '
+                    'revisions',
+        epilog=EPILOG,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    common = argparse.ArgumentParser(add_help=False)
+
+    common.add_argument('-o', '--output', default='./output',
+                        help='Directory to write results to, removed if it '
+                             'exists (default: %(default)s)')
+    common.add_argument('-t', '--file-type', default='netcdf',
+                        help='Format of the gold files, netcdf, geotiff, '
+                             'zarr or csv (default: %(default)s)')
+    common.add_argument('--ignore-vars', nargs='+',
+                        default=['time', 'y', 'x', 'projection'],
+                        help='Variables to leave out (default: %(default)s)')
+    common.add_argument('--only-nonzero', action='store_true',
+                        help='Only report variables with differences')
+    common.add_argument('--results', metavar='FILE',
+                        help='Write the statistics of every variable to a '
+                             '.csv, .json or .parquet file')
+    common.add_argument('--log-level', default='INFO',
+                        help='Logging level (default: %(default)s)')
+    common.add_argument('-v', '--verbose', action='store_true',
+                        help='Log the statistics of each variable as it is '
+                             'compared instead of one summary table')
+
+    mode = common.add_argument_group('modes')
+    mode.add_argument('-q', '--quick', action='store_true',
+                      help='Only compare checksums, variable lists, shapes, '
+                           'dtypes and attributes without reading any data')
+    mode.add_argument('--verify', action='store_true',
+                      help='Only check the data against the tolerances, '
+                           'exiting 1 if anything is outside them')
+    mode.add_argument('--all-violations', action='store_true',
+                      help='With --verify, count every violation instead of '
+                           'stopping at the first one for each variable')
+    mode.add_argument('--streaming', action='store_true',
+                      help='Compare block by block with bounded memory')
+    mode.add_argument('--locate', action='store_true',
+                      help='Find the timesteps, regions and largest values '
+                           'that differ, written to locations.json in the '
+                           'output')
+    mode.add_argument('--previews', action='store_true',
+                      help='Write multi-resolution previews and a histogram '
+                           'of each differing variable to previews.nc in the '
+                           'output')
+
+    sub = common.add_argument_group('subset')
+    sub.add_argument('--isel', type=parse_index, action='append', default=[],
+                     metavar='DIM=START:STOP',
+                     help='Only compare these indices of a dimension, e.g. '
+                          'time=0:24. Can be repeated.')
+    sub.add_argument('--sel', type=parse_range, action='append', default=[],
+                     metavar='DIM=START:STOP',
+                     help='Only compare where the coordinate variable of a '
+                          'dimension is in a range, inclusive, e.g. '
+                          'x=500000:510000 or time=2020-10-01:2020-10-02. '
+                          'Can be repeated.')
+    sub.add_argument('--align', action='store_true',
+                     help='Compare the gold and compare where their '
+                          'coordinates match, for files with different time '
+                          'ranges or grid extents')
+
+    tol = common.add_argument_group('tolerances')
+    tol.add_argument('--atol', type=float,
+                     help='Absolute tolerance for every variable')
+    tol.add_argument('--rtol', type=float,
+                     help='Relative tolerance for every variable')
+    tol.add_argument('--ulp', type=int,
+                     help='Units in the last place allowed for every variable')
+    tol.add_argument('--tolerance', type=parse_tolerance, action='append',
+                     default=[], metavar='PATTERN:SPEC',
+                     help='Tolerance for variables matching a glob pattern, '
+                          'e.g. "precip*:atol=1e-6,ulp=4". Can be repeated, '
+                          'the first match wins.')
+
+    perf = common.add_argument_group('performance')
+    perf.add_argument('-j', '--workers', type=int, default=1,
+                      help='Number of processes (default: %(default)s)')
+    perf.add_argument('--shared', default='shm',
+                      choices=['shm', 'memmap', 'none'],
+                      help='How workers hand differences back, through '
+                           'memory mapped files in shared memory or the '
+                           'output, or pickled (default: %(default)s)')
+    perf.add_argument('--max-memory', type=int, default=256,
+                      help='MB per variable when streaming '
+                           '(default: %(default)s)')
+    perf.add_argument('--pipeline', action='store_true',
+                      help='Overlap reading, differencing and plotting in '
+                           'threads, keeping only the statistics')
+    perf.add_argument('--prefetch', type=int, default=2,
+                      help='Variables read ahead with --pipeline '
+                           '(default: %(default)s)')
+    perf.add_argument('-i', '--incremental', action='store_true',
+                      help='Keep the output and a manifest in it, only '
+                           'comparing and plotting the variables whose '
+                           'inputs changed since the last run')
+    perf.add_argument('--checkpoint', action='store_true',
+                      help='Journal each variable and figure as it is done '
+                           'so rerunning a stopped comparison resumes it, '
+                           'implies --incremental')
+    perf.add_argument('--cache',
+                      help='SQLite file to cache statistics in across runs')
+    perf.add_argument('--profile', metavar='JSON',
+                      help='Write the time spent in each stage and on each '
+                           'variable to a JSON file')
+    perf.add_argument('--trace', metavar='JSON',
+                      help='Write a Chrome trace event file of each stage, '
+                           'viewable in chrome://tracing or Perfetto')
+
+    plot = common.add_argument_group('plotting')
+    plot.add_argument('-p', '--plot', action='store_true',
+                      help='Render figures of the differences to the output')
+    plot.add_argument('--plot-original', action='store_true',
+                      help='Include the gold and compare data in figures')
+    plot.add_argument('--hist', action='store_true',
+                      help='Include a histogram of the differences')
+    plot.add_argument('--max-size', type=int, default=1000,
+                      help='Maximum pixels along a side of an image '
+                           '(default: %(default)s)')
+
+    sub = parser.add_subparsers(dest='command')
+    sub.required = True
+
+    files = sub.add_parser('files', parents=[common],
+                           help='Compare two sets of files')
+    files.add_argument('--gold', nargs='+', required=True,
+                       help='Gold files')
+    files.add_argument('--compare', nargs='+', required=True,
+                       help='Files to compare against the gold, in the same '
+                            'order')
+
+    git = sub.add_parser('git', parents=[common],
+                         help='Compare gold files across two git revisions')
+    git.add_argument('repo', help='Path to the git repository')
+    git.add_argument('--gold', nargs='+', required=True,
+                     help='Gold files in the repository')
+    git.add_argument('--old', required=True,
+                     help='Revision used as the gold, e.g. main')
+    git.add_argument('--new', required=True, nargs='+',
+                     help='Revision to compare, e.g. a branch, tag or hash. '
+                          'Give several to compare each against the gold, '
+                          'reading the gold once.')
+    git.add_argument('--checkout', action='store_true',
+                     help='Check out each branch instead of reading git '
+                          'objects')
+    git.add_argument('--blob-cache',
+                     help='Directory to write git blobs to before opening')
+
+    history = sub.add_parser('history', parents=[common],
+                             help='Follow the drift of gold files over a '
+                                  'range of commits')
+    history.add_argument('repo', help='Path to the git repository')
+    history.add_argument('--gold', nargs='+', required=True,
+                         help='Gold files in the repository')
+    history.add_argument('--old', required=True,
+                         help='Revision the range starts after, used as the '
+                              'gold')
+    history.add_argument('--new', default='HEAD',
+                         help='Revision the range ends at '
+                              '(default: %(default)s)')
+    history.add_argument('--all-parents', action='store_true',
+                         help='Follow every parent of merges instead of only '
+                              'the first')
+    history.add_argument('--bisect', metavar='KEY',
+                         help='Only find the first commit where a '
+                              'file/variable, e.g. file-gold.nc:precip, '
+                              'differs')
+    history.add_argument('--blob-cache',
+                         help='Directory to write git blobs to before opening')
+
+    return parser
+
+
+def get_tolerances(args):
+    '''
+    Returns:
+        tolerances: Dictionary of patterns to tolerances from the arguments
+    '''
+    tolerances = dict(args.tolerance)
+    default = {}
+
+    for k in ['atol', 'rtol', 'ulp']:
+        if getattr(args, k) is not None:
+            default[k] = getattr(args, k)
+
+    if default:
+        tolerances['*'] = default
+
+    return tolerances
+
+
+def quick_pairs(args):
+    '''
+    Pair up the gold files with the files they are compared against, without
+    reading them
+
+    Returns:
+        pairs: List of (gold, compare) paths or BlobFiles
+    '''
+    from os.path import abspath, expanduser, relpath
+
+    gold = [abspath(expanduser(f)) for f in args.gold]
+
+    if args.command == 'files':
+        return list(zip(gold, [abspath(expanduser(f)) for f in args.compare]))
+
+    import pygit2
+
+    from .gitobjects import BlobFile, resolve_commit
+
+    # Always read from the git objects, the working tree is left untouched
+    repo = pygit2.Repository(abspath(expanduser(args.repo)))
+    commits = [resolve_commit(repo, rev) for rev in [args.old, args.new[0]]]
+    pairs = []
+
+    for f in gold:
+        path = relpath(f, repo.workdir)
+        pairs.append(tuple(BlobFile(repo, c, path, cache_dir=args.blob_cache)
+                           for c in commits))
+
+    return pairs
+
+
+def main(argv=None):
+    '''
+    Run goldmeister from the command line
+
+    Returns:
+        status: Exit status
+    '''
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    many = args.command == 'git' and len(args.new) > 1
+
+    if many and (args.quick or args.verify or args.checkout):
+        parser.error('--quick, --verify and --checkout compare a single --new '
+                     'revision')
+
+    if args.command == 'history' and (args.quick or args.verify):
+        parser.error('--quick and --verify are not available for history')
+
+    if args.results and (args.quick or args.verify or many or
+                         args.command == 'history'):
+        parser.error('--results is only written when comparing two sets of '
+                     'files or two revisions')
+
+    if args.pipeline and (args.quick or args.verify or args.streaming or
+                          many or args.command == 'history'):
+        parser.error('--pipeline is only used when comparing two sets of '
+                     'files or two revisions without --streaming')
+
+    if args.quick and (args.isel or args.sel or args.align):
+        parser.error('--isel, --sel and --align are not used with --quick')
+
+    if args.quick and (args.profile or args.trace):
+        parser.error('--profile and --trace are not used with --quick')
+
+    if args.command == 'files' and len(args.gold) != len(args.compare):
+        parser.error('--compare needs one file for each --gold file')
+
+    # Import after parsing so --help and bad arguments return immediately
+    from .readers import READERS, file_types
+
+    if args.file_type.lower() not in READERS:
+        parser.error('unknown --file-type {}, choose from {}'
+                     ''.format(args.file_type, ', '.join(file_types())))
+
+    # Quick comparisons only open the files, nothing is read or written
+    if args.quick:
+        from .lazy import DatasetPool
+        from .quick import quick_compare_pairs
+        from .utilities import get_logger
+
+        pool = DatasetPool(file_type=args.file_type)
+        report = quick_compare_pairs(quick_pairs(args), pool,
+                                     ignore_vars=args.ignore_vars,
+                                     log=get_logger('gold.compare',
+                                                    level=args.log_level))
+        pool.close()
+
+        return int(any(report.values()))
+
+    from .compare import (GoldFilesCompare, GoldGitBranchCompare,
+                          GoldHistoryCompare, GoldRevisionsCompare)
+    from .statistics import has_differences
+
+    kwargs = {'file_type': args.file_type,
+              'gold_files': args.gold,
+              'output_dir': args.output,
+              'ignore_vars': args.ignore_vars,
+              'only_report_nonzero': args.only_nonzero,
+              'streaming': args.streaming,
+              'max_memory': args.max_memory * 1024**2,
+              'workers': args.workers,
+              'shared': None if args.shared == 'none' else args.shared,
+              'cache_path': args.cache,
+              'tolerances': get_tolerances(args),
+              'profile': bool(args.profile or args.trace),
+              'locate': args.locate,
+              'prefetch': args.prefetch,
+              'incremental': args.incremental,
+              'checkpoint': args.checkpoint,
+              'previews': args.previews,
+              'isel': dict(args.isel),
+              'sel': dict(args.sel),
+              'align': args.align,
+              'verbose': args.verbose,
+              'log_level': args.log_level}
+
+    if args.command == 'files':
+        gc = GoldFilesCompare(compare_files=args.compare, **kwargs)
+
+    elif args.command == 'history':
+        gc = GoldHistoryCompare(repo_path=args.repo,
+                                old_branch=args.old,
+                                new_branch=args.new,
+                                first_parent=not args.all_parents,
+                                blob_cache=args.blob_cache,
+                                **kwargs)
+
+    elif many:
+        gc = GoldRevisionsCompare(repo_path=args.repo,
+                                  old_branch=args.old,
+                                  new_branches=args.new,
+                                  blob_cache=args.blob_cache,
+                                  **kwargs)
+
+    else:
+        gc = GoldGitBranchCompare(repo_path=args.repo,
+                                  old_branch=args.old,
+                                  new_branch=args.new[0],
+                                  checkout=args.checkout,
+                                  blob_cache=args.blob_cache,
+                                  **kwargs)
+
+    if args.command == 'history' and args.bisect:
+        commit = gc.bisect(args.bisect)
+
+        if commit is None:
+            print('{} does not change'.format(args.bisect))
+        else:
+            print('{} first differs at {}'.format(args.bisect, commit))
+
+        status = int(commit is not None)
+
+    elif args.command == 'history':
+        drift = gc.scan()
+        status = int(any(p['changed'] for series in drift.values()
+                         for p in series))
+
+    elif many:
+        summary = gc.compare_revisions(render=args.plot,
+                                       plot_original_data=args.plot_original,
+                                       include_hist=args.hist,
+                                       max_size=args.max_size)
+        status = int(any(has_differences(s) for stats in summary.values()
+                         for s in stats.values()))
+
+    elif args.verify:
+        passed, verdicts = gc.verify(stop_early=not args.all_violations)
+        status = int(not passed)
+
+    elif args.pipeline:
+        table = gc.pipeline_compare(render=args.plot,
+                                    plot_original_data=args.plot_original,
+                                    include_hist=args.hist,
+                                    max_size=args.max_size,
+                                    as_table=True)
+        status = int(table['differs'].any())
+
+        if args.locate:
+            gc.write_index(table.entries)
+
+    elif args.plot:
+        results = gc.compare()
+        gc.render_results(results, plot_original_data=args.plot_original,
+                          include_hist=args.hist, max_size=args.max_size)
+
+        table = gc.results_table(results)
+        status = int(table['differs'].any())
+
+        if args.locate:
+            gc.write_index(results)
+
+    else:
+        # Only the statistics are needed so the arrays are not kept
+        table = gc.compare(as_table=True)
+        status = int(table['differs'].any())
+
+        if args.locate:
+            gc.write_index(table.entries)
+
+    if args.results:
+        table.save(args.results)
+
+    if args.profile or args.trace:
+        report = gc.profile_report()
+        gc.log.info('Profile:\n{}'.format(report))
+
+        if args.profile:
+            report.to_json(args.profile)
+        if args.trace:
+            report.to_trace(args.trace)
+
+    gc.close()
+
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,27 +2,51 @@
 # Script to plot difference in gold files between current branch and master
 
 from os.path import join, abspath, expanduser, basename, isdir
+import csv
+import json
+import logging
 import os
-from spatialnc.analysis import get_stats
-import matplotlib.pyplot as plt
-from mpl_toolkits.axes_grid1 import make_axes_locatable
+import time
 
-from netCDF4 import Dataset
 import numpy
-import pygit2
 import shutil
+from collections import OrderedDict
 import numpy as np
-from . utilities import get_logger
+from . utilities import (get_logger, file_name, files_identical, content_id,
+                         plain)
+from . statistics import identical_stats, has_differences
+from . subset import Subset
+from . cache import StatsCache
+from . gitobjects import BlobFile, resolve_commit
+from . history import changed_commits, commit_range, describe_commit
+from . plotting import prepare_panel, render_figure, reduce_image
+from . parallel import (pool_map, pool_imap, list_variables, difference,
+                        stream_differences)
+from . lazy import (DatasetPool, LazyVariable, Entry, ZeroDifference,
+                    materialize)
+from . localize import DifferenceIndex
+from . manifest import Manifest
+from . pipeline import BackgroundWorker, prefetch
+from . previews import PreviewStore
+from . quick import quick_compare_pairs
+from . readers import get_reader
+from . reporting import StatsReport
+from . shared import BACKINGS, SharedMasked, SharedStore, scratch_root
+from . profiling import Profiler
+from . results import ResultsTable
+from . tolerance import (Verdict, find_tolerance, check_variable,
+                         summarize_verdicts)
 
 class GoldCompare():
     '''
-    Base Class for performing comparisons. All the data here should be loaded
-    into memory prior to comparisons.
+    Base Class for performing comparisons. The data is described by lazy
+    handles in self.data and is only read when it is compared or plotted.
 
     Attributes:
         gold_files: List of absolute paths representing gold files.
         compare_files: List of absolute paths to compare the gold files against
-        file_type: Type of files were comparing
+        file_type: Type of files were comparing, one of the readers in
+                   goldmeister.readers e.g. netcdf, geotiff, zarr or csv
         output: Directory to output results
     '''
 
@@ -31,9 +55,81 @@ class GoldCompare():
         Args:
             only_report_nonzero: Boolean flag to suppress any output from
                                 differences that have a mean of zero
+            streaming: Boolean flag to compare block by block without loading
+                       the data into memory. Only statistics are returned.
+            max_memory: Approximate number of bytes to hold in memory per
+                        variable while streaming. Default is 256 MB.
+            workers: Number of processes to spread the reading and differencing
+                     of each file/variable over. Default is 1 (serial).
+            shared: How workers hand their differences back, see
+                    goldmeister.shared. shm writes them to memory mapped
+                    files in shared memory, or the output when it lacks
+                    room, memmap always to the output and None pickles them.
+                    Default is shm.
+            cache_path: Path to a SQLite file for caching statistics across
+                        runs keyed on file content. Default is no caching.
+            cache_size: Maximum bytes of statistics, previews and digests to
+                        keep in the cache. Default is 100 MB.
+            cache_previews: Boolean flag to also cache a small 2D preview of
+                            each difference, used for plotting cached results
+            max_open_files: Maximum number of files kept open for reading
+                            data on request. Default is 16.
+            timestep_stats: Boolean flag to also compute the difference
+                            statistics of each timestep for 3D variables,
+                            stored under timesteps in the results
+            tolerances: Dictionary of glob patterns matching variable names
+                        to a Tolerance or a dictionary of atol, rtol and ulp,
+                        used by verify. Default is exact equality.
+            profile: Boolean flag to record the time spent in each stage and
+                     on each file/variable, the bytes read and cache hits.
+                     A Profiler can also be given to share one across
+                     comparisons. See profile_report. Default is False.
+            locate: Boolean flag to also index where the differences are,
+                    the differing count and bounding box of each timestep
+                    and the largest differences, stored under index in
+                    the results. Default is False.
+            top_k: Number of largest differences to keep when locating.
+                   Default is 10.
+            prefetch: Number of variables read ahead, or waiting to be
+                      rendered, by pipeline_compare. Default is 2.
+            memory_map: Boolean flag to read uncompressed, contiguous
+                        variables of netCDF3 files through memory maps
+                        instead of netCDF4, anything else is read as usual.
+                        Default is True.
+            isel: Dictionary of dimension names to slices of the indices to
+                  compare, e.g. {'time': slice(0, 24)}. Default is all.
+            sel: Dictionary of dimension names to (start, stop) ranges of
+                 the values of their coordinate variables to compare,
+                 inclusive, e.g. {'x': (500000, 510000)}. Times can be ISO
+                 dates. Selected separately in the gold and compare files.
+                 Default is all.
+            align: Boolean flag to cut the gold and compare to the values
+                   of their coordinate variables they share, for files with
+                   different time ranges or grid extents. Default is False.
+            incremental: Boolean flag to keep the output directory and a
+                         manifest in it, so a rerun only compares and
+                         renders the variables whose inputs changed since
+                         the last run. Default is False, the output is
+                         removed first.
+            checkpoint: Boolean flag to record each variable and figure in
+                        a journal in the output as soon as it is done, so a
+                        run that is stopped resumes where it stopped when
+                        started again, without reading the variables already
+                        compared. Implies incremental. Default is False.
+            previews: Boolean flag to write tiled previews of the mean and
+                      largest absolute difference at several resolutions
+                      and a histogram of each differing variable to
+                      previews.nc in the output. Not made when streaming.
+                      Default is False.
+            verbose: Boolean flag to log the statistics of each variable as
+                     it is compared. Otherwise they are buffered and logged
+                     as one summary table after each comparison. Default is
+                     False.
+            log_level: Level to log at. Default is DEBUG.
         '''
 
-        self.file_type = kwargs['file_type']
+        # Fail on unknown types before anything is opened
+        self.file_type = get_reader(kwargs['file_type']).file_type
 
         if 'output_dir' not in kwargs.keys():
             self.output = './output'
@@ -51,14 +147,171 @@ class GoldCompare():
         else:
             self.only_report_nonzero = False
 
-        self.log = get_logger('gold.compare')
+        if 'streaming' in kwargs.keys():
+            self.streaming = kwargs['streaming']
+        else:
+            self.streaming = False
+
+        if 'max_memory' in kwargs.keys():
+            self.max_memory = kwargs['max_memory']
+        else:
+            self.max_memory = 256 * 1024**2
+
+        if 'workers' in kwargs.keys():
+            self.workers = kwargs['workers']
+        else:
+            self.workers = 1
+
+        if 'shared' in kwargs.keys():
+            self.shared = kwargs['shared']
+        else:
+            self.shared = 'shm'
+
+        if self.shared is not None and self.shared not in BACKINGS:
+            raise ValueError("shared must be one of {} or None, not {}"
+                             "".format(', '.join(BACKINGS), self.shared))
+
+        # Differences handed back by the workers of the last comparison
+        self.shared_store = None
+
+        if 'cache_size' in kwargs.keys():
+            cache_size = kwargs['cache_size']
+        else:
+            cache_size = 100 * 1024**2
+
+        if 'cache_path' in kwargs.keys() and kwargs['cache_path'] is not None:
+            self.cache = StatsCache(kwargs['cache_path'], max_size=cache_size)
+        else:
+            self.cache = None
+
+        if 'cache_previews' in kwargs.keys():
+            self.cache_previews = kwargs['cache_previews']
+        else:
+            self.cache_previews = False
+
+        if 'timestep_stats' in kwargs.keys():
+            self.timestep_stats = kwargs['timestep_stats']
+        else:
+            self.timestep_stats = False
+
+        if 'tolerances' in kwargs.keys():
+            self.tolerances = kwargs['tolerances']
+        else:
+            self.tolerances = None
+
+        if 'top_k' in kwargs.keys():
+            top_k = kwargs['top_k']
+        else:
+            top_k = 10
+
+        # Number of largest differences to index, None to not index them
+        if 'locate' in kwargs.keys() and kwargs['locate']:
+            self.top_k = top_k
+        else:
+            self.top_k = None
+
+        if 'prefetch' in kwargs.keys():
+            self.prefetch = kwargs['prefetch']
+        else:
+            self.prefetch = 2
+
+        if 'memory_map' in kwargs.keys():
+            self.memory_map = kwargs['memory_map']
+        else:
+            self.memory_map = True
+
+        if 'isel' in kwargs.keys():
+            isel = kwargs['isel']
+        else:
+            isel = None
+
+        if 'sel' in kwargs.keys():
+            sel = kwargs['sel']
+        else:
+            sel = None
+
+        if 'align' in kwargs.keys():
+            align = kwargs['align']
+        else:
+            align = False
+
+        # Part of each variable compared, only that hyperslab is read
+        self.subset = Subset(isel=isel, sel=sel, align=align)
+
+        # Selected coordinates of each file and the dimensions of each key,
+        # by gold and compare, for aligning
+        self.coords = {'gold': {}, 'compare': {}}
+        self.dimensions = {'gold': {}, 'compare': {}}
+        self.unaligned_gold = {}
+
+        if 'checkpoint' in kwargs.keys():
+            self.checkpoint = kwargs['checkpoint']
+        else:
+            self.checkpoint = False
+
+        # Checkpoints are kept in the manifest of an incremental run
+        if 'incremental' in kwargs.keys():
+            self.incremental = kwargs['incremental'] or self.checkpoint
+        else:
+            self.incremental = self.checkpoint
+
+        if 'previews' in kwargs.keys():
+            self.previews = kwargs['previews']
+        else:
+            self.previews = False
+
+        # PreviewStore while comparing and the file of the last comparison
+        self.preview_store = None
+        self.preview_path = None
+
+        if 'verbose' in kwargs.keys():
+            self.verbose = kwargs['verbose']
+        else:
+            self.verbose = False
+
+        # Statistics reported during the last comparison
+        self.report = StatsReport()
+
+        if 'max_open_files' in kwargs.keys():
+            self.pool = DatasetPool(max_open=kwargs['max_open_files'],
+                                    file_type=self.file_type)
+        else:
+            self.pool = DatasetPool(file_type=self.file_type)
+
+        if 'profile' in kwargs.keys() and \
+           isinstance(kwargs['profile'], Profiler):
+            self.profiler = kwargs['profile']
+        elif 'profile' in kwargs.keys():
+            self.profiler = Profiler(enabled=kwargs['profile'])
+        else:
+            self.profiler = Profiler(enabled=False)
+
+        if 'log_level' in kwargs.keys():
+            log_level = kwargs['log_level']
+        else:
+            log_level = 'DEBUG'
+
+        self.log = get_logger('gold.compare', level=log_level)
 
-        # Mange the output dir
-        if isdir(self.output):
+        # Mange the output dir, incremental runs keep what is still current
+        if isdir(self.output) and not self.incremental:
             self.log.warning("Removing preexisting output location {}"
                              "".format(self.output))
             shutil.rmtree(self.output)
-        os.mkdir(self.output)
+
+        if not isdir(self.output):
+            os.mkdir(self.output)
+
+        if self.incremental:
+            self.manifest = Manifest(self.output, self.manifest_options(),
+                                     journal=self.checkpoint)
+        else:
+            self.manifest = None
+
+        if self.manifest is not None and self.manifest.replayed:
+            self.log.info('Resuming a stopped run, {} variables and figures '
+                          'recovered from its journal'
+                          ''.format(self.manifest.replayed))
 
         # Variables in netcdfs that we want to ignore
         if 'ignore_vars' not in kwargs.keys():
@@ -71,14 +324,34 @@ class GoldCompare():
 
         # Initialize the data structure
         self.data = {}
-        self.initialize()
+
+        with self.profiler.stage('initialize'):
+            self.initialize()
+
+        # Keys in self.data whose gold and compare are known to be identical
+        self.identical = set()
+
+        # Cached (stats, preview), the timestep statistics and index cached
+        # with them and the content ids for each key in self.data
+        self.cached = {}
+        self.cached_extras = {}
+        self.cache_ids = {}
+
+        # Keys reused from the manifest, the file ids and variable digests of
+        # each key for updating it
+        self.unchanged = set()
+        self.manifest_ids = {}
+        self.digests = {}
+
+        # Keys recorded in the manifest during the current comparison
+        self.recorded = set()
 
     def read(self):
         '''
         Abstract function to be replaced by the type of comparison being done
-        The function should load in all data to be compared into dictionaries
-        of dictionaries where each sub dictionary has the keys
-        compare, gold, diff
+        The function should describe all data to be compared in self.data
+        where each entry is a goldmeister.lazy.Entry with the keys
+        compare, gold, difference
 
         .. code-block::
 
@@ -88,40 +361,403 @@ class GoldCompare():
                             difference: difference_array
                         }
 
+        The gold and compare are LazyVariables that are read when accessed.
         '''
 
         pass
 
-    def initialize(self):
+    def get_file_pairs(self):
+        '''
+        Abstract function to be replaced by the type of comparison being done.
+        Returns a list of (gold, compare) file paths that can be opened at the
+        same time, used when streaming.
+        '''
+
+        raise NotImplementedError("{} does not support streaming comparisons"
+                                  "".format(self.__class__.__name__))
+
+    def find_identical(self):
+        '''
+        Check each pair of files for identical content before reading any
+        data. Every variable of an identical pair is added to self.identical
+        so no numerical work is done on it.
+        '''
+        try:
+            pairs = self.get_file_pairs()
+        except (NotImplementedError, ValueError):
+            return
+
+        for gold_f, compare_f in pairs:
+            with self.profiler.stage('find_identical',
+                                     file=file_name(gold_f)):
+                identical = files_identical(gold_f, compare_f)
+
+            if identical:
+                name = file_name(gold_f)
+                self.log.info('{} is identical, skipping its variables'
+                              ''.format(name))
+
+                prefix = self.key.format(name, '')
+                self.identical.update([k for k in self.data.keys()
+                                       if k.startswith(prefix)])
+
+    def load_cached(self):
+        '''
+        Look up each file/variable in the cache. Cached statistics are stored
+        in self.cached and their data is never read. Variables with matching
+        cached digests on both sides are added to self.identical.
+        '''
+        if self.cache is None:
+            return
+
+        try:
+            pairs = self.get_file_pairs()
+        except (NotImplementedError, ValueError):
+            return
+
+        mode = self.cache_mode()
+
+        for gold_f, compare_f in pairs:
+            gold_id = content_id(gold_f)
+            compare_id = content_id(compare_f)
+            prefix = self.key.format(file_name(gold_f), '')
+
+            for key in [k for k in self.data.keys() if k.startswith(prefix)]:
+                if key in self.identical:
+                    continue
+
+                vname = key[len(prefix):]
+                self.cache_ids[key] = (gold_id, compare_id, vname)
+
+                stats, preview, extras = self.cache.get(gold_id, compare_id,
+                                                        vname, mode)
+                if stats is not None:
+                    # Identical data is reported as such, not as statistics
+                    if extras is not None and extras.get('identical'):
+                        self.identical.add(key)
+                    else:
+                        self.cached[key] = (OrderedDict(stats), preview)
+
+                    if extras is not None:
+                        self.cached_extras[key] = extras
+
+                    self.profiler.count('cache_hits')
+                    continue
+
+                self.profiler.count('cache_misses')
+
+                if self.subset:
+                    continue
+
+                digest = self.cache.get_digest(gold_id, vname)
+                if digest is not None and \
+                   digest == self.cache.get_digest(compare_id, vname):
+                    self.identical.add(key)
+
+        self.log.info('Found {} cached comparisons in {}'
+                      ''.format(len(self.cached), self.cache.path))
+
+    def manifest_options(self):
+        '''
+        Options changing what is recorded for a variable in the manifest
+        '''
+        return OrderedDict([('mode', self.cache_mode()),
+                            ('timestep_stats', self.timestep_stats),
+                            ('top_k', self.top_k)])
+
+    def load_manifest(self):
+        '''
+        Look up each file/variable in the manifest of the last run. Variables
+        whose gold and compare files are unchanged reuse the saved statistics
+        through self.cached and are added to self.unchanged, so their data is
+        never read and their figures are kept.
+        '''
+        if self.manifest is None:
+            return
+
+        try:
+            pairs = self.get_file_pairs()
+        except (NotImplementedError, ValueError):
+            return
+
+        for gold_f, compare_f in pairs:
+            ids = (self.manifest.file_id(gold_f),
+                   self.manifest.file_id(compare_f))
+            prefix = self.key.format(file_name(gold_f), '')
+
+            for key in [k for k in self.data.keys() if k.startswith(prefix)]:
+                self.manifest_ids[key] = ids
+                record = self.manifest.get(key, ids)
+
+                if record is None:
+                    continue
+
+                self.unchanged.add(key)
+
+                # Identical data is reported as such, not as statistics
+                if record.get('identical'):
+                    self.identical.add(key)
+                    self.cached.pop(key, None)
+
+                elif key not in self.identical and key not in self.cached:
+                    self.cached[key] = (OrderedDict(record['stats']), None)
+
+        self.log.info('{} of {} variables unchanged since the last run'
+                      ''.format(len(self.unchanged), len(self.data)))
+
+        # Saved with what the journal recovered before a new one is started
+        if self.checkpoint:
+            self.manifest.save()
+            self.manifest.start_journal()
+
+    def open_previews(self):
+        '''
+        Start the previews file of a comparison when previews are requested
+        '''
+        self.preview_store = None
+
+        if not self.previews:
+            return
+
+        if self.streaming:
+            self.log.warning('Previews are not made when streaming')
+            return
+
+        # Written through so what was added survives a stopped run
+        self.preview_store = PreviewStore(self.output, sync=self.checkpoint)
+
+    def add_preview(self, key, dd, stats):
+        '''
+        Add the previews of a variable when it differs
+
+        Args:
+            key: Key in self.data
+            dd: Array of the differences, None when identical
+            stats: Dictionary of the difference statistics
+        '''
+        if self.preview_store is None or dd is None or \
+           not has_differences(stats):
+            return
+
+        with self.profiler.stage('previews', key=key):
+            self.preview_store.add(key, dd, stats)
+
+    def close_previews(self, results):
+        '''
+        Finish the previews file, copying the previews of the variables
+        reused from the manifest of the last run
+
+        Args:
+            results: Dictionary of keys to entries from the comparison
+        '''
+        if self.preview_store is None:
+            return
+
+        self.preview_store.keep([k for k in results.keys()
+                                 if k in self.unchanged])
+        self.preview_path = self.preview_store.close()
+        self.preview_store = None
+
+        if self.preview_path is not None:
+            self.log.info('Previews written to {}'.format(self.preview_path))
+
+    def update_manifest(self, results):
+        '''
+        Record the comparisons made in the manifest and drop what is no longer
+        compared. Variables whose data digests match the last run keep their
+        figures even when their files changed.
+
+        Args:
+            results: Dictionary of keys to entries from compare
+        '''
+        if self.manifest is None:
+            return
+
+        for key, entry in results.items():
+            self.record_manifest(key, entry)
+
+        self.save_manifest()
+
+    def record_manifest(self, key, entry):
+        '''
+        Record the comparison of a single variable in the manifest
+
+        Args:
+            key: Key in self.data
+            entry: Entry with the statistics of the comparison
+
+        Returns:
+            unchanged: Boolean that is True when the variable is the same as
+                       in the last run
+        '''
+        if self.manifest is None or key in self.unchanged or \
+           key in self.recorded or key not in self.manifest_ids:
+            return key in self.unchanged
+
+        unchanged = self.manifest.update(key, self.manifest_ids[key],
+                                         entry['stats'],
+                                         digests=self.digests.get(key),
+                                         timesteps=entry.get('timesteps'),
+                                         index=entry.get('index'),
+                                         identical=key in self.identical)
+        self.recorded.add(key)
+
+        if unchanged:
+            self.unchanged.add(key)
+
+        return unchanged
+
+    def save_manifest(self):
+        if self.manifest is not None:
+            self.manifest.prune(self.data.keys())
+            self.manifest.save()
+
+    def current_figure(self, key, options):
+        '''
+        Returns:
+            path: Figure of key kept from the last run when the variable is
+                  unchanged and was drawn with the same options, else None
+        '''
+        if self.manifest is None or key not in self.unchanged:
+            return None
+
+        return self.manifest.figure(key, options)
+
+    def cached_entry(self, key):
+        '''
+        Returns:
+            entry: Entry of the cached statistics of key, with the timestep
+                   statistics and index saved in the manifest or the cache
+        '''
+        stats, preview = self.cached[key]
+        entry = Entry(stats=stats, preview=preview)
+
+        if key in self.unchanged:
+            record = self.manifest.variables[key]
+        else:
+            record = self.cached_extras.get(key)
+
+        if record is None:
+            return entry
+
+        if record.get('timesteps') is not None:
+            entry.timesteps = OrderedDict(
+                (k, np.ma.masked_invalid(v))
+                for k, v in record['timesteps'].items())
+
+        if record.get('index') is not None:
+            entry.index = DifferenceIndex.from_dict(record['index'],
+                                                    top_k=self.top_k)
+
+        return entry
+
+    def cache_mode(self):
+        '''
+        Streaming computes different statistics so it is cached separately,
+        as are runs keeping timestep statistics or an index and the
+        statistics of subsets
+        '''
+        if self.streaming:
+            mode = 'stream'
+        else:
+            mode = 'full'
+
+        if self.timestep_stats:
+            mode += '+timesteps'
+
+        if self.top_k is not None:
+            mode += '+top{}'.format(self.top_k)
+
+        if self.subset:
+            mode += '[{}]'.format(self.subset.signature())
+
+        return mode
+
+    def store_cached(self, key, stats, digests=None, difference=None,
+                     timesteps=None, index=None, identical=False):
+        '''
+        Add a comparison to the cache, with its preview and digests when the
+        data is available
+
+        Args:
+            key: Key in self.data
+            stats: Dictionary of the difference statistics
+            digests: Tuple of the gold and compare variable digests
+            difference: Array of the differences
+            timesteps: Dictionary of the statistics of each timestep
+            index: goldmeister.localize.DifferenceIndex
+            identical: Boolean indicating the data was found to be identical
+        '''
+        if digests is not None and self.manifest is not None:
+            self.digests[key] = digests
+
+        if self.cache is None or key not in self.cache_ids:
+            return
+
+        gold_id, compare_id, vname = self.cache_ids[key]
+        preview = None
+
+        # Digests are of whole variables, a subset's would be mistaken for one
+        if digests is not None and not self.subset:
+            self.cache.put_digest(gold_id, vname, digests[0])
+            self.cache.put_digest(compare_id, vname, digests[1])
+
+        if self.cache_previews and difference is not None and \
+           difference.ndim > 1:
+            preview = reduce_image(difference, 256)
+
+        extras = None
+        if timesteps is not None or index is not None or identical:
+            extras = OrderedDict([
+                ('timesteps', None if timesteps is None else plain(timesteps)),
+                ('index', None if index is None else index.to_dict()),
+                ('identical', identical)])
+
+        self.cache.put(gold_id, compare_id, vname, self.cache_mode(), stats,
+                       preview=preview, extras=extras)
+
+    def skip_read(self, key):
+        '''
+        Whether reading the data for key into memory can be skipped since it
+        is cached or identical and would be thrown away by only_report_nonzero
+        '''
+        if key in self.cached:
+            return True
+
+        return self.only_report_nonzero and key in self.identical
+
+    def initialize(self, files=None):
         '''
         Initialize the data dictionary by looking at the first set of gold
         files.
 
+        Args:
+            files: List of files to enumerate variables from, defaults to
+                   self.gold_files
         '''
+        if files is None:
+            files = self.gold_files
 
         self.log.info("Initializing data structure for {} files..."
-                      "".format(len(self.gold_files)))
-
-        empty_data = {'gold': None, 'compare': None, 'difference': None}
+                      "".format(len(files)))
 
         # Count how many images we are looking at
         n_gold_imgs = 0
 
-        # Loop over each file and variable, initialize the dictionary data
-        for f in self.gold_files:
-            name = basename(f)
-            ds = Dataset(f)
+        # Loop over each file and variable, initialize the dictionary data.
+        # Only the metadata is read, files are left open in the pool for later
+        for f in files:
+            name = file_name(f)
+            ds = self.pool.get(f)
 
-            for vname, v in ds.variables.items():
+            for vname in ds.variables.keys():
                 if vname not in self.ignore_vars:
                     n_gold_imgs += 1
-                    self.data[self.key.format(name, vname)] = empty_data.copy()
+                    self.data[self.key.format(name, vname)] = Entry()
 
-            ds.close()
-
-    def read_netcdf_data(self, files, is_gold=False):
+    def read_netcdf_data(self, files, is_gold=False, materialize=False):
         '''
-        Reads all netcdf files and then each variable which is added to
+        Describes all netcdf files and then each variable which is added to
         self.data in the convention of
 
         self.data[key] = {gold: np.array, compare: np.array, difference: np.array}
@@ -132,7 +768,9 @@ class GoldCompare():
 
         This function only populates the compare and gold subkeys. Use the
         boolean is_gold to assign to the gold subkey, otherwise the default
-        behavior assigns to the compare subkey.
+        behavior assigns to the compare subkey. Only the metadata is read, the
+        subkeys hold LazyVariables that read the data when accessed. Files
+        of any self.file_type are read, not only netCDF.
 
         To populate the difference subkey use self.compare.
 
@@ -141,6 +779,8 @@ class GoldCompare():
                 comparison.
             is_gold: Boolean indicating if the data set the basis for
                     comparison (compare - gold)
+            materialize: Boolean flag to read the data into memory now, for
+                         files that will be changed on disk before comparing
         '''
 
         if is_gold:
@@ -150,117 +790,645 @@ class GoldCompare():
 
         # Loop over each file and variable
         self.log.info('Reading {} data...'.format(input))
+
         for f in files:
             # Use the basename of the file for the naming convention
-            name = basename(f)
+            name = file_name(f)
+
+            # Describe each image in the data dictionary
+            ds = self.pool.get(f)
+
+            slices = None
+            if self.subset:
+                slices, self.coords[input][name] = \
+                    self.subset.dataset_slices(ds)
 
-            # Load in each image to the data dictionary
-            ds = Dataset(f)
             for vname, v in ds.variables.items():
+                key = self.key.format(name, vname)
+
                 # Ignore variable
                 if vname not in self.ignore_vars:
-                    self.log.debug('Adding {}'.format(vname))
-                    self.data[self.key.format(name, vname)][input] = v[:]
-            ds.close()
+                    self.log.debug('Adding %s', vname)
+                    self.dimensions[input][key] = tuple(v.dimensions)
+
+                    # Data read now is kept after the files change on disk
+                    handle = LazyVariable.from_variable(
+                        f, v, pool=self.pool,
+                        mapped=self.memory_map and not materialize,
+                        slices=slices)
+
+                    if materialize and not self.skip_read(key):
+                        with self.profiler.stage('read', key=key):
+                            self.data[key][input] = handle.read()
+                        self.profiler.count('bytes_read', handle.nbytes)
+                    elif not materialize:
+                        self.data[key][input] = handle
+
+        # Files are about to change on disk, don't keep them open
+        if materialize:
+            self.pool.close()
+
+        # The compare is always read after the gold
+        if not is_gold and self.subset.align:
+            self.align_data(files)
+
+    def align_data(self, files):
+        '''
+        Cut the gold and compare of each variable in files to the values of
+        the coordinates they share. Only the handles are narrowed, nothing
+        more is read.
+
+        Args:
+            files: List of the compare files just read
+        '''
+        for f in files:
+            name = file_name(f)
+
+            gold_align, compare_align = self.subset.align_slices(
+                self.coords['gold'].get(name, {}),
+                self.coords['compare'].get(name, {}))
+
+            if not gold_align:
+                continue
 
+            self.log.info('Aligning {} on {}'.format(
+                name, ', '.join(gold_align.keys())))
 
-    def compare(self):
+            prefix = self.key.format(name, '')
+
+            for key in [k for k in self.data.keys() if k.startswith(prefix)]:
+                data = self.data[key]
+                self.unaligned_gold.setdefault(key, data.gold)
+
+                for side, align in [('gold', gold_align),
+                                    ('compare', compare_align)]:
+                    d = getattr(data, side)
+                    index = tuple(align.get(dim, slice(None))
+                                  for dim in self.dimensions[side].get(key, ()))
+
+                    if isinstance(d, LazyVariable):
+                        d = d.narrow(index)
+                    elif d is not None:
+                        d = d[index]
+
+                    setattr(data, side, d)
+
+    def describe(self):
         '''
-        Compare gold files by subtracting gold from compare.
+        List what would be compared without reading any data
 
         Returns:
-            new_data: Dictionary of keys filenames/variables of dictionaries
-                      carrying the gold, compare, and difference arrays
+            variables: List of (key, gold shape, gold dtype) for each
+                       file/variable in self.data
         '''
-        new_data = {}
+        variables = []
 
         for name, data in self.data.items():
-            new_data[name] = data.copy()
+            gold = data.gold
 
-            f,v = name.split(':')
-            f = f.split('-')[-1]
-
-            pretty_title = 'File/variable: {}/{}'.format(f, v)
+            # Handles and arrays both carry their shape and dtype
+            if gold is None:
+                variables.append((name, None, None))
+            else:
+                variables.append((name, gold.shape, gold.dtype))
 
-            self.log.info("")
+        return variables
 
-            # Calculate the differences
-            dd = data['compare'] - data['gold']
-            stats = get_stats(dd)
+    def close(self):
+        '''
+        Close any files left open for reading data and remove the files of
+        differences handed back by workers. Results already returned stay
+        valid.
+        '''
+        self.pool.close()
+        self.close_shared()
 
-            # Log them
-            hdr = "{} Difference Statistics".format(pretty_title)
-            banner = '=' * len(hdr)
-            self.log.info(hdr)
-            self.log.info(banner)
+        # The journal of a checkpointed run is folded into the manifest, what
+        # was done is kept even when the run did not finish
+        if self.checkpoint:
+            self.manifest.save()
+            self.manifest.close_journal()
 
-            if self.only_report_nonzero and stats['mean'] == 0.0:
-                self.log.info('No differences to report')
-                del new_data[name]
+    def results_table(self, results, keep_entries=False):
+        '''
+        Collect the statistics of results into columns for filtering,
+        sorting and exporting
 
-            else:
-                new_data[name]['difference'] = dd
-                for s, v in stats.items():
-                    self.log.info('{:<30}{:<20}'.format(s, v))
+        Args:
+            results: Dictionary as returned from compare
+            keep_entries: Boolean flag to keep references to the arrays of
+                          each result, e.g. for plotting afterwards
 
-        return new_data
+        Returns:
+            table: goldmeister.results.ResultsTable
+        '''
+        return ResultsTable.from_results(results, keep_entries=keep_entries)
 
-    def plot_results(self, results, plot_original_data=False, show_plots=True,
-                                                     save_plots=True,
-                                                     include_hist=False):
+    def profile_report(self):
         '''
-        Generate the plots showing the differences
+        Returns:
+            report: goldmeister.profiling.ProfileReport of the time spent in
+                    each stage and on each file/variable so far. Empty unless
+                    profile was set.
+        '''
+        return self.profiler.report()
 
-        Dictionary of dictionaries,
+    def compare(self, as_table=False):
+        '''
+        Compare gold files by subtracting gold from compare.
 
         Args:
-            results: Dictionary as returned from compare for plotting
-            plot_original_data: Boolean indicating whether to add the original
-                                datasets to the subplots
-            show_plots: Boolean indicating where to plt.show() or not.
-            save_plots: Boolean where to save the figures to self.output
-            plot_only_nozero_diff: Flag for only plotting differences with a non-zero mean
-            include_hist: Flag for adding a histogram of the differences to the plot
+            as_table: Boolean flag to return only the statistics in a
+                      goldmeister.results.ResultsTable. The data arrays are
+                      dropped as soon as each variable is done.
+
+        Returns:
+            new_data: Dictionary of keys filenames/variables of dictionaries
+                      carrying the gold, compare, and difference arrays, or
+                      a ResultsTable when as_table
         '''
-        # Plot order
-        labels = ['difference']
+        self.report.clear()
+        self.recorded.clear()
+        self.open_previews()
+        self.close_shared()
 
-        # Add in a histogram of the plot
-        if include_hist:
-            labels.append('histogram')
+        if self.streaming:
+            with self.profiler.stage('stream_compare'):
+                new_data = self.stream_compare()
 
-        if plot_original_data:
-            # Add in the gold and compare images in the beginning
-            labels = ['gold','compare'] + labels
+        else:
+            with self.profiler.stage('compare'):
+                new_data = self._compare(stats_only=as_table)
 
-        ncols = len(labels)
+        self.update_manifest(new_data)
+        self.close_previews(new_data)
+        self.log_summary()
 
-        for name, data in results.items():
-            fig, axes = plt.subplots(1, ncols)
+        # Entries only carry statistics and indexes here, no arrays
+        if as_table:
+            return ResultsTable.from_results(new_data, keep_entries=True)
 
-            if ncols == 1:
-                axes = [axes]
+        return new_data
 
-            f, v = name.split(':')
-            fname = f.split('-')[-1]
-            variable = v
+    def _compare(self, stats_only=False):
+        new_data = {}
+        digests = self.cache is not None or self.manifest is not None
+        profile = self.profiler.enabled
+
+        todo = [n for n in self.data.keys()
+                if n not in self.identical and n not in self.cached]
+        store = self.open_shared(todo)
+
+        # Calculate the differences, lazily when serial to limit memory. The
+        # handles are passed so data is read where it is differenced.
+        tasks = ((self.data[n].gold, self.data[n].compare, digests,
+                  self.timestep_stats, profile, self.top_k,
+                  None if store is None else store.path(i))
+                 for i, n in enumerate(todo))
+
+        if self.workers > 1:
+            diffs = pool_imap(difference, tasks, self.workers)
+        else:
+            diffs = (difference(*args) for args in tasks)
 
-            fig_title = 'FILE: {}, Variable: {}'.format(fname, variable)
+        for name, data in self.data.items():
+            if name in self.cached:
+                stats, preview = self.cached[name]
+
+                if self.report_stats(name, stats):
+                    new_data[name] = self.cached_entry(name)
+                continue
+
+            if name not in self.identical:
+                dd, stats, hashes, timesteps, index, payload = next(diffs)
+                self.profiler.merge(payload, key=name)
+
+                # Map the worker's difference instead of copying it
+                if isinstance(dd, SharedMasked):
+                    store.add(name, dd)
+                    self.profiler.count('bytes_shared', dd.nbytes)
+                    dd = dd.array()
+                self.store_cached(name, stats, digests=hashes, difference=dd,
+                                  timesteps=timesteps, index=index,
+                                  identical=dd is None)
+                self.add_preview(name, dd, stats)
+
+                # Identical data needs no subtracting
+                if dd is None:
+                    self.identical.add(name)
+
+                if self.checkpoint:
+                    self.record_manifest(name, Entry(stats=stats,
+                                                     timesteps=timesteps,
+                                                     index=index))
+
+            if name in self.identical:
+                if stats_only:
+                    if self.report_stats(name, identical_stats(),
+                                         identical=True):
+                        new_data[name] = Entry(stats=identical_stats())
+                    continue
+
+                # Nothing is read until the zeros are plotted
+                if self.report_stats(name, identical_stats(), identical=True):
+                    new_data[name] = data.copy()
+                    new_data[name]['difference'] = ZeroDifference(data.gold)
+                    new_data[name]['stats'] = identical_stats()
+                continue
+
+            self.report_index(name, index)
+
+            if stats_only:
+                if self.report_stats(name, stats):
+                    new_data[name] = Entry(stats=stats, timesteps=timesteps,
+                                           index=index)
+                continue
+
+            if self.report_stats(name, stats):
+                new_data[name] = data.copy()
+                new_data[name]['index'] = index
+                new_data[name]['difference'] = dd
+                new_data[name]['stats'] = stats
+                new_data[name]['timesteps'] = timesteps
 
-            # If were plotting the input images
-            for i, ax in enumerate(axes):
-                # Which input are we using (gold, compare, etc..)
-                input = labels[i]
+        # Differences that were not kept are done with
+        if store is not None:
+            for key in store.keys():
+                if stats_only or key not in new_data:
+                    store.release(key)
 
-                # Handle the histogram, then grab the difference since histogram is not in the data structure
-                if input == 'histogram':
-                    d = data['difference']
-                else:
-                    d = data[input]
+        if self.cache is not None:
+            self.cache.evict()
 
-                self.log.debug('Plotting {} {}...'.format(variable, input))
+        return new_data
 
-                # Grab the dimensionality
+    def open_shared(self, keys):
+        '''
+        Start a SharedStore for the differences of keys when they are
+        computed by worker processes, replacing the store of the last
+        comparison
+
+        Args:
+            keys: Keys in self.data to be differenced
+
+        Returns:
+            store: goldmeister.shared.SharedStore or None
+        '''
+        self.close_shared()
+
+        if self.workers <= 1 or self.shared is None or len(keys) <= 1:
+            return None
+
+        # Room for the data and mask of every difference
+        nbytes = 0
+        for key in keys:
+            gold = self.data[key].gold
+            if gold is not None:
+                nbytes += gold.nbytes + int(np.prod(gold.shape))
+
+        self.shared_store = SharedStore(scratch_root(self.shared, self.output,
+                                                     nbytes=nbytes))
+        self.log.debug('Handing differences back through {}'
+                       ''.format(self.shared_store.directory))
+
+        return self.shared_store
+
+    def close_shared(self):
+        '''
+        Remove the files of the differences handed back by workers
+        '''
+        if self.shared_store is not None:
+            self.shared_store.close()
+            self.shared_store = None
+
+    def quick_compare(self):
+        '''
+        Compare only file checksums, variable lists, shapes, dtypes and
+        attributes. No variable data is read.
+
+        Returns:
+            report: Ordered dictionary of gold file names to a list of the
+                    differences found, empty when the files are identical
+        '''
+        return quick_compare_pairs(self.get_file_pairs(), self.pool,
+                                   ignore_vars=self.ignore_vars, log=self.log)
+
+    def verify(self, tolerances=None, stop_early=True):
+        '''
+        Check every file/variable against its tolerance without computing
+        statistics or plotting. Data is read block by block and each variable
+        stops at the first block outside its tolerance when stop_early.
+
+        Args:
+            tolerances: Dictionary of glob patterns to tolerances, defaults to
+                        self.tolerances
+            stop_early: Boolean flag to stop checking a variable at its first
+                        violation, only pass/fail is then exact
+
+        Returns:
+            tuple: Boolean that is True when everything passed and an ordered
+                   dictionary of keys to Verdicts
+        '''
+        if tolerances is None:
+            tolerances = self.tolerances
+
+        verdicts = OrderedDict()
+        tasks = []
+
+        for name, data in self.data.items():
+            tol = find_tolerance(name, tolerances)
+
+            if name in self.identical:
+                verdicts[name] = Verdict(name, tol, identical=True)
+                continue
+
+            # Cached differences within the absolute tolerance pass outright
+            if name in self.cached:
+                stats = self.cached[name][0]
+
+                if not has_differences(stats) or \
+                   ('max_abs' in stats and stats['max_abs'] <= tol.atol and
+                    not stats.get('nan') and not stats.get('mask_mismatch')):
+                    verdicts[name] = Verdict(name, tol,
+                                             max_abs=stats.get('max_abs', 0))
+                    continue
+
+            verdicts[name] = None
+            tasks.append((name, data.gold, data.compare, tol, self.max_memory,
+                          stop_early))
+
+        with self.profiler.stage('verify'):
+            checked = pool_map(check_variable, tasks, self.workers)
+
+        for verdict in checked:
+            verdicts[verdict.key] = verdict
+
+        passed, failed = summarize_verdicts(verdicts)
+
+        for name, verdict in failed.items():
+            self.log.error('{} failed: {}, first at {}, max abs difference {}'
+                           ''.format(name, verdict.reason,
+                                     verdict.first_violation,
+                                     verdict.max_abs))
+
+        self.log.info('{} of {} variables within tolerance'
+                      ''.format(len(verdicts) - len(failed), len(verdicts)))
+
+        return passed, verdicts
+
+    def stream_compare(self):
+        '''
+        Compare gold files block by block so no more than roughly
+        self.max_memory bytes are held for a variable at any time, per worker.
+        Differences are not kept, only the statistics.
+
+        Returns:
+            new_data: Dictionary of keys filenames/variables of dictionaries
+                      carrying the difference statistics under stats
+        '''
+        new_data = {}
+
+        pairs = self.get_file_pairs()
+        tasks = []
+
+        # Each task opens its pair of files once for all of its variables.
+        # Pairs are split so there is a task for each worker.
+        per_pair = 1
+        if self.workers > 1:
+            per_pair = -(-self.workers // max(1, len(pairs)))
+
+        for gold_f, compare_f in pairs:
+            name = file_name(gold_f)
+            self.log.info('Streaming {} in blocks of {} bytes...'
+                          ''.format(name, self.max_memory))
+
+            variables = []
+
+            for vname in list_variables(gold_f, self.ignore_vars,
+                                        self.file_type):
+                key = self.key.format(name, vname)
+
+                if key not in self.identical and key not in self.cached:
+                    data = self.data[key]
+                    selections = (getattr(data.gold, 'selection', None),
+                                  getattr(data.compare, 'selection', None))
+                    variables.append((key, vname, selections))
+
+            size = max(1, -(-len(variables) // per_pair))
+
+            for i in range(0, len(variables), size):
+                tasks.append((gold_f, compare_f, variables[i:i + size],
+                              self.max_memory, self.profiler.enabled,
+                              self.top_k, self.memory_map, self.file_type))
+
+        # Results are taken as each task finishes to checkpoint them
+        all_stats = pool_imap(stream_differences, tasks, self.workers)
+
+        for key in [k for k in self.data.keys() if k in self.identical]:
+            if self.report_stats(key, identical_stats(), identical=True):
+                new_data[key] = Entry(stats=identical_stats())
+
+        for key, (stats, preview) in self.cached.items():
+            if self.report_stats(key, stats):
+                new_data[key] = self.cached_entry(key)
+
+        for results, payload in all_stats:
+            self.profiler.merge(payload)
+
+            for key, stats, index in results:
+                self.store_cached(key, stats, index=index)
+                self.report_index(key, index)
+
+                entry = Entry(stats=stats, index=index)
+                if self.checkpoint:
+                    self.record_manifest(key, entry)
+
+                if self.report_stats(key, stats):
+                    new_data[key] = entry
+
+        if self.cache is not None:
+            self.cache.evict()
+
+        return new_data
+
+    def write_index(self, results, path=None):
+        '''
+        Write where the differences of each file/variable are to JSON
+
+        Args:
+            results: Dictionary as returned from compare with locate set
+            path: File to write, default is locations.json in the output
+
+        Returns:
+            path: File written
+        '''
+        if path is None:
+            path = join(self.output, 'locations.json')
+
+        locations = OrderedDict()
+        for name, data in results.items():
+            index = data.get('index')
+
+            if index is not None and index.first_step is not None:
+                locations[name] = index.to_dict()
+
+        with open(path, 'w') as fp:
+            json.dump(locations, fp, indent=2)
+
+        self.log.info('Locations of differences written to {}'.format(path))
+
+        return path
+
+    def report_index(self, name, index):
+        '''
+        Log where the differences of a file/variable start
+
+        Args:
+            name: Key in self.data of the file/variable
+            index: goldmeister.localize.DifferenceIndex or None
+        '''
+        if index is None or index.first_step is None:
+            return
+
+        self.report.add_index(name, index)
+
+        if not self.verbose or not self.log.isEnabledFor(logging.INFO):
+            return
+
+        top = index.top()
+        largest = ', largest {:.6g} at {}'.format(*top[0]) if top else ''
+
+        self.log.info('%s differs in %s timesteps from %s to %s within rows '
+                      'and columns %s%s', name, len(index.steps),
+                      index.first_step, index.last_step, index.extent,
+                      largest)
+
+    def report_stats(self, name, stats, identical=False):
+        '''
+        Record the difference statistics for a single file/variable in
+        self.report, logging them right away when verbose
+
+        Args:
+            name: Key in self.data of the file/variable
+            stats: Dictionary of statistics on the differences
+            identical: Boolean indicating the data was found to be identical
+
+        Returns:
+            bool: False if the differences should not be reported because
+                  only_report_nonzero is set and there are no differences
+        '''
+        reported = not (self.only_report_nonzero and
+                        not has_differences(stats))
+
+        self.report.add(name, stats, identical=identical, reported=reported)
+
+        if self.verbose and self.log.isEnabledFor(logging.INFO):
+            self.log_stats(name, stats, identical=identical,
+                           reported=reported)
+
+        return reported
+
+    def log_stats(self, name, stats, identical=False, reported=True):
+        '''
+        Log the difference statistics for a single file/variable
+        '''
+        f,v = name.split(':')
+        f = f.split('-')[-1]
+
+        pretty_title = 'File/variable: {}/{}'.format(f, v)
+
+        self.log.info("")
+
+        # Log them
+        hdr = "{} Difference Statistics".format(pretty_title)
+        banner = '=' * len(hdr)
+        self.log.info(hdr)
+        self.log.info(banner)
+
+        if not reported:
+            self.log.info('No differences to report')
+            return
+
+        if identical:
+            self.log.info('Identical')
+            return
+
+        for s, v in stats.items():
+            self.log.info('%-30s%-20s', s, v)
+
+    def log_summary(self):
+        '''
+        Log the statistics recorded in self.report as one table. The table
+        is only built when INFO messages are logged.
+        '''
+        if len(self.report):
+            self.log.info('Difference statistics\n%s', self.report)
+
+    def plot_results(self, results, plot_original_data=False, show_plots=True,
+                                                     save_plots=True,
+                                                     include_hist=False):
+        '''
+        Generate the plots showing the differences
+
+        Dictionary of dictionaries,
+
+        Args:
+            results: Dictionary as returned from compare for plotting
+            plot_original_data: Boolean indicating whether to add the original
+                                datasets to the subplots
+            show_plots: Boolean indicating where to plt.show() or not.
+            save_plots: Boolean where to save the figures to self.output
+            plot_only_nozero_diff: Flag for only plotting differences with a non-zero mean
+            include_hist: Flag for adding a histogram of the differences to the plot
+        '''
+        # Imported here so text only comparisons don't pay for matplotlib
+        import matplotlib.pyplot as plt
+
+        # Plot order
+        labels = ['difference']
+
+        # Add in a histogram of the plot
+        if include_hist:
+            labels.append('histogram')
+
+        if plot_original_data:
+            # Add in the gold and compare images in the beginning
+            labels = ['gold','compare'] + labels
+
+        ncols = len(labels)
+
+        for name, data in results.items():
+            if data['difference'] is None:
+                self.log.warning('No data kept for {}, skipping plot'
+                                 ''.format(name))
+                continue
+
+            start = time.perf_counter()
+            fig, axes = plt.subplots(1, ncols)
+
+            if ncols == 1:
+                axes = [axes]
+
+            f, v = name.split(':')
+            fname = f.split('-')[-1]
+            variable = v
+
+            fig_title = 'FILE: {}, Variable: {}'.format(fname, variable)
+
+            # If were plotting the input images
+            for i, ax in enumerate(axes):
+                # Which input are we using (gold, compare, etc..)
+                input = labels[i]
+
+                # Handle the histogram, then grab the difference since histogram is not in the data structure
+                if input == 'histogram':
+                    d = data['difference']
+                else:
+                    d = data[input]
+
+                self.log.debug('Plotting %s %s...', variable, input)
+
+                # Grab the dimensionality
                 nd = len(d.shape)
 
                 # 3D assume time is the first dimension, take the mean
@@ -316,6 +1484,347 @@ class GoldCompare():
                 plt.show()
             plt.close()
 
+            self.profiler.add('plot_results', start,
+                              time.perf_counter() - start, key=name)
+
+
+    def render_results(self, results, plot_original_data=False,
+                       include_hist=False, max_size=1000, workers=None):
+        '''
+        Render the difference figures without a display, in parallel. Produces
+        the same figures and filenames as plot_results with save_plots but
+        large grids are decimated to max_size pixels per side before drawing.
+
+        Args:
+            results: Dictionary as returned from compare for plotting
+            plot_original_data: Boolean indicating whether to add the original
+                                datasets to the subplots
+            include_hist: Flag for adding a histogram of the differences to
+                          the plot
+            max_size: Maximum number of pixels along a side of an image, None
+                      to plot at full resolution
+            workers: Number of processes to render with, defaults to
+                     self.workers
+
+        Returns:
+            files: List of the figures written
+        '''
+        if workers is None:
+            workers = self.workers
+
+        labels = self.plot_labels(plot_original_data, include_hist)
+        options = [plot_original_data, include_hist, max_size]
+        tasks = []
+        keys = []
+        files = []
+
+        for name, data in results.items():
+            # Figures of unchanged variables are kept from the last run
+            path = self.current_figure(name, options)
+            if path is not None:
+                files.append(path)
+                continue
+
+            # Rendering processes map differences handed back by workers
+            shared = None
+            if self.shared_store is not None and workers > 1:
+                shared = self.shared_store.get(name)
+
+            task = self.figure_task(name, self.figure_entry(name, data),
+                                    labels, plot_original_data, max_size,
+                                    shared=shared)
+            if task is not None:
+                tasks.append(task)
+                keys.append(name)
+
+        self.log.info("Rendering {} figures to {}, keeping {} unchanged"
+                      "".format(len(tasks), self.output, len(files)))
+
+        rendered = []
+
+        # Each figure is recorded as it is written, checkpointed runs
+        # journal it right away
+        with self.profiler.stage('render_results'):
+            for key, path in zip(keys, pool_imap(render_figure, tasks,
+                                                 workers)):
+                rendered.append(path)
+
+                if self.manifest is not None:
+                    self.manifest.add_figure(key, path, options)
+
+        if self.shared_store is not None:
+            for key in keys:
+                self.shared_store.release(key)
+
+        if self.manifest is not None:
+            self.manifest.save()
+
+        return files + rendered
+
+    def plot_labels(self, plot_original_data=False, include_hist=False):
+        '''
+        Returns:
+            labels: List of the panels in a figure in plot order
+        '''
+        labels = ['difference']
+
+        if include_hist:
+            labels.append('histogram')
+
+        if plot_original_data:
+            labels = ['gold', 'compare'] + labels
+
+        return labels
+
+    def figure_task(self, name, data, labels, plot_original_data=False,
+                    max_size=1000, shared=None):
+        '''
+        Reduce the data of a result to what is drawn in its figure
+
+        Args:
+            name: Key of the result
+            data: Entry with the difference, gold and compare data
+            labels: Panels to draw from plot_labels
+            plot_original_data: Boolean indicating whether the original
+                                datasets are drawn
+            max_size: Maximum number of pixels along a side of an image
+            shared: goldmeister.shared.SharedMasked of the difference, its
+                    panels are then reduced in the rendering process
+
+        Returns:
+            task: Tuple of arguments for render_figure, None when there is
+                  no data to draw
+        '''
+        # Cached results may only have a preview of the difference
+        difference = data['difference']
+        if difference is None and not plot_original_data:
+            difference = data.get('preview')
+
+        if difference is None:
+            self.log.warning('No data kept for {}, skipping plot'
+                             ''.format(name))
+            return None
+
+        f, v = name.split(':')
+        fname = f.split('-')[-1]
+
+        fig_title = 'FILE: {}, Variable: {}'.format(fname, v)
+        # Variables in groups, e.g. of a Zarr store, have a path for a name
+        path = join(self.output,
+                    "_".join([fname, v.replace('/', '_')]) + '.png')
+
+        # Reduce the data to what is drawn before handing it off
+        panels = []
+        for label in labels:
+            if label in ['histogram', 'difference']:
+                if shared is not None:
+                    panels.append({'label': label, 'shared': shared,
+                                   'max_size': max_size})
+                    continue
+
+                d = difference
+            else:
+                d = data[label]
+
+            panels.append(prepare_panel(d, label, max_size=max_size))
+
+        return (path, fig_title, panels, plot_original_data)
+
+    def figure_entry(self, key, data):
+        '''
+        Data to draw for a result. Unchanged variables reused from the
+        manifest only carry statistics, so their difference is made again
+        when there is no figure to keep.
+
+        Args:
+            key: Key in self.data
+            data: Entry from the results
+
+        Returns:
+            data: Entry with the difference to draw
+        '''
+        if key not in self.unchanged or data['difference'] is not None or \
+           data.get('preview') is not None:
+            return data
+
+        source = self.data[key]
+        if source.gold is None or source.compare is None:
+            return data
+
+        gold = materialize(source.gold)
+        compare = materialize(source.compare)
+        dd = difference(gold, compare)[0]
+
+        # Identical data is drawn as zeros, the same as compare
+        if dd is None:
+            dd = np.ma.array(np.zeros(gold.shape, dtype=gold.dtype),
+                             mask=np.ma.getmask(gold))
+
+        return Entry(gold=gold, compare=compare, difference=dd,
+                     stats=data['stats'])
+
+    def render_entry(self, name, data, labels, plot_original_data=False,
+                     max_size=1000):
+        '''
+        Reduce and render the figure of a single result
+
+        Returns:
+            path: Figure written, None when there was nothing to draw
+        '''
+        task = self.figure_task(name, data, labels, plot_original_data,
+                                max_size)
+        if task is None:
+            return None
+
+        return render_figure(*task)
+
+    def pipeline_compare(self, render=False, plot_original_data=False,
+                         include_hist=False, max_size=1000, as_table=False):
+        '''
+        Compare and optionally render with reading, differencing and
+        rendering overlapped. The next self.prefetch variables are read in
+        one thread while the current one is differenced and the previous ones
+        are rendered in another. Only the statistics are kept so memory is
+        bounded by the few variables in flight. Identical variables are not
+        rendered.
+
+        Args:
+            render: Boolean flag to render the figure of each difference
+            plot_original_data: Boolean indicating whether to add the original
+                                datasets to the figures
+            include_hist: Flag for adding a histogram of the differences
+            max_size: Maximum number of pixels along a side of an image
+            as_table: Boolean flag to return a ResultsTable
+
+        Returns:
+            new_data: Dictionary of keys to entries carrying the statistics,
+                      or a ResultsTable when as_table
+        '''
+        if self.streaming:
+            self.log.warning('Streaming comparisons are not pipelined')
+            return self.compare(as_table=as_table)
+
+        new_data = {}
+        digests = self.cache is not None or self.manifest is not None
+        profile = self.profiler.enabled
+        labels = self.plot_labels(plot_original_data, include_hist)
+        options = [plot_original_data, include_hist, max_size]
+
+        self.report.clear()
+        self.recorded.clear()
+        self.open_previews()
+        self.close_shared()
+
+        def render_entry(name, *args):
+            path = self.render_entry(name, *args)
+
+            # Recorded from the render thread as soon as it is written
+            if path is not None and self.manifest is not None:
+                self.manifest.add_figure(name, path, options)
+
+            return path
+
+        renderer = None
+        if render:
+            renderer = BackgroundWorker(render_entry,
+                                        maxsize=self.prefetch,
+                                        name='goldmeister-render')
+
+        todo = [n for n in self.data.keys()
+                if n not in self.identical and n not in self.cached]
+
+        def read(name):
+            start = time.perf_counter()
+            data = self.data[name]
+            gold = materialize(data.gold)
+            compare = materialize(data.compare)
+
+            return name, gold, compare, start, time.perf_counter() - start
+
+        reads = prefetch(read, todo, depth=self.prefetch)
+
+        with self.profiler.stage('pipeline_compare'):
+            for name in self.data.keys():
+                if name in self.cached:
+                    stats, preview = self.cached[name]
+
+                    if self.report_stats(name, stats):
+                        new_data[name] = self.cached_entry(name)
+                        self.record_manifest(name, new_data[name])
+
+                        if not render or \
+                           self.current_figure(name, options) is not None:
+                            continue
+
+                        data = self.figure_entry(name, new_data[name])
+
+                        if data['difference'] is not None or \
+                           (preview is not None and not plot_original_data):
+                            renderer.submit(name, data, labels,
+                                            plot_original_data, max_size)
+                    continue
+
+                if name in self.identical:
+                    if self.report_stats(name, identical_stats(),
+                                         identical=True):
+                        new_data[name] = Entry(stats=identical_stats())
+                        self.record_manifest(name, new_data[name])
+                    continue
+
+                key, gold, compare, start, seconds = next(reads)
+                self.profiler.add('prefetch', start, seconds, key=name)
+
+                dd, stats, hashes, timesteps, index, payload = difference(
+                    gold, compare, digests, self.timestep_stats, profile,
+                    self.top_k)
+
+                self.profiler.merge(payload, key=name)
+                self.store_cached(name, stats, digests=hashes, difference=dd,
+                                  timesteps=timesteps, index=index,
+                                  identical=dd is None)
+                self.add_preview(name, dd, stats)
+                self.report_index(name, index)
+
+                if dd is None:
+                    self.identical.add(name)
+
+                entry = Entry(stats=stats, timesteps=timesteps, index=index)
+                reported = self.report_stats(name, stats,
+                                             identical=dd is None)
+
+                # Checkpoints also record what is not reported
+                if reported or self.checkpoint:
+                    self.record_manifest(name, entry)
+
+                if reported:
+                    new_data[name] = entry
+
+                    if render and dd is not None and \
+                       self.current_figure(name, options) is None:
+                        renderer.submit(name, Entry(gold=gold, compare=compare,
+                                                    difference=dd),
+                                        labels, plot_original_data, max_size)
+
+                # Drop the arrays before the next variable arrives
+                del gold, compare, dd
+
+            if renderer is not None:
+                files = renderer.close()
+                self.log.info("Rendered {} figures to {}".format(
+                    len([f for f in files if f is not None]), self.output))
+
+        self.save_manifest()
+        self.close_previews(new_data)
+        self.log_summary()
+
+        if self.cache is not None:
+            self.cache.evict()
+
+        if as_table:
+            return ResultsTable.from_results(new_data, keep_entries=True)
+
+        return new_data
+
 
 class GoldGitBranchCompare(GoldCompare):
     '''
@@ -325,37 +1834,140 @@ class GoldGitBranchCompare(GoldCompare):
     Use branch names or hashes.
     '''
     def __init__(self, **kwargs):
-        super(GoldGitBranchCompare, self).__init__(**kwargs)
-
+        '''
+        Args:
+            repo_path: Path to the git repository holding the gold files
+            old_branch: Revision used as the gold
+            new_branch: Revision compared against the gold
+            checkout: Boolean flag to check out each branch and read the
+                      working tree into memory. When False the gold files
+                      are read lazily, straight from the git objects, so
+                      any revision (hash, tag, etc.) can be used and the
+                      working tree is left untouched. Default is True.
+            blob_cache: Directory to write blobs to when not checking out,
+                        by default they are opened from memory. Directories,
+                        e.g. Zarr stores, are always written out, by default
+                        to goldmeister.gitobjects.TREE_CACHE.
+        '''
         path = abspath(expanduser(kwargs['repo_path']))
         new_branch = kwargs['new_branch']
         old_branch = kwargs['old_branch']
 
-        # Git Management
+        if 'checkout' in kwargs.keys():
+            self.checkout = kwargs['checkout']
+        else:
+            self.checkout = True
+
+        if 'blob_cache' in kwargs.keys() and kwargs['blob_cache'] is not None:
+            self.blob_cache = abspath(expanduser(kwargs['blob_cache']))
+        else:
+            self.blob_cache = None
+
+        import pygit2
+
+        # Git Management, done before initializing so blobs can be used
         self.repo = pygit2.Repository(path)
-        self.new_branch = self.repo.branches[new_branch]
-        self.old_branch = self.repo.branches[old_branch]
-        self.read()
+
+        if self.checkout:
+            self.new_branch = self.repo.branches[new_branch]
+            self.old_branch = self.repo.branches[old_branch]
+            self.new_commit = self.new_branch.peel(pygit2.Commit)
+            self.old_commit = self.old_branch.peel(pygit2.Commit)
+
+        else:
+            self.new_commit = resolve_commit(self.repo, new_branch)
+            self.old_commit = resolve_commit(self.repo, old_branch)
+
+        super(GoldGitBranchCompare, self).__init__(**kwargs)
+
+        if self.streaming and self.checkout:
+            emsg = ("Streaming comparisons need both revisions on disk at "
+                    "once, use checkout=False to read from git objects")
+            self.log.error(emsg)
+            raise ValueError(emsg)
+
+        self.find_identical()
+
+        with self.profiler.stage('load_cached'):
+            self.load_cached()
+            self.load_manifest()
+
+        with self.profiler.stage('read_netcdf_data'):
+            self.read()
+
+    def blob_files(self, commit):
+        '''
+        Find each gold file in a commit
+
+        Args:
+            commit: pygit2.Commit to find the files in
+
+        Returns:
+            files: List of BlobFile, one for each of self.gold_files
+        '''
+        files = []
+
+        for f in self.gold_files:
+            rel_path = os.path.relpath(f, self.repo.workdir)
+            files.append(BlobFile(self.repo, commit, rel_path,
+                                  cache_dir=self.blob_cache))
+
+        return files
+
+    def initialize(self, files=None):
+        '''
+        Initialize the data dictionary from the gold revision in the git
+        objects. The working tree is not opened since it holds whichever
+        branch is checked out and is replaced on checkout.
+        '''
+        if files is None:
+            files = self.blob_files(self.old_commit)
+
+        super(GoldGitBranchCompare, self).initialize(files=files)
+
+    def get_file_pairs(self):
+        '''
+        Pair the gold files in the old revision with the new revision. These
+        are always read from the git objects, even when checking out.
+        '''
+        return list(zip(self.blob_files(self.old_commit),
+                        self.blob_files(self.new_commit)))
 
     def read(self):
         '''
         Read in all the netcdfs into memory assign to the dictionary data
         '''
 
+        if not self.checkout:
+            for i, commit in enumerate([self.old_commit, self.new_commit]):
+                self.log.info("Reading gold files from commit {}..."
+                              "".format(str(commit.id)[:8]))
+                self.read_netcdf_data(self.blob_files(commit),
+                                      is_gold=(i == 0))
+            return
+
         # Loop over the two branches and store the data
         for i, br in enumerate([self.old_branch, self.new_branch]):
             self.log.info("Checking out branch {}...".format(br.branch_name))
-            self.repo.checkout(br)
 
-            # The old branch is the basis for comparison, e.g. gold file
+            # Datasets left open would keep reading the replaced files
+            self.pool.close()
+
+            with self.profiler.stage('checkout', branch=br.branch_name):
+                self.repo.checkout(br)
+
+            # The old branch is the basis for comparison, e.g. gold file. It
+            # is read now since the next checkout replaces the files.
             if i == 0:
                 is_gold = True
 
-            # The new branch is the comparator
+            # The new branch is the comparator, also read now so no file in
+            # the working tree is left open for a later checkout to replace
             else:
                 is_gold = False
 
-            self.read_netcdf_data(self.gold_files, is_gold=is_gold)
+            self.read_netcdf_data(self.gold_files, is_gold=is_gold,
+                                  materialize=True)
 
 class GoldFilesCompare(GoldCompare):
     '''
@@ -377,7 +1989,21 @@ class GoldFilesCompare(GoldCompare):
             self.log.error(emsg)
             raise ValueError(emsg)
 
-        self.read()
+        self.find_identical()
+
+        with self.profiler.stage('load_cached'):
+            self.load_cached()
+            self.load_manifest()
+
+        # Streaming reads the data during the comparison instead
+        with self.profiler.stage('read_netcdf_data'):
+            self.read()
+
+    def get_file_pairs(self):
+        '''
+        Pair up each gold file with its compare file
+        '''
+        return list(zip(self.gold_files, self.compare_files))
 
     def read(self):
         '''
@@ -398,3 +2024,393 @@ class GoldFilesCompare(GoldCompare):
                 files = self.compare_files
 
             self.read_netcdf_data(files, is_gold=is_gold)
+
+
+class GoldRevisionsCompare(GoldGitBranchCompare):
+    '''
+    Compare one gold revision against many others. The gold files are read
+    from the git objects once and kept for every revision, files with the
+    same content as the gold are skipped without reading them. Results for
+    each revision go in a subdirectory of the output named after it along
+    with a summary.csv of every revision.
+    '''
+    def __init__(self, **kwargs):
+        '''
+        Args:
+            repo_path: Path to the git repository holding the gold files
+            old_branch: Revision used as the gold
+            new_branches: List of revisions compared against the gold, e.g.
+                          branches, tags or hashes
+            blob_cache: Directory to write blobs to, by default they are
+                        opened from memory and directories are written to
+                        goldmeister.gitobjects.TREE_CACHE
+        '''
+        self.revisions = list(kwargs['new_branches'])
+
+        if not self.revisions:
+            raise ValueError("At least one revision to compare is required")
+
+        # The gold is always read from git objects so it is read once
+        kwargs['new_branch'] = self.revisions[0]
+        kwargs['checkout'] = False
+
+        # Each revision is written to its own directory
+        kwargs['incremental'] = False
+        kwargs['checkpoint'] = False
+
+        self.revision = self.revisions[0]
+        self.gold_read = False
+
+        super(GoldRevisionsCompare, self).__init__(**kwargs)
+
+    def read(self):
+        '''
+        Read the gold revision the first time and describe the current
+        revision being compared. The gold data needed by the current
+        revision is held in memory so later revisions reuse it, unless
+        streaming.
+        '''
+        if not self.gold_read:
+            self.log.info("Reading gold files from commit {}..."
+                          "".format(str(self.old_commit.id)[:8]))
+            self.read_netcdf_data(self.blob_files(self.old_commit),
+                                  is_gold=True)
+            self.gold_read = True
+
+        # Each revision is aligned with the gold as it was read, a gold cut
+        # to an earlier revision is read again
+        for key, gold in self.unaligned_gold.items():
+            self.data[key].gold = gold
+
+        self.unaligned_gold = {}
+
+        self.log.info("Reading {} from commit {}..."
+                      "".format(self.revision, str(self.new_commit.id)[:8]))
+        self.read_netcdf_data(self.blob_files(self.new_commit), is_gold=False)
+
+        if self.streaming:
+            return
+
+        for key, data in self.data.items():
+            if key in self.identical or key in self.cached:
+                continue
+
+            if isinstance(data.gold, LazyVariable):
+                with self.profiler.stage('read', key=key):
+                    data.gold = data.gold.read()
+                self.profiler.count('bytes_read', data.gold.nbytes)
+
+    def use_revision(self, revision):
+        '''
+        Switch the revision compared against the gold
+
+        Args:
+            revision: Revision to compare, e.g. a branch, tag or hash
+        '''
+        if revision == self.revision:
+            return
+
+        self.revision = revision
+        self.new_branch = revision
+        self.new_commit = resolve_commit(self.repo, revision)
+
+        self.identical = set()
+        self.cached = {}
+        self.cached_extras = {}
+        self.cache_ids = {}
+        self.unchanged = set()
+        self.manifest_ids = {}
+        self.digests = {}
+        self.recorded = set()
+
+        self.find_identical()
+
+        with self.profiler.stage('load_cached'):
+            self.load_cached()
+            self.load_manifest()
+
+        with self.profiler.stage('read_netcdf_data'):
+            self.read()
+
+    def revision_output(self, revision):
+        '''
+        Returns:
+            path: Directory for the results of a revision
+        '''
+        name = revision.replace('/', '_').replace(os.sep, '_')
+        return join(self.output, name)
+
+    def write_stats(self, path, results):
+        '''
+        Write the statistics of each file/variable to a CSV
+
+        Args:
+            path: CSV file to write
+            results: Dictionary as returned from compare
+        '''
+        columns = []
+        for data in results.values():
+            for s in data['stats'].keys():
+                if s not in columns:
+                    columns.append(s)
+
+        with open(path, 'w', newline='') as fp:
+            writer = csv.writer(fp)
+            writer.writerow(['key'] + columns)
+
+            for key, data in results.items():
+                stats = data['stats']
+                writer.writerow([key] + [stats.get(s, '') for s in columns])
+
+    def compare_revisions(self, render=False, plot_original_data=False,
+                          include_hist=False, max_size=1000):
+        '''
+        Compare every revision against the gold in turn, writing the
+        statistics and optionally figures of each to its own directory.
+        Only the statistics are kept between revisions.
+
+        Args:
+            render: Boolean flag to render figures of each revision
+            plot_original_data: Boolean indicating whether to add the original
+                                datasets to the figures
+            include_hist: Flag for adding a histogram of the differences
+            max_size: Maximum number of pixels along a side of an image
+
+        Returns:
+            summary: Ordered dictionary of revisions to an ordered dictionary
+                     of the statistics of each file/variable
+        '''
+        summary = OrderedDict()
+        output = self.output
+
+        for revision in self.revisions:
+            self.use_revision(revision)
+            results = self.compare()
+
+            rev_output = self.revision_output(revision)
+            os.makedirs(rev_output, exist_ok=True)
+            self.write_stats(join(rev_output, 'stats.csv'), results)
+
+            if self.preview_path is not None:
+                self.preview_path = shutil.move(
+                    self.preview_path,
+                    join(rev_output, basename(self.preview_path)))
+
+            if render:
+                # Figures are written to self.output
+                self.output = rev_output
+                try:
+                    self.render_results(results,
+                                        plot_original_data=plot_original_data,
+                                        include_hist=include_hist,
+                                        max_size=max_size)
+                finally:
+                    self.output = output
+
+            summary[revision] = OrderedDict((k, d['stats'])
+                                            for k, d in results.items())
+
+        self.write_summary(join(self.output, 'summary.csv'), summary)
+
+        return summary
+
+    def write_summary(self, path, summary):
+        '''
+        Write and log a table with a row for each revision
+
+        Args:
+            path: CSV file to write
+            summary: Dictionary as returned from compare_revisions
+        '''
+        columns = ['revision', 'variables', 'differing', 'max_abs',
+                   'largest']
+        rows = []
+
+        for revision, stats in summary.items():
+            differing = [k for k, s in stats.items() if has_differences(s)]
+            largest = None
+            max_abs = 0.0
+
+            for k in differing:
+                s = stats[k]
+                v = s.get('max_abs', max(abs(s['max']), abs(s['min'])))
+
+                if v >= max_abs:
+                    largest = k
+                    max_abs = v
+
+            rows.append([revision, len(stats), len(differing), max_abs,
+                         largest or ''])
+
+        with open(path, 'w', newline='') as fp:
+            writer = csv.writer(fp)
+            writer.writerow(columns)
+            writer.writerows(rows)
+
+        self.log.info('')
+        self.log.info('{:<30}{:>10}{:>10}{:>14}  {}'.format(*columns))
+
+        for row in rows:
+            self.log.info('{:<30}{:>10}{:>10}{:>14.6g}  {}'.format(*row))
+
+        self.log.info('Summary written to {}'.format(path))
+
+
+class GoldHistoryCompare(GoldRevisionsCompare):
+    '''
+    Follow how gold files drifted over a range of commits. Only commits
+    where a gold file's blob changed are compared, each against the start
+    of the range, giving a time series of the drift of each file/variable.
+    '''
+    def __init__(self, **kwargs):
+        '''
+        Args:
+            repo_path: Path to the git repository holding the gold files
+            old_branch: Revision the range starts after, used as the gold
+            new_branch: Revision the range ends at. Default is HEAD.
+            first_parent: Boolean flag to only follow the first parent of
+                          merges. Default is True.
+            blob_cache: Directory to write blobs to, by default they are
+                        opened from memory and directories are written to
+                        goldmeister.gitobjects.TREE_CACHE
+        '''
+        import pygit2
+
+        repo = pygit2.Repository(abspath(expanduser(kwargs['repo_path'])))
+
+        if 'new_branch' in kwargs.keys() and kwargs['new_branch'] is not None:
+            end = kwargs['new_branch']
+        else:
+            end = 'HEAD'
+
+        if 'first_parent' in kwargs.keys():
+            first_parent = kwargs['first_parent']
+        else:
+            first_parent = True
+
+        start = resolve_commit(repo, kwargs['old_branch'])
+        end = resolve_commit(repo, end)
+
+        paths = [os.path.relpath(abspath(expanduser(f)),
+                                 repo.workdir).replace(os.sep, '/')
+                 for f in kwargs['gold_files']]
+
+        self.changes = changed_commits(repo, start, end, paths,
+                                       first_parent=first_parent)
+
+        # With nothing changed the start is compared to itself
+        revisions = [str(c.id) for c, changed in self.changes]
+        kwargs['new_branches'] = revisions or [str(start.id)]
+
+        super(GoldHistoryCompare, self).__init__(**kwargs)
+
+        self.revisions = revisions
+        self.log.info('{} of {} commits changed the gold files'
+                      ''.format(len(revisions),
+                                len(commit_range(repo, start, end,
+                                                 first_parent=first_parent))))
+
+    def scan(self):
+        '''
+        Compare each commit that changed a gold file against the start of
+        the range and write drift.csv to the output, one row per commit and
+        file/variable.
+
+        Returns:
+            drift: Ordered dictionary of file/variable keys to a list of
+                   dictionaries with the commit, time, subject, stats and
+                   changed, whether the statistics changed since the
+                   previous commit listed
+        '''
+        drift = OrderedDict((k, []) for k in self.data.keys())
+
+        for commit, changed in self.changes:
+            info = describe_commit(commit)
+            self.log.info('{} {} changed {}'.format(info['commit'][:8],
+                                                    info['time'],
+                                                    ', '.join(changed)))
+            self.use_revision(info['commit'])
+            results = self.compare()
+
+            for key, series in drift.items():
+                if key in results:
+                    stats = results[key]['stats']
+                else:
+                    stats = identical_stats()
+
+                previous = series[-1]['stats'] if series else identical_stats()
+
+                point = dict(info)
+                point['stats'] = stats
+                point['changed'] = dict(stats) != dict(previous)
+                series.append(point)
+
+        self.write_drift(join(self.output, 'drift.csv'), drift)
+
+        return drift
+
+    def write_drift(self, path, drift):
+        '''
+        Write the drift of each file/variable in a long format CSV
+
+        Args:
+            path: CSV file to write
+            drift: Dictionary as returned from scan
+        '''
+        columns = []
+        for series in drift.values():
+            for point in series:
+                for s in point['stats'].keys():
+                    if s not in columns:
+                        columns.append(s)
+
+        with open(path, 'w', newline='') as fp:
+            writer = csv.writer(fp)
+            writer.writerow(['commit', 'time', 'subject', 'key', 'changed'] +
+                            columns)
+
+            for key, series in drift.items():
+                for p in series:
+                    writer.writerow([p['commit'], p['time'], p['subject'],
+                                     key, int(p['changed'])] +
+                                    [p['stats'].get(s, '') for s in columns])
+
+        self.log.info('Drift written to {}'.format(path))
+
+    def bisect(self, key):
+        '''
+        Find the first commit where a file/variable differs from the start
+        of the range by comparing only log2 of the commits that changed the
+        gold files. Assumes once it differs it keeps differing.
+
+        Args:
+            key: Key in self.data, e.g. file-gold.nc:temperature
+
+        Returns:
+            commit: Hex string of the first commit that differs, None when
+                    no commit in the range does
+        '''
+        if key not in self.data:
+            raise KeyError('{} is not one of the variables compared'
+                           ''.format(key))
+
+        lo = 0
+        hi = len(self.revisions)
+
+        while lo < hi:
+            mid = (lo + hi) // 2
+            self.use_revision(self.revisions[mid])
+            results = self.compare()
+
+            if key in results and has_differences(results[key]['stats']):
+                hi = mid
+            else:
+                lo = mid + 1
+
+            self.log.info('Bisecting {}, {} commits left'
+                          ''.format(key, hi - lo))
+
+        if lo == len(self.revisions):
+            return None
+
+        return self.revisions[lo]
@@ -0,0 +1,182 @@
+'''
+Access gold files stored in git without checking out a revision. pygit2 is
+imported when needed so comparing plain files does not require it.
+'''
+
+from os.path import basename, exists, isdir, join, splitext
+import os
+import shutil
+import tempfile
+
+from netCDF4 import Dataset
+
+# Directories read from git are written here when there is no blob cache
+TREE_CACHE = join(tempfile.gettempdir(), 'goldmeister-trees')
+
+
+def resolve_commit(repo, rev):
+    '''
+    Find the commit for any revision git understands, e.g. a branch, tag or
+    hash.
+
+    Args:
+        repo: pygit2.Repository
+        rev: String naming the revision
+
+    Returns:
+        commit: pygit2.Commit
+    '''
+    import pygit2
+
+    try:
+        obj = repo.revparse_single(rev)
+    except KeyError:
+        raise ValueError("Unable to find revision {} in {}"
+                         "".format(rev, repo.path))
+
+    return obj.peel(pygit2.Commit)
+
+
+def write_tree(repo, tree, path):
+    '''
+    Write every file in a git tree and its subtrees into a directory
+
+    Args:
+        repo: pygit2.Repository holding the tree
+        tree: pygit2.Tree to write out
+        path: Existing directory to write the files to
+    '''
+    for entry in tree:
+        f = join(path, entry.name)
+
+        if entry.type_str == 'tree':
+            os.mkdir(f)
+            write_tree(repo, entry, f)
+
+        else:
+            with open(f, 'wb') as fp:
+                fp.write(repo[entry.id].data)
+
+
+class BlobFile():
+    '''
+    A file as it exists in a git commit. Only plain strings are stored so
+    the object can be handed to other processes and several revisions can be
+    opened at once. Directories, e.g. Zarr stores, are git trees and are
+    always written out to be read.
+
+    Attributes:
+        repo_path: Path to the .git directory
+        commit_id: Hex string of the commit the file was taken from
+        path: Path of the file relative to the repo root
+        oid: Hex string of the blob id, identical content has identical ids
+        is_tree: Boolean flag for directories
+        cache_dir: Optional directory for writing blobs out to disk
+    '''
+
+    def __init__(self, repo, commit, path, cache_dir=None):
+        '''
+        Args:
+            repo: pygit2.Repository containing the file
+            commit: pygit2.Commit to take the file from
+            path: Path relative to the repo root
+            cache_dir: Directory to write blobs to before opening them. By
+                       default blobs are opened from memory and directories
+                       are written to TREE_CACHE.
+        '''
+        # Git always uses forward slashes
+        self.path = path.replace(os.sep, '/')
+
+        try:
+            entry = commit.tree[self.path]
+        except KeyError:
+            raise ValueError("{} does not exist in commit {}"
+                             "".format(self.path, commit.id))
+
+        self.repo_path = repo.path
+        self.commit_id = str(commit.id)
+        self.oid = str(entry.id)
+        self.is_tree = entry.type_str == 'tree'
+        self.cache_dir = cache_dir
+
+    @property
+    def name(self):
+        return basename(self.path)
+
+    def read_bytes(self):
+        '''
+        Returns:
+            data: Bytes of the file in the commit
+        '''
+        import pygit2
+
+        if self.is_tree:
+            raise ValueError("{} is a directory, use cache_path to write it "
+                             "out".format(self.path))
+
+        repo = pygit2.Repository(self.repo_path)
+        return repo[self.oid].data
+
+    def cache_path(self):
+        '''
+        Write the blob into the cache directory if it is not already there.
+        Blobs are named after their id so every revision sharing the content
+        shares the file.
+
+        Returns:
+            path: Path to the cached copy of the blob
+        '''
+        cache_dir = self.cache_dir
+
+        if cache_dir is None and self.is_tree:
+            cache_dir = TREE_CACHE
+
+        ext = splitext(self.path)[-1]
+        f = join(cache_dir, self.oid + ext)
+
+        if exists(f):
+            return f
+
+        if not isdir(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+
+        if not self.is_tree:
+            # Write to a temporary file first so readers never see a partial
+            fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as fp:
+                fp.write(self.read_bytes())
+            os.replace(tmp, f)
+
+            return f
+
+        import pygit2
+
+        repo = pygit2.Repository(self.repo_path)
+        tmp = tempfile.mkdtemp(dir=cache_dir, suffix='.tmp')
+        write_tree(repo, repo[self.oid], tmp)
+
+        # Another process may have written the same tree meanwhile
+        try:
+            os.rename(tmp, f)
+        except OSError:
+            shutil.rmtree(tmp)
+
+        return f
+
+    def open(self):
+        '''
+        Returns:
+            ds: netCDF4.Dataset opened from memory or the blob cache
+        '''
+        if self.is_tree:
+            raise ValueError("{} is a directory, not a netCDF file"
+                             "".format(self.path))
+
+        if self.cache_dir is not None:
+            return Dataset(self.cache_path())
+
+        return Dataset(self.name, memory=self.read_bytes())
+
+    def __repr__(self):
+        return '{}({}@{})'.format(self.__class__.__name__, self.path,
+                                  self.commit_id[:8])
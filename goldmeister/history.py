@@ -0,0 +1,94 @@
+'''
+Find the commits in a range of history where gold files changed using only
+the git objects. Blob ids are compared so no file data is read.
+'''
+
+import time
+
+
+def commit_range(repo, start, end, first_parent=True):
+    '''
+    List the commits after start up to and including end, oldest first
+
+    Args:
+        repo: pygit2.Repository
+        start: pygit2.Commit the range starts after
+        end: pygit2.Commit the range ends at
+        first_parent: Boolean flag to only follow the first parent of merges,
+                      the history of the branch as it was merged
+
+    Returns:
+        commits: List of pygit2.Commit
+    '''
+    import pygit2
+
+    walker = repo.walk(end.id, pygit2.GIT_SORT_TOPOLOGICAL |
+                       pygit2.GIT_SORT_REVERSE)
+    walker.hide(start.id)
+
+    if first_parent:
+        walker.simplify_first_parent()
+
+    return list(walker)
+
+
+def blob_ids(commit, paths):
+    '''
+    Args:
+        commit: pygit2.Commit
+        paths: Paths relative to the repo root with forward slashes
+
+    Returns:
+        ids: Tuple of the blob id of each path, None where it does not exist
+    '''
+    ids = []
+
+    for p in paths:
+        try:
+            ids.append(str(commit.tree[p].id))
+        except KeyError:
+            ids.append(None)
+
+    return tuple(ids)
+
+
+def changed_commits(repo, start, end, paths, first_parent=True):
+    '''
+    Find the commits in a range where any of the files changed. Commits
+    where a file does not exist are left out.
+
+    Args:
+        repo: pygit2.Repository
+        start: pygit2.Commit the range starts after
+        end: pygit2.Commit the range ends at
+        paths: Paths relative to the repo root with forward slashes
+        first_parent: Boolean flag to only follow the first parent of merges
+
+    Returns:
+        changes: List of (pygit2.Commit, list of the paths that changed)
+    '''
+    previous = blob_ids(start, paths)
+    changes = []
+
+    for commit in commit_range(repo, start, end, first_parent=first_parent):
+        ids = blob_ids(commit, paths)
+
+        if None in ids or ids == previous:
+            continue
+
+        changed = [p for p, a, b in zip(paths, previous, ids) if a != b]
+        changes.append((commit, changed))
+        previous = ids
+
+    return changes
+
+
+def describe_commit(commit):
+    '''
+    Returns:
+        info: Dictionary of the commit id, UTC time and subject line
+    '''
+    return {'commit': str(commit.id),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%SZ',
+                                  time.gmtime(commit.commit_time)),
+            'subject': commit.message.strip().split('\n')[0]}
@@ -0,0 +1,317 @@
+'''
+Lazy access to the data being compared. Entries in GoldCompare.data hold small
+handles describing each variable and only read from disk when the data is
+requested. Open datasets are kept in a bounded least recently used pool.
+'''
+
+from collections import OrderedDict
+import threading
+
+import numpy as np
+
+from .mapped import read_mapped, variable_layout
+from .subset import (compose, narrow, selected_shape, variable_selection,
+                     whole)
+from .utilities import open_dataset
+
+
+class DatasetPool():
+    '''
+    Least recently used pool of open datasets. Files are keyed on their
+    path, or blob id for files read from git. Handles are read from the
+    prefetch thread of a pipeline while the main thread uses the pool, so
+    opening, reading and closing hold a lock.
+
+    Attributes:
+        max_open: Maximum number of datasets kept open at once
+        file_type: Type of the files, see goldmeister.readers
+    '''
+
+    def __init__(self, max_open=16, file_type='netcdf'):
+        self.max_open = max(1, max_open)
+        self.file_type = file_type
+        self._datasets = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, f):
+        '''
+        Args:
+            f: Path or object with an open method, e.g. a BlobFile
+
+        Returns:
+            ds: Open netCDF4.Dataset or goldmeister.readers.ReaderDataset
+        '''
+        key = getattr(f, 'oid', f)
+
+        with self._lock:
+            if key in self._datasets:
+                self._datasets.move_to_end(key)
+                return self._datasets[key]
+
+            ds = open_dataset(f, self.file_type)
+            self._datasets[key] = ds
+
+            while len(self._datasets) > self.max_open:
+                k, old = self._datasets.popitem(last=False)
+                old.close()
+
+        return ds
+
+    def read(self, f, name, index=Ellipsis):
+        '''
+        Read from a variable, no other thread uses the pool meanwhile so its
+        dataset can not be closed or read from at the same time
+
+        Args:
+            f: Path or object with an open method, e.g. a BlobFile
+            name: Name of the variable
+            index: Optional slice of the variable to read
+
+        Returns:
+            data: Masked array of the data
+        '''
+        with self._lock:
+            return self.get(f).variables[name][index]
+
+    def close(self):
+        '''
+        Close every dataset in the pool
+        '''
+        with self._lock:
+            for ds in self._datasets.values():
+                ds.close()
+
+            self._datasets.clear()
+
+    def __len__(self):
+        return len(self._datasets)
+
+
+# Pools of each file type used by handles that were sent to another process
+_default_pools = {}
+
+
+def default_pool(file_type='netcdf'):
+    if file_type not in _default_pools:
+        _default_pools[file_type] = DatasetPool(file_type=file_type)
+
+    return _default_pools[file_type]
+
+
+class LazyVariable():
+    '''
+    Handle to a variable in a file that reads the data on request. Handles
+    can be pickled and sent to other processes, where they read through that
+    process's default pool.
+
+    Attributes:
+        file: Path or BlobFile holding the variable
+        name: Name of the variable
+        shape: Shape of the data read, the selected part of the variable
+        dtype: Numpy dtype of the variable
+        layout: Where the variable is on disk when it can be memory mapped,
+                see goldmeister.mapped.variable_layout
+        file_type: Type of the file, see goldmeister.readers
+        selection: Tuple of slices of the variable to read, see
+                   goldmeister.subset, None to read all of it
+    '''
+    __slots__ = ('file', 'name', 'shape', 'dtype', 'pool', 'layout',
+                 'file_type', 'selection')
+
+    def __init__(self, file, name, shape, dtype, pool=None, layout=None,
+                 file_type='netcdf', selection=None):
+        self.file = file
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+        self.pool = pool
+        self.layout = layout
+        self.file_type = file_type
+        self.selection = selection
+
+    @classmethod
+    def from_variable(cls, f, v, pool=None, mapped=False, slices=None):
+        '''
+        Build a handle from the metadata of an open netCDF4.Variable or
+        goldmeister.readers.ReaderVariable
+
+        Args:
+            f: Path or BlobFile the variable is in
+            v: Open variable
+            pool: DatasetPool to open the file with when reading, its
+                  file_type is the type of the file
+            mapped: Boolean flag to memory map the variable when it is
+                    stored uncompressed and contiguously
+            slices: Dictionary of dimension names to slices to only read
+                    part of the variable
+        '''
+        layout = None
+        if mapped:
+            layout = variable_layout(f, v)
+
+        file_type = 'netcdf' if pool is None else pool.file_type
+        selection, shape = variable_selection(v.dimensions, slices, v.shape)
+
+        return cls(f, v.name, shape, np.dtype(v.dtype), pool=pool,
+                   layout=layout, file_type=file_type, selection=selection)
+
+    @property
+    def nbytes(self):
+        return int(np.prod(self.shape)) * self.dtype.itemsize
+
+    def read(self, index=Ellipsis):
+        '''
+        Args:
+            index: Optional slice of the selected data to read
+
+        Returns:
+            data: Masked array of the data
+        '''
+        if self.selection is not None:
+            index = compose(self.selection, index)
+
+        if self.layout is not None:
+            return read_mapped(self.layout, index)
+
+        pool = self.pool
+
+        if pool is None:
+            pool = default_pool(self.file_type)
+
+        return pool.read(self.file, self.name, index)
+
+    def narrow(self, index):
+        '''
+        Args:
+            index: Tuple of slices into the selected data
+
+        Returns:
+            variable: LazyVariable of part of the data, nothing is read
+        '''
+        selection = self.selection
+        if selection is None:
+            selection = whole(self.shape)
+
+        selection = narrow(selection, index)
+
+        return LazyVariable(self.file, self.name, selected_shape(selection),
+                            self.dtype, pool=self.pool, layout=self.layout,
+                            file_type=self.file_type, selection=selection)
+
+    def __getstate__(self):
+        # Open datasets can not be pickled, leave the pool behind
+        return (self.file, self.name, self.shape, self.dtype, self.layout,
+                self.file_type, self.selection)
+
+    def __setstate__(self, state):
+        (self.file, self.name, self.shape, self.dtype, self.layout,
+         self.file_type, self.selection) = state
+        self.pool = None
+
+    def __repr__(self):
+        return '{}({}:{} {} {})'.format(self.__class__.__name__, self.file,
+                                        self.name, self.shape, self.dtype)
+
+
+class ZeroDifference():
+    '''
+    Difference of data known to be identical. The zeros, masked like the
+    gold, are only made when the difference is asked for, e.g. to plot it.
+
+    Attributes:
+        gold: Array or LazyVariable the compare is identical to
+    '''
+    __slots__ = ('gold',)
+
+    def __init__(self, gold):
+        self.gold = gold
+
+    @property
+    def shape(self):
+        return self.gold.shape
+
+    @property
+    def dtype(self):
+        return self.gold.dtype
+
+    @property
+    def nbytes(self):
+        return int(np.prod(self.shape)) * np.dtype(self.dtype).itemsize
+
+    def read(self):
+        '''
+        Returns:
+            data: Masked array of zeros with the mask of the gold
+        '''
+        gold = materialize(self.gold)
+
+        return np.ma.array(np.zeros(gold.shape, dtype=gold.dtype),
+                           mask=np.ma.getmask(gold))
+
+    def __repr__(self):
+        return '{}({!r})'.format(self.__class__.__name__, self.gold)
+
+
+def materialize(d):
+    '''
+    Returns:
+        data: The data of a LazyVariable or ZeroDifference, anything else is
+              returned as is
+    '''
+    if isinstance(d, (LazyVariable, ZeroDifference)):
+        return d.read()
+
+    return d
+
+
+class Entry():
+    '''
+    Record of a single file/variable comparison. Behaves like the dictionary
+    used previously, reading gold and compare data only when they are
+    accessed with entry['gold'] or entry['compare']. The handles themselves
+    are available as attributes.
+    '''
+    __slots__ = ('gold', 'compare', 'difference', 'stats', 'timesteps',
+                 'preview', 'index')
+
+    def __init__(self, gold=None, compare=None, difference=None, stats=None,
+                 timesteps=None, preview=None, index=None):
+        self.gold = gold
+        self.compare = compare
+        self.difference = difference
+        self.stats = stats
+        self.timesteps = timesteps
+        self.preview = preview
+        self.index = index
+
+    def __getitem__(self, k):
+        if k not in self.__slots__:
+            raise KeyError(k)
+
+        return materialize(getattr(self, k))
+
+    def __setitem__(self, k, v):
+        if k not in self.__slots__:
+            raise KeyError(k)
+
+        setattr(self, k, v)
+
+    def __contains__(self, k):
+        return k in self.__slots__
+
+    def get(self, k, default=None):
+        if k not in self.__slots__ or getattr(self, k) is None:
+            return default
+
+        return self[k]
+
+    def keys(self):
+        return list(self.__slots__)
+
+    def copy(self):
+        return Entry(**{k: getattr(self, k) for k in self.__slots__})
+
+    def __repr__(self):
+        return '{}({})'.format(self.__class__.__name__, ', '.join(
+            '{}={!r}'.format(k, getattr(self, k)) for k in self.__slots__
+            if getattr(self, k) is not None))
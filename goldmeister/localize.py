@@ -0,0 +1,244 @@
+'''
+Index of where and when differences occur. Built one block at a time
+alongside the statistics so the first differing timestep, the region that
+differs and the largest differences can be found without keeping or
+plotting the difference cube.
+'''
+
+from collections import OrderedDict
+
+import numpy as np
+
+
+def _as_3d(shape, block):
+    '''
+    View a shape and block of 0 to 3 dimensions as (time, y, x)
+
+    Returns:
+        tuple: The 3D shape and the starting index of the block along each
+               of its axes
+    '''
+    shape = tuple(shape)
+
+    if len(shape) > 3:
+        raise ValueError("Unable to index differences with {} dimensions"
+                         "".format(len(shape)))
+
+    if block is None:
+        block = tuple(slice(None) for n in shape)
+
+    starts = [s.start or 0 for s in block]
+    pad = 3 - len(shape)
+
+    return (1,) * pad + shape, [0] * pad + starts
+
+
+class DifferenceIndex():
+    '''
+    Where the differences in a variable are. 3D variables are taken as
+    (time, y, x), 2D variables as a single timestep.
+
+    Attributes:
+        shape: Shape of the variable
+        top_k: Number of largest absolute differences to keep
+        nonzero: Number of differing values in each timestep, including
+                 NaNs and values masked in only one dataset
+        bbox: Array of (y_min, y_max, x_min, x_max) of the differing values
+              in each timestep, -1 where nothing differs
+    '''
+
+    def __init__(self, shape, top_k=10):
+        self.shape = tuple(shape)
+        self.top_k = top_k
+        self.shape_3d = _as_3d(self.shape, None)[0]
+
+        nt = self.shape_3d[0]
+        self.nonzero = np.zeros(nt, dtype=np.int64)
+        self.bbox = np.full((nt, 4), -1, dtype=np.int64)
+
+        # Largest absolute differences and their flat indices in shape_3d
+        self._top_values = np.empty(0, dtype=np.float64)
+        self._top_flat = np.empty(0, dtype=np.int64)
+
+    def add(self, dd, gold, compare, block=None):
+        '''
+        Add the differences of a block
+
+        Args:
+            dd: Masked array of compare - gold for the block
+            gold: Array or masked array of the gold block
+            compare: Array or masked array of the compare block
+            block: Tuple of slices of the variable the block came from, None
+                   for the whole variable
+        '''
+        shape, starts = _as_3d(self.shape, block)
+        bshape = (1,) * (3 - np.ndim(dd)) + np.shape(dd)
+
+        # NaNs are != 0 so they are counted as differing
+        differs = np.ma.filled(dd != 0, False)
+        differs |= np.ma.getmaskarray(gold) != np.ma.getmaskarray(compare)
+        differs = differs.reshape(bshape)
+
+        counts = np.count_nonzero(differs, axis=(1, 2))
+        if not counts.any():
+            return
+
+        t0, y0, x0 = starts
+        self.nonzero[t0:t0 + bshape[0]] += counts
+
+        rows = differs.any(axis=2)
+        cols = differs.any(axis=1)
+
+        for i in np.nonzero(counts)[0]:
+            y_min = y0 + np.argmax(rows[i])
+            y_max = y0 + bshape[1] - 1 - np.argmax(rows[i][::-1])
+            x_min = x0 + np.argmax(cols[i])
+            x_max = x0 + bshape[2] - 1 - np.argmax(cols[i][::-1])
+
+            box = self.bbox[t0 + i]
+            if box[0] < 0:
+                box[:] = [y_min, y_max, x_min, x_max]
+            else:
+                box[:] = [min(box[0], y_min), max(box[1], y_max),
+                          min(box[2], x_min), max(box[3], x_max)]
+
+        if self.top_k:
+            self._add_top(dd, differs, bshape, starts, shape)
+
+    @classmethod
+    def from_dict(cls, d, top_k=10):
+        '''
+        Rebuild an index saved with to_dict
+
+        Args:
+            d: Dictionary from to_dict
+            top_k: Number of largest absolute differences to keep
+
+        Returns:
+            index: DifferenceIndex
+        '''
+        index = cls(d['shape'], top_k=top_k)
+
+        steps = np.asarray(d['steps'], dtype=np.int64)
+        if steps.size:
+            index.nonzero[steps] = d['nonzero']
+            index.bbox[steps] = d['bbox']
+
+        if d['top']:
+            pad = [0] * (3 - len(index.shape))
+            idx = np.array([pad + list(i) for v, i in d['top']]).T
+            index._top_flat = np.ravel_multi_index(tuple(idx), index.shape_3d)
+            index._top_values = np.array([v for v, i in d['top']],
+                                         dtype=np.float64)
+
+        return index
+
+    def _add_top(self, dd, differs, bshape, starts, shape):
+        values = np.abs(np.ma.getdata(dd).astype(np.float64)).reshape(bshape)
+        valid = differs & ~np.ma.getmaskarray(dd).reshape(bshape)
+        values = np.where(valid & np.isfinite(values), values, -np.inf)
+        values = values.ravel()
+
+        # Everything tied with the kth largest is kept so ties are broken
+        # the same way whatever the blocks are, by the lowest index
+        k = min(self.top_k, values.size)
+        kth = np.partition(values, values.size - k)[values.size - k]
+        local = np.nonzero((values >= kth) & (values > -np.inf))[0]
+
+        if local.size == 0:
+            return
+
+        # Flat index in the block to a flat index in the variable
+        idx = np.unravel_index(local, bshape)
+        idx = [i + s for i, s in zip(idx, starts)]
+        flat = np.ravel_multi_index(idx, shape)
+        values = values[local]
+
+        if flat.size > k:
+            keep = np.lexsort((flat, -values))[:k]
+            flat = flat[keep]
+            values = values[keep]
+
+        all_values = np.concatenate([self._top_values, values])
+        all_flat = np.concatenate([self._top_flat, flat])
+
+        order = np.lexsort((all_flat, -all_values))[:self.top_k]
+        self._top_values = all_values[order]
+        self._top_flat = all_flat[order]
+
+    @property
+    def steps(self):
+        '''
+        Returns:
+            steps: Array of the timesteps with differences
+        '''
+        return np.nonzero(self.nonzero)[0]
+
+    @property
+    def first_step(self):
+        steps = self.steps
+        return int(steps[0]) if steps.size else None
+
+    @property
+    def last_step(self):
+        steps = self.steps
+        return int(steps[-1]) if steps.size else None
+
+    @property
+    def extent(self):
+        '''
+        Returns:
+            bbox: (y_min, y_max, x_min, x_max) of the differences over all
+                  timesteps, None when nothing differs
+        '''
+        found = self.bbox[:, 0] >= 0
+
+        if not found.any():
+            return None
+
+        b = self.bbox[found]
+        return (int(b[:, 0].min()), int(b[:, 1].max()),
+                int(b[:, 2].min()), int(b[:, 3].max()))
+
+    def top(self):
+        '''
+        Returns:
+            top: List of (absolute difference, index) of the largest
+                 differences, largest first. Indices have the dimensions of
+                 the variable. NaNs and mask mismatches are not included.
+        '''
+        if self._top_flat.size == 0:
+            return []
+
+        idx = np.unravel_index(self._top_flat, self.shape_3d)
+
+        # Drop the axes added for 1D and 2D variables
+        idx = idx[3 - len(self.shape):]
+
+        return [(float(v), tuple(int(i[n]) for i in idx))
+                for n, v in enumerate(self._top_values)]
+
+    def to_dict(self):
+        '''
+        Returns:
+            index: Ordered dictionary of the index for saving as JSON. Only
+                   timesteps with differences are listed.
+        '''
+        steps = self.steps
+
+        d = OrderedDict()
+        d['shape'] = list(self.shape)
+        d['first_step'] = self.first_step
+        d['last_step'] = self.last_step
+        d['extent'] = self.extent
+        d['steps'] = [int(t) for t in steps]
+        d['nonzero'] = [int(n) for n in self.nonzero[steps]]
+        d['bbox'] = [[int(b) for b in self.bbox[t]] for t in steps]
+        d['top'] = [[v, list(i)] for v, i in self.top()]
+
+        return d
+
+    def __repr__(self):
+        return '{}(first_step={}, extent={})'.format(self.__class__.__name__,
+                                                     self.first_step,
+                                                     self.extent)
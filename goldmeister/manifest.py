@@ -0,0 +1,310 @@
+'''
+Record of a comparison kept in its output directory. Content ids of the
+input files, digests and statistics of each variable and the figures made
+are saved after each run so a rerun only compares and renders the variables
+whose inputs changed, keeping everything else already in the output.
+
+Checkpointed runs also append each variable and figure to a journal as soon
+as it is done. A run that is stopped part way replays the journal on the
+next start and carries on from where it stopped.
+'''
+
+from collections import OrderedDict
+from os.path import isdir, isfile, join
+import json
+import os
+import tempfile
+import threading
+
+from .utilities import content_id, plain
+
+FILENAME = 'manifest.json'
+JOURNAL = 'journal.jsonl'
+VERSION = 1
+
+
+class Manifest():
+    '''
+    JSON file of what was compared and produced in an output directory.
+    Records are only reused when they were made with the same options.
+
+    Attributes:
+        path: Location of the manifest
+        options: Dictionary of the options the comparison is run with
+        files: Dictionary of paths to their modification time, size and id
+        variables: Dictionary of keys to the record of each variable
+        journal_path: Location of the journal
+        replayed: Number of variables and figures recovered from the journal
+                  of a run that was stopped
+    '''
+
+    def __init__(self, output, options, journal=False):
+        self.path = join(output, FILENAME)
+        self.journal_path = join(output, JOURNAL)
+        self.options = plain(options)
+        self.files = OrderedDict()
+        self.variables = OrderedDict()
+        self.replayed = 0
+
+        # Open journal while checkpointing, written to from render threads
+        self._journal = None
+        self._lock = threading.Lock()
+
+        if isfile(self.path):
+            self.load()
+
+        if journal and isfile(self.journal_path):
+            self.replay()
+
+    def load(self):
+        try:
+            with open(self.path) as fp:
+                manifest = json.load(fp, object_pairs_hook=OrderedDict)
+        except ValueError:
+            return
+
+        if manifest.get('version') != VERSION:
+            return
+
+        # File ids are still valid whatever the options were
+        self.files = manifest['files']
+
+        if manifest['options'] == self.options:
+            self.variables = manifest['variables']
+
+    def replay(self):
+        '''
+        Apply the journal of a run that was stopped. Reading stops at a line
+        cut short by the stop.
+        '''
+        with open(self.journal_path) as fp:
+            lines = fp.readlines()
+
+        try:
+            header = json.loads(lines[0])
+        except (IndexError, ValueError):
+            return
+
+        if header.get('version') != VERSION or \
+           header.get('options') != self.options:
+            return
+
+        for line in lines[1:]:
+            try:
+                item = json.loads(line, object_pairs_hook=OrderedDict)
+            except ValueError:
+                break
+
+            if 'variable' in item:
+                self.variables[item['variable']] = item['record']
+
+            elif item.get('figure') in self.variables:
+                record = self.variables[item['figure']]
+                record['figure'] = item['file']
+                record['figure_options'] = item['options']
+
+            self.replayed += 1
+
+    def start_journal(self):
+        '''
+        Start a new journal, everything in the last one must already be saved
+        '''
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+
+            self._journal = open(self.journal_path, 'w')
+            self._write(OrderedDict([('version', VERSION),
+                                     ('options', self.options)]))
+
+    def _write(self, item):
+        self._journal.write(json.dumps(item) + '\n')
+
+        # Flushed to the OS so only the line being written is lost when the
+        # process is killed
+        self._journal.flush()
+
+    def journal(self, item):
+        '''
+        Append an item to the journal when checkpointing
+        '''
+        with self._lock:
+            if self._journal is not None:
+                self._write(item)
+
+    def close_journal(self):
+        '''
+        Stop checkpointing and remove the journal, once the manifest is saved
+        '''
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+
+            if isfile(self.journal_path):
+                os.remove(self.journal_path)
+
+    def save(self):
+        '''
+        Write the manifest, replacing the file at once so a run that is
+        stopped never leaves a partial manifest. A journal being written is
+        restarted since everything in it is now saved.
+        '''
+        manifest = OrderedDict([('version', VERSION),
+                                ('options', self.options),
+                                ('files', self.files),
+                                ('variables', self.variables)])
+
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path),
+                                   suffix='.tmp')
+        with os.fdopen(fd, 'w') as fp:
+            json.dump(manifest, fp, indent=1)
+
+        os.replace(tmp, self.path)
+
+        if self._journal is not None:
+            self.start_journal()
+
+    def file_id(self, f):
+        '''
+        Content id of a file, reusing the id saved for a path when its
+        modification time and size have not changed since
+
+        Args:
+            f: Path or BlobFile
+
+        Returns:
+            id: Blob id or sha256 digest of the file
+        '''
+        if not isinstance(f, str) or isdir(f):
+            return content_id(f)
+
+        st = os.stat(f)
+        saved = self.files.get(f)
+
+        if saved is not None and saved['mtime'] == st.st_mtime_ns and \
+           saved['size'] == st.st_size:
+            return saved['id']
+
+        fid = content_id(f)
+        self.files[f] = OrderedDict([('mtime', st.st_mtime_ns),
+                                     ('size', st.st_size),
+                                     ('id', fid)])
+
+        return fid
+
+    def get(self, key, ids):
+        '''
+        Args:
+            key: Key in GoldCompare.data
+            ids: Tuple of the gold and compare file ids
+
+        Returns:
+            record: Dictionary saved for key when it was made from the same
+                    files, otherwise None
+        '''
+        record = self.variables.get(key)
+
+        if record is None or tuple(record['files']) != tuple(ids):
+            return None
+
+        return record
+
+    def update(self, key, ids, stats, digests=None, timesteps=None,
+               index=None, identical=False):
+        '''
+        Record the comparison of a variable. The figure of the previous record
+        is kept when the digests of the data show it did not change.
+
+        Args:
+            key: Key in GoldCompare.data
+            ids: Tuple of the gold and compare file ids
+            stats: Dictionary of the difference statistics
+            digests: Tuple of the gold and compare variable digests
+            timesteps: Dictionary of the statistics of each timestep
+            index: goldmeister.localize.DifferenceIndex
+            identical: Boolean indicating the data was found to be identical
+
+        Returns:
+            unchanged: Boolean that is True when the data is the same as in
+                       the previous record
+        '''
+        previous = self.variables.get(key)
+        unchanged = previous is not None and digests is not None and \
+            previous.get('digests') == list(digests)
+
+        record = OrderedDict()
+        record['files'] = list(ids)
+        record['digests'] = None if digests is None else list(digests)
+        record['stats'] = plain(stats)
+        record['timesteps'] = None if timesteps is None else plain(timesteps)
+        record['index'] = None if index is None else index.to_dict()
+        record['identical'] = bool(identical)
+
+        if unchanged and 'figure' in previous:
+            record['figure'] = previous['figure']
+            record['figure_options'] = previous['figure_options']
+
+        elif previous is not None and 'figure' in previous:
+            self.remove_figure(key, previous)
+
+        self.variables[key] = record
+        self.journal(OrderedDict([('variable', key), ('record', record)]))
+
+        return unchanged
+
+    def add_figure(self, key, path, options):
+        '''
+        Args:
+            key: Key in GoldCompare.data
+            path: Figure rendered for the key
+            options: List of the plotting options it was rendered with
+        '''
+        if key in self.variables:
+            self.variables[key]['figure'] = os.path.basename(path)
+            self.variables[key]['figure_options'] = plain(list(options))
+
+            self.journal(OrderedDict([
+                ('figure', key),
+                ('file', self.variables[key]['figure']),
+                ('options', self.variables[key]['figure_options'])]))
+
+    def figure(self, key, options):
+        '''
+        Returns:
+            path: The figure of key when it exists and was rendered with the
+                  same options, otherwise None
+        '''
+        record = self.variables.get(key)
+
+        if record is None or 'figure' not in record or \
+           record['figure_options'] != plain(list(options)):
+            return None
+
+        path = join(os.path.dirname(self.path), record['figure'])
+
+        return path if isfile(path) else None
+
+    def remove_figure(self, key, record=None):
+        if record is None:
+            record = self.variables.get(key, {})
+
+        if 'figure' in record:
+            path = join(os.path.dirname(self.path), record['figure'])
+
+            if isfile(path):
+                os.remove(path)
+
+            del record['figure']
+            del record['figure_options']
+
+    def prune(self, keys):
+        '''
+        Drop the records and figures of variables no longer compared
+
+        Args:
+            keys: Keys still compared
+        '''
+        for key in [k for k in self.variables.keys() if k not in keys]:
+            self.remove_figure(key)
+            del self.variables[key]
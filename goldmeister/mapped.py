@@ -0,0 +1,263 @@
+'''
+Zero copy reads of netCDF3 files. Fixed size variables in the classic
+formats are stored contiguously at an offset given in the file header, so
+they can be memory mapped and compared as views without decoding or copying
+anything. Variables needing scaling, valid ranges or that live in the record
+dimension are read through netCDF4 as usual.
+'''
+
+from functools import lru_cache
+import os
+import struct
+
+from netCDF4 import default_fillvals
+import numpy as np
+
+# Data models with a header giving the offset of each variable
+NETCDF3_MODELS = ['NETCDF3_CLASSIC', 'NETCDF3_64BIT_OFFSET',
+                  'NETCDF3_64BIT_DATA']
+
+# netCDF3 types to big endian numpy dtypes
+NC_TYPES = {1: 'i1', 2: 'S1', 3: '>i2', 4: '>i4', 5: '>f4', 6: '>f8',
+            7: 'u1', 8: '>u2', 9: '>u4', 10: '>i8', 11: '>u8'}
+
+NC_DIMENSION = 10
+NC_VARIABLE = 11
+NC_ATTRIBUTE = 12
+
+# Attributes changing the values netCDF4 returns that are not reproduced
+UNSUPPORTED_ATTRS = ['scale_factor', 'add_offset', 'valid_min', 'valid_max',
+                     'valid_range', '_Unsigned']
+
+
+class _Header():
+    '''
+    Reader for the netCDF3 header, see the netCDF classic format spec
+    '''
+
+    def __init__(self, fp):
+        self.fp = fp
+
+        magic = fp.read(4)
+        if magic[:3] != b'CDF' or magic[3] not in (1, 2, 5):
+            raise ValueError('Not a netCDF3 file')
+
+        self.version = magic[3]
+
+        # CDF5 uses 64 bit counts, CDF2 and CDF5 use 64 bit offsets
+        self.count_fmt = '>q' if self.version == 5 else '>i'
+        self.offset_fmt = '>i' if self.version == 1 else '>q'
+
+    def unpack(self, fmt):
+        size = struct.calcsize(fmt)
+        return struct.unpack(fmt, self.fp.read(size))[0]
+
+    def count(self):
+        return self.unpack(self.count_fmt)
+
+    def name(self):
+        n = self.count()
+        name = self.fp.read(n).decode('utf-8')
+        self.fp.read(-n % 4)
+        return name
+
+    def list_header(self, tag):
+        found = self.unpack('>i')
+        n = self.count()
+
+        if found == 0 and n == 0:
+            return 0
+
+        if found != tag:
+            raise ValueError('Malformed netCDF3 header')
+
+        return n
+
+    def skip_attributes(self):
+        for i in range(self.list_header(NC_ATTRIBUTE)):
+            self.name()
+            nc_type = self.unpack('>i')
+            n = self.count()
+            size = n * np.dtype(NC_TYPES[nc_type]).itemsize
+            self.fp.read(size + (-size % 4))
+
+    def read(self):
+        '''
+        Returns:
+            variables: Dictionary of variable names to (offset, dtype, shape,
+                       is_record)
+        '''
+        self.count()
+
+        dims = []
+        for i in range(self.list_header(NC_DIMENSION)):
+            dims.append((self.name(), self.count()))
+
+        self.skip_attributes()
+
+        variables = {}
+        for i in range(self.list_header(NC_VARIABLE)):
+            name = self.name()
+            dim_ids = [self.count() for n in range(self.count())]
+            self.skip_attributes()
+            nc_type = self.unpack('>i')
+            self.count()
+            begin = self.unpack(self.offset_fmt)
+
+            shape = tuple(dims[d][1] for d in dim_ids)
+            is_record = len(shape) > 0 and shape[0] == 0
+
+            variables[name] = (begin, NC_TYPES[nc_type], shape, is_record)
+
+        return variables
+
+
+def read_header(path):
+    '''
+    Args:
+        path: Path to a netCDF3 file
+
+    Returns:
+        variables: Dictionary of variable names to (offset, dtype, shape,
+                   is_record)
+    '''
+    with open(path, 'rb') as fp:
+        return _Header(fp).read()
+
+
+@lru_cache(maxsize=256)
+def _cached_header(path, mtime, size):
+    return read_header(path)
+
+
+def mapped_path(f):
+    '''
+    Returns:
+        path: Path on disk of a file that can be mapped, None for files that
+              are only in memory
+    '''
+    if isinstance(f, str):
+        return f
+
+    # Blobs are on disk only when written to a blob cache
+    if getattr(f, 'cache_dir', None) is not None:
+        return f.cache_path()
+
+    return None
+
+
+def variable_layout(f, v):
+    '''
+    Find where a variable is stored when it can be memory mapped.
+
+    Args:
+        f: Path or BlobFile the variable is in
+        v: Open netCDF4.Variable
+
+    Returns:
+        layout: Tuple of (path, offset, dtype, shape, fill values) or None
+                when the variable has to be read through netCDF4
+    '''
+    # Only netCDF4.Variables have a group, other formats are never mapped
+    if not hasattr(v, 'group') or v.group().data_model not in NETCDF3_MODELS:
+        return None
+
+    if len(v.shape) == 0 or v.dtype == str or np.dtype(v.dtype).kind == 'S':
+        return None
+
+    attrs = v.ncattrs()
+    if any(a in attrs for a in UNSUPPORTED_ATTRS):
+        return None
+
+    path = mapped_path(f)
+    if path is None:
+        return None
+
+    st = os.stat(path)
+    header = _cached_header(path, st.st_mtime_ns, st.st_size)
+
+    if v.name not in header:
+        return None
+
+    offset, dtype, shape, is_record = header[v.name]
+
+    # Records of different variables are interleaved
+    if is_record or shape != tuple(v.shape):
+        return None
+
+    # The same values netCDF4 masks by default
+    native = np.dtype(v.dtype)
+    if '_FillValue' in attrs:
+        fills = [v.getncattr('_FillValue')]
+    else:
+        fills = [default_fillvals[native.str[1:]]]
+
+    if 'missing_value' in attrs:
+        fills += list(np.atleast_1d(v.getncattr('missing_value')))
+
+    fills = tuple(np.array(fv).astype(native).item() for fv in fills)
+
+    return (path, offset, dtype, shape, fills)
+
+
+def read_mapped(layout, index=Ellipsis):
+    '''
+    Read a variable as a view of the file on disk. Only the mask is made in
+    memory, and only when there are masked values.
+
+    Args:
+        layout: Tuple from variable_layout
+        index: Optional slice of the variable to read
+
+    Returns:
+        data: Masked array backed by a memory map of the file
+    '''
+    path, offset, dtype, shape, fills = layout
+
+    data = np.memmap(path, dtype=dtype, mode='r', offset=offset,
+                     shape=shape)[index]
+    data = np.asarray(data)
+    mask = np.ma.nomask
+
+    for fv in fills:
+        if isinstance(fv, float) and np.isnan(fv):
+            masked = np.isnan(data)
+        else:
+            masked = data == fv
+
+        if masked.any():
+            mask = masked if mask is np.ma.nomask else mask | masked
+
+    return np.ma.MaskedArray(data, mask=mask, copy=False)
+
+
+class MappedVariable():
+    '''
+    Memory mapped stand in for a netCDF4.Variable when streaming
+
+    Attributes:
+        name: Name of the variable
+        layout: Tuple from variable_layout
+    '''
+
+    def __init__(self, name, layout):
+        self.name = name
+        self.layout = layout
+
+    @property
+    def shape(self):
+        return self.layout[3]
+
+    @property
+    def dtype(self):
+        return np.dtype(self.layout[2])
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    def chunking(self):
+        return 'contiguous'
+
+    def __getitem__(self, index):
+        return read_mapped(self.layout, index)
@@ -0,0 +1,249 @@
+'''
+Functions for fanning comparison work out to a pool of processes. Every task
+is a module level function taking plain arguments so it can be pickled and
+sent to a worker.
+'''
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .cache import variable_digest
+from .lazy import LazyVariable, materialize
+from .localize import DifferenceIndex
+from .mapped import MappedVariable, variable_layout
+from .profiling import Profiler
+from .shared import SharedArray, share_mask
+from .statistics import (identical_stats, difference_stats,
+                         describe_difference)
+from .streaming import stream_variable
+from .subset import SubsetVariable
+from .utilities import open_dataset, arrays_identical
+
+
+def pool_map(fn, tasks, workers=1):
+    '''
+    Run fn over each tuple of arguments in tasks, in order.
+
+    Args:
+        fn: Module level function to call
+        tasks: List of tuples of arguments for fn
+        workers: Number of processes to use, 1 or less runs serially
+
+    Returns:
+        results: List of the return values of fn in the same order as tasks
+    '''
+    return list(pool_imap(fn, tasks, workers))
+
+
+def pool_imap(fn, tasks, workers=1):
+    '''
+    Run fn over each tuple of arguments in tasks, yielding each result in
+    order as soon as it is done.
+
+    Args:
+        fn: Module level function to call
+        tasks: List of tuples of arguments for fn
+        workers: Number of processes to use, 1 or less runs serially
+
+    Returns:
+        results: Generator of the return values of fn in the same order as
+                 tasks
+    '''
+    tasks = list(tasks)
+
+    if workers is None or workers <= 1 or len(tasks) <= 1:
+        for args in tasks:
+            yield fn(*args)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        for result in pool.map(fn, *zip(*tasks)):
+            yield result
+
+
+def list_variables(f, ignore_vars, file_type='netcdf'):
+    '''
+    Returns:
+        variables: List of the variable names in f not in ignore_vars
+    '''
+    ds = open_dataset(f, file_type)
+    variables = [v for v in ds.variables.keys() if v not in ignore_vars]
+    ds.close()
+
+    return variables
+
+
+def difference(gold, compare, digests=False, timesteps=False,
+               profile=False, top_k=None, scratch=None):
+    '''
+    Difference two arrays, reading them first if they are LazyVariables.
+    With scratch, the difference is computed straight into a memory mapped
+    file and only a handle to it is returned, so a worker process hands it
+    back without pickling the data.
+
+    Args:
+        gold: Array or LazyVariable used as the basis
+        compare: Array or LazyVariable compared to the gold
+        digests: Boolean flag to also compute the digests of both arrays
+        timesteps: Boolean flag to also compute statistics per timestep for
+                   3D data
+        profile: Boolean flag to time each step
+        top_k: Number of largest differences to keep in a DifferenceIndex of
+               where the differences are, None to not build one
+        scratch: Prefix of the files to write the difference to, see
+                 goldmeister.shared.SharedStore.path
+
+    Returns:
+        tuple: The compare - gold array, a goldmeister.shared.SharedMasked
+               of it with scratch, None when they are identical, its
+               statistics, the (gold, compare) digests when requested, the
+               per timestep statistics when requested, the DifferenceIndex
+               when requested and the Profiler payload when profiling
+    '''
+    prof = Profiler(enabled=profile)
+
+    with prof.stage('read'):
+        n_read = sum(d.nbytes for d in [gold, compare]
+                     if isinstance(d, LazyVariable))
+        gold = materialize(gold)
+        compare = materialize(compare)
+
+    prof.count('bytes_read', n_read)
+
+    hashes = None
+    if digests:
+        with prof.stage('digest'):
+            hashes = (variable_digest(gold), variable_digest(compare))
+
+    with prof.stage('identical_check'):
+        identical = arrays_identical(gold, compare)
+
+    if identical:
+        prof.peak('array_bytes', gold.nbytes + compare.nbytes)
+        return None, identical_stats(), hashes, None, None, prof.payload()
+
+    shared = None
+    out = None
+    if scratch is not None:
+        shared = SharedArray.create(scratch + '.data', gold.shape,
+                                    np.result_type(np.ma.getdata(gold),
+                                                   np.ma.getdata(compare)))
+        out = shared.array()
+
+    with prof.stage('difference'):
+        dd, stats = difference_stats(gold, compare, out=out)
+
+    prof.peak('array_bytes', gold.nbytes + compare.nbytes + dd.nbytes)
+
+    per_step = None
+    if timesteps and dd.ndim == 3:
+        with prof.stage('timestep_stats'):
+            per_step = describe_difference(np.ma.getdata(dd), gold, compare,
+                                           axis=0)[1]
+
+    index = None
+    if top_k is not None:
+        with prof.stage('locate'):
+            index = DifferenceIndex(dd.shape, top_k=top_k)
+            index.add(dd, gold, compare)
+
+    if shared is not None:
+        with prof.stage('share'):
+            dd = share_mask(dd, shared, scratch + '.mask')
+
+    return dd, stats, hashes, per_step, index, prof.payload()
+
+
+def _mapped(f, v):
+    '''
+    Returns:
+        variable: MappedVariable of v when it can be memory mapped, otherwise
+                  v itself
+    '''
+    layout = variable_layout(f, v)
+
+    if layout is None:
+        return v
+
+    return MappedVariable(v.name, layout)
+
+
+def stream_difference(gold_f, compare_f, vname, max_memory, profile=False,
+                      top_k=None, mapped=False, file_type='netcdf',
+                      selections=None):
+    '''
+    Returns:
+        tuple: Statistics of a variable streamed between two files, its
+               DifferenceIndex when top_k is given and the Profiler payload
+               when profiling. See stream_differences.
+    '''
+    results, payload = stream_differences(gold_f, compare_f,
+                                          [(None, vname, selections)],
+                                          max_memory, profile=profile,
+                                          top_k=top_k, mapped=mapped,
+                                          file_type=file_type)
+
+    return results[0][1], results[0][2], payload
+
+
+def stream_differences(gold_f, compare_f, variables, max_memory,
+                       profile=False, top_k=None, mapped=False,
+                       file_type='netcdf'):
+    '''
+    Stream several variables between two files, opening each file once
+
+    Args:
+        gold_f: Gold file
+        compare_f: File compared to the gold
+        variables: List of (key, variable name, selections) of the variables
+                   to stream. Only the gold and compare selections are read
+                   when given, see goldmeister.subset.
+        max_memory: Approximate number of bytes to hold per variable
+        profile: Boolean flag to time each step
+        top_k: Number of largest differences to keep in a DifferenceIndex of
+               each variable, None to not build one
+        mapped: Boolean flag to read blocks from memory maps when the
+                variables are uncompressed and contiguous
+        file_type: Type of the files, see goldmeister.readers
+
+    Returns:
+        tuple: List of (key, statistics, DifferenceIndex or None) of each
+               variable and the Profiler payload when profiling
+    '''
+    prof = Profiler(enabled=profile)
+
+    with prof.stage('open'):
+        gold_ds = open_dataset(gold_f, file_type)
+        compare_ds = open_dataset(compare_f, file_type)
+
+    results = []
+
+    for key, vname, selections in variables:
+        gold = gold_ds.variables[vname]
+        compare = compare_ds.variables[vname]
+
+        if mapped:
+            gold = _mapped(gold_f, gold)
+            compare = _mapped(compare_f, compare)
+
+        if selections is not None:
+            if selections[0] is not None:
+                gold = SubsetVariable(gold, selections[0])
+            if selections[1] is not None:
+                compare = SubsetVariable(compare, selections[1])
+
+        index = None
+        if top_k is not None:
+            index = DifferenceIndex(gold.shape, top_k=top_k)
+
+        with prof.stage('stream', key=key):
+            stats = stream_variable(gold, compare, max_memory, index=index)
+
+        prof.count('bytes_read', 2 * gold.size * gold.dtype.itemsize)
+        results.append((key, stats, index))
+
+    gold_ds.close()
+    compare_ds.close()
+
+    return results, prof.payload()
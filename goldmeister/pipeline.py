@@ -0,0 +1,136 @@
+'''
+Threads for overlapping reading, differencing and rendering. Reading from
+disk, numpy and the Agg renderer release the GIL for much of their work, so
+running each stage in its own thread keeps the disk, CPU and plotting busy at
+the same time. Bounded queues between the stages stop a fast stage from
+running ahead and holding more than a few variables in memory.
+'''
+
+import queue
+import threading
+
+# Marks the end of a queue
+_DONE = object()
+
+
+class _Failure():
+
+    def __init__(self, error):
+        self.error = error
+
+
+def prefetch(fn, items, depth=2):
+    '''
+    Yield fn(item) for each item, computed in a background thread at most
+    depth items ahead of the consumer. Exceptions raised by fn are raised
+    from the generator.
+
+    Args:
+        fn: Function to call on each item, e.g. reading a variable
+        items: Iterable of the items
+        depth: Number of results to hold ready at most
+
+    Returns:
+        generator: Results of fn in the order of items
+    '''
+    results = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+
+    def put(value):
+        # Give up waiting on a full queue when the consumer stops early
+        while not stop.is_set():
+            try:
+                results.put(value, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put(fn(item)):
+                    return
+        except BaseException as e:
+            put(_Failure(e))
+            return
+
+        put(_DONE)
+
+    thread = threading.Thread(target=produce, name='goldmeister-prefetch',
+                              daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            value = results.get()
+
+            if value is _DONE:
+                break
+
+            if isinstance(value, _Failure):
+                raise value.error
+
+            yield value
+
+    finally:
+        stop.set()
+        thread.join()
+
+
+class BackgroundWorker():
+    '''
+    Run a function on submitted tasks in a background thread. submit blocks
+    while maxsize tasks are waiting, so the producer can not get far ahead.
+
+    Attributes:
+        fn: Function called with the arguments of each task
+        results: List of the return values in the order submitted
+    '''
+
+    def __init__(self, fn, maxsize=2, name='goldmeister-worker'):
+        self.fn = fn
+        self.results = []
+        self.error = None
+        self.tasks = queue.Queue(maxsize=max(1, maxsize))
+        self.thread = threading.Thread(target=self._run, name=name,
+                                       daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            args = self.tasks.get()
+
+            if args is _DONE:
+                return
+
+            # Keep draining after a failure so submit never blocks forever
+            if self.error is not None:
+                continue
+
+            try:
+                self.results.append(self.fn(*args))
+            except BaseException as e:
+                self.error = e
+
+    def submit(self, *args):
+        if self.error is not None:
+            raise self.error
+
+        self.tasks.put(args)
+
+    def close(self):
+        '''
+        Wait for every task to finish
+
+        Returns:
+            results: List of the return values in the order submitted
+        '''
+        self.tasks.put(_DONE)
+        self.thread.join()
+
+        if self.error is not None:
+            raise self.error
+
+        return self.results
@@ -0,0 +1,149 @@
+'''
+Headless figure rendering for batches of comparisons. Figures are built with
+the object oriented matplotlib API on the Agg canvas so no pyplot state is
+shared and figures can be rendered in separate processes. matplotlib is only
+imported when a figure is drawn.
+'''
+
+import numpy as np
+
+
+def downsample(d, max_size):
+    '''
+    Decimate a 2D array by striding so neither side is larger than max_size.
+
+    Args:
+        d: 2D array
+        max_size: Maximum number of pixels along a side, None for no limit
+
+    Returns:
+        d: Strided view of the array
+    '''
+    if max_size is None or d.ndim != 2:
+        return d
+
+    strides = [max(1, int(np.ceil(n / max_size))) for n in d.shape]
+    return d[::strides[0], ::strides[1]]
+
+
+def reduce_image(d, max_size=None):
+    '''
+    Reduce an array to a 2D image no larger than max_size on a side, 3D
+    arrays are averaged over the first (time) axis.
+
+    Args:
+        d: Array of 2 or 3 dimensions
+        max_size: Maximum number of pixels along a side
+
+    Returns:
+        d: Reduced array
+    '''
+    if d.ndim == 3:
+        d = d.mean(axis=0)
+
+    return downsample(d, max_size)
+
+
+def prepare_panel(d, label, max_size=None, bins=10):
+    '''
+    Reduce an array to only what is drawn, 3D arrays are averaged over the
+    first (time) axis, images are decimated and histograms are binned. Doing
+    this up front keeps what is sent to the rendering processes small.
+
+    Args:
+        d: Array to be plotted
+        label: Name of the panel, histogram panels are binned
+        max_size: Maximum number of pixels along a side of an image
+        bins: Number of histogram bins
+
+    Returns:
+        panel: Dictionary describing the panel for render_figure
+    '''
+    # 3D assume time is the first dimension, take the mean
+    if d.ndim == 3:
+        d = d.mean(axis=0)
+
+    panel = {'label': label, 'ndim': d.ndim}
+
+    if d.ndim == 1:
+        panel['data'] = d
+
+    elif label == 'histogram':
+        values = np.ma.compressed(d)
+        counts, edges = np.histogram(values, bins=bins)
+        panel['data'] = (counts, edges)
+
+        if values.size == 0:
+            panel['legend'] = 'No valid data'
+        else:
+            panel['legend'] = ("Min: {:.3E}\nMax: {:.3E}\nMean: {:.3E}"
+                               "").format(values.min(), values.max(),
+                                          values.mean())
+
+    else:
+        panel['data'] = downsample(d, max_size)
+
+    return panel
+
+
+def render_figure(path, title, panels, plot_original_data=False):
+    '''
+    Draw the panels of a single comparison side by side and save to path.
+
+    Args:
+        path: Filename of the png to write
+        title: Title of the figure
+        panels: List of dictionaries from prepare_panel, or of the label,
+                max_size and a goldmeister.shared.SharedMasked under shared
+                to prepare here from the shared data
+        plot_original_data: Boolean indicating whether the gold and compare
+                            panels are included
+
+    Returns:
+        path: Filename written
+    '''
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    panels = [prepare_panel(p['shared'].array(), p['label'],
+                            max_size=p['max_size']) if 'shared' in p else p
+              for p in panels]
+
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    axes = fig.subplots(1, len(panels), squeeze=False)[0]
+
+    for i, (ax, panel) in enumerate(zip(axes, panels)):
+        d = panel['data']
+
+        # If we have a vector, just use normal plot
+        if panel['ndim'] == 1:
+            ax.plot(d)
+
+        elif panel['label'] == 'histogram':
+            counts, edges = d
+            ax.hist(edges[:-1], edges, weights=counts,
+                    label=panel['legend'])
+            ax.legend()
+
+        else:
+            if i == 2 or not plot_original_data:
+                cmap = 'RdBu'
+            else:
+                cmap = 'jet'
+
+            im = ax.imshow(d, cmap=cmap)
+            fig.colorbar(im, ax=ax, fraction=0.046, pad=0.04)
+
+        if not plot_original_data:
+            ax.set_title(panel['label'].title())
+
+        # Set the aspect ratio so the plots don't look odd with a hist
+        asp = np.diff(ax.get_xlim())[0] / np.diff(ax.get_ylim())[0]
+        ax.set_aspect(abs(asp))
+
+    fig.suptitle(title)
+    fig.tight_layout()
+    fig.savefig(path)
+
+    return path
@@ -0,0 +1,343 @@
+'''
+Multi-resolution previews of the differences for browsing. Each differing
+variable is reduced to a pyramid of tiled images holding the mean and the
+largest absolute difference of each tile, plus a precomputed histogram.
+Everything is written to one small netCDF file, so a viewer can pan and zoom
+across every variable without the source files.
+'''
+
+from os.path import isfile, join
+import glob
+import os
+
+import numpy as np
+
+FILENAME = 'previews.nc'
+
+# Largest side of the finest level, coarser levels halve down to MIN_SIZE
+MAX_SIZE = 1024
+MIN_SIZE = 64
+BINS = 64
+
+
+def _images(dd):
+    '''
+    Per pixel sum, count and largest absolute value of the finite
+    differences, over time for 3D arrays one timestep at a time
+
+    Returns:
+        tuple: 2D float64 sum, int64 count and float32 max abs, -1 where no
+               value is finite
+    '''
+    steps = dd if dd.ndim == 3 else [dd]
+    shape = dd.shape[-2:]
+
+    total = np.zeros(shape, dtype=np.float64)
+    count = np.zeros(shape, dtype=np.int64)
+    max_abs = np.full(shape, -1, dtype=np.float32)
+
+    for d in steps:
+        d = np.ma.filled(np.ma.asarray(d).astype(np.float32), np.nan)
+        finite = np.isfinite(d)
+
+        total += np.where(finite, d, 0)
+        count += finite
+        np.fmax(max_abs, np.where(finite, np.abs(d), -1), out=max_abs)
+
+    return total, count, max_abs
+
+
+def block_reduce(total, count, max_abs, factor):
+    '''
+    Reduce tiles of factor by factor pixels to one, edges are padded
+
+    Returns:
+        tuple: The reduced sum, count and max abs
+    '''
+    if factor <= 1:
+        return total, count, max_abs
+
+    ny, nx = total.shape
+    pad = ((0, -ny % factor), (0, -nx % factor))
+
+    def tiles(d, fill):
+        d = np.pad(d, pad, mode='constant', constant_values=fill)
+        return d.reshape(d.shape[0] // factor, factor,
+                         d.shape[1] // factor, factor)
+
+    return (tiles(total, 0).sum(axis=(1, 3)),
+            tiles(count, 0).sum(axis=(1, 3)),
+            tiles(max_abs, -1).max(axis=(1, 3)))
+
+
+def pyramid(dd, max_size=MAX_SIZE, min_size=MIN_SIZE):
+    '''
+    Build the levels of a preview of a 2D or 3D difference
+
+    Args:
+        dd: Masked array of the differences, 3D arrays are (time, y, x)
+        max_size: Largest side of the finest level
+        min_size: Levels are added until the largest side is this or less
+
+    Returns:
+        levels: List of (factor, mean, max abs) from finest to coarsest.
+                factor is the number of source pixels along each side of a
+                tile. Images are float32 with NaN where nothing is finite.
+    '''
+    total, count, max_abs = _images(dd)
+
+    factor = max(1, int(np.ceil(max(total.shape) / float(max_size))))
+    total, count, max_abs = block_reduce(total, count, max_abs, factor)
+
+    levels = []
+
+    while True:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(count > 0, total / count, np.nan)
+
+        levels.append((factor, mean.astype(np.float32),
+                       np.where(count > 0, max_abs, np.nan).astype(
+                           np.float32)))
+
+        if max(total.shape) <= min_size:
+            break
+
+        total, count, max_abs = block_reduce(total, count, max_abs, 2)
+        factor *= 2
+
+    return levels
+
+
+def histogram(dd, stats=None, bins=BINS):
+    '''
+    Histogram the nonzero finite differences, one timestep at a time for 3D
+    arrays. The range is taken from the statistics when given so the data
+    is only passed over once.
+
+    Returns:
+        tuple: Counts, bin edges and the number of zero differences
+    '''
+    lo = hi = None
+    if stats is not None and 'min' in stats and 'max' in stats:
+        lo, hi = float(stats['min']), float(stats['max'])
+
+    steps = dd if dd.ndim == 3 else [dd]
+
+    if lo is None or not np.isfinite(lo) or not np.isfinite(hi):
+        values = [np.ma.compressed(d) for d in steps]
+        values = np.concatenate([v[np.isfinite(v)] for v in values])
+        lo, hi = (values.min(), values.max()) if values.size else (0, 0)
+
+    if lo == hi:
+        lo, hi = lo - 0.5, hi + 0.5
+
+    counts = np.zeros(bins, dtype=np.int64)
+    zeros = 0
+
+    for d in steps:
+        values = np.ma.compressed(d)
+        values = values[np.isfinite(values)]
+        nonzero = values[values != 0]
+        zeros += values.size - nonzero.size
+
+        counts += np.histogram(nonzero, bins=bins, range=(lo, hi))[0]
+
+    edges = np.linspace(lo, hi, bins + 1)
+
+    return counts, edges, zeros
+
+
+class PreviewStore():
+    '''
+    netCDF file of the previews of each differing variable. Each variable is
+    a group with a key attribute, the levels as mean<n> and max_abs<n> with a
+    factor attribute, and the histogram as hist_counts and hist_edges.
+    Groups are written as variables are added so only one variable's
+    previews are in memory at a time.
+
+    Attributes:
+        path: Location of the file
+        keys: Keys added, in order
+        sync: Boolean flag to flush each group to disk as it is added, so
+              the file of a run that is stopped can still be read
+    '''
+
+    def __init__(self, output, max_size=MAX_SIZE, min_size=MIN_SIZE,
+                 bins=BINS, sync=False):
+        self.path = join(output, FILENAME)
+        self.max_size = max_size
+        self.min_size = min_size
+        self.bins = bins
+        self.sync = sync
+        self.keys = []
+        self.ds = None
+        self.previous = []
+
+    def open(self):
+        from netCDF4 import Dataset
+
+        # Kept to copy the previews of variables that are not redone, newest
+        # first. A file left next to an earlier one was being written by a
+        # run that was stopped.
+        previous = self.path + '.previous'
+        partials = sorted(glob.glob(self.path + '.partial*'),
+                          key=os.path.getmtime, reverse=True)
+
+        if isfile(previous) and isfile(self.path):
+            partial = '{}.partial{}'.format(self.path, len(partials))
+            os.replace(self.path, partial)
+            partials.insert(0, partial)
+
+        elif isfile(self.path):
+            os.replace(self.path, previous)
+
+        self.previous = partials + [f for f in [previous] if isfile(f)]
+
+        self.ds = Dataset(self.path, 'w')
+        self.ds.setncattr('title', 'goldmeister difference previews')
+
+    def add(self, key, dd, stats=None):
+        '''
+        Args:
+            key: Key in GoldCompare.data
+            dd: Masked array of the differences
+            stats: Dictionary of the difference statistics
+        '''
+        if self.ds is None:
+            self.open()
+
+        g = self.ds.createGroup('var_{}'.format(len(self.keys)))
+        g.setncattr('key', key)
+        g.setncattr('shape', list(dd.shape))
+
+        for k, v in (stats or {}).items():
+            g.setncattr(k, v)
+
+        if dd.ndim >= 2:
+            for n, (factor, mean, max_abs) in enumerate(
+                    pyramid(dd, self.max_size, self.min_size)):
+                dims = ('y{}'.format(n), 'x{}'.format(n))
+                g.createDimension(dims[0], mean.shape[0])
+                g.createDimension(dims[1], mean.shape[1])
+
+                for name, d in [('mean', mean), ('max_abs', max_abs)]:
+                    v = g.createVariable('{}{}'.format(name, n), 'f4', dims,
+                                         zlib=True, fill_value=np.nan)
+                    v.setncattr('factor', factor)
+                    v[:] = d
+
+        counts, edges, zeros = histogram(dd, stats, bins=self.bins)
+        g.setncattr('zeros', zeros)
+        g.createDimension('bin', len(counts))
+        g.createDimension('edge', len(edges))
+        g.createVariable('hist_counts', 'i8', ('bin',))[:] = counts
+        g.createVariable('hist_edges', 'f8', ('edge',))[:] = edges
+
+        self.keys.append(key)
+
+        if self.sync:
+            self.ds.sync()
+
+    def keep(self, keys):
+        '''
+        Copy the previews of keys from the file of the previous run
+
+        Args:
+            keys: Keys of the variables that were not compared again
+        '''
+        if self.ds is None and (isfile(self.path) or
+                                isfile(self.path + '.previous')):
+            self.open()
+
+        from netCDF4 import Dataset
+
+        for path in self.previous:
+            try:
+                old = Dataset(path)
+            except OSError:
+                # Cut short when its run was stopped
+                continue
+
+            with old:
+                for g in old.groups.values():
+                    key = g.getncattr('key')
+
+                    if key in keys and key not in self.keys:
+                        self._copy(g)
+
+    def _copy(self, old):
+        g = self.ds.createGroup('var_{}'.format(len(self.keys)))
+        g.setncatts({k: old.getncattr(k) for k in old.ncattrs()})
+
+        for name, dim in old.dimensions.items():
+            g.createDimension(name, len(dim))
+
+        for name, v in old.variables.items():
+            fill = {'fill_value': np.nan} if v.dtype == np.float32 else {}
+            new = g.createVariable(name, v.dtype, v.dimensions, zlib=True,
+                                   **fill)
+            new.setncatts({k: v.getncattr(k) for k in v.ncattrs()
+                           if k != '_FillValue'})
+            new[:] = v[:]
+
+        self.keys.append(old.getncattr('key'))
+
+    def close(self):
+        '''
+        Returns:
+            path: The file written, None when nothing was added
+        '''
+        for path in self.previous:
+            os.remove(path)
+        self.previous = []
+
+        if self.ds is None:
+            return None
+
+        self.ds.setncattr('keys', self.keys)
+        self.ds.close()
+        self.ds = None
+
+        return self.path
+
+
+def read_previews(path):
+    '''
+    Load every preview in a file written by PreviewStore
+
+    Args:
+        path: Path to the previews file
+
+    Returns:
+        previews: Dictionary of keys to dictionaries with the shape, the
+                  levels as a list of (factor, mean, max abs), the histogram
+                  counts and edges and the statistics
+    '''
+    from netCDF4 import Dataset
+
+    previews = {}
+
+    with Dataset(path) as ds:
+        for g in ds.groups.values():
+            levels = []
+            n = 0
+            while 'mean{}'.format(n) in g.variables:
+                mean = g.variables['mean{}'.format(n)]
+                levels.append((int(mean.getncattr('factor')),
+                               np.ma.filled(mean[:], np.nan),
+                               np.ma.filled(
+                                   g.variables['max_abs{}'.format(n)][:],
+                                   np.nan)))
+                n += 1
+
+            attrs = {k: g.getncattr(k) for k in g.ncattrs()}
+            previews[attrs.pop('key')] = {
+                'shape': tuple(int(n) for n in
+                               np.atleast_1d(attrs.pop('shape'))),
+                'zeros': int(attrs.pop('zeros')),
+                'levels': levels,
+                'hist_counts': g.variables['hist_counts'][:].data,
+                'hist_edges': g.variables['hist_edges'][:].data,
+                'stats': attrs}
+
+    return previews
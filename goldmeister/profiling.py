@@ -0,0 +1,249 @@
+'''
+Timing and memory instrumentation of the comparison stages. A disabled
+Profiler hands out a shared do nothing context manager so leaving the
+instrumentation in place costs a method call per stage.
+'''
+
+from collections import OrderedDict
+import json
+import os
+import time
+
+
+class _NullStage():
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage():
+
+    def __init__(self, profiler, name, key, args):
+        self.profiler = profiler
+        self.name = name
+        self.key = key
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add(self.name, self.start,
+                          time.perf_counter() - self.start, key=self.key,
+                          **self.args)
+        return False
+
+
+class Profiler():
+    '''
+    Collects timed events, counters and peaks. Events carry the process id
+    so events recorded in workers can be merged into the profiler of the
+    parent process with merge.
+
+    Attributes:
+        enabled: Boolean, nothing is recorded when False
+        events: List of (name, key, start, duration, pid, args)
+        counters: Dictionary of counter names to totals, e.g. bytes_read
+        peaks: Dictionary of names to the largest value seen, e.g. bytes held
+               in arrays at once
+    '''
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.origin = time.perf_counter()
+        self.events = []
+        self.counters = OrderedDict()
+        self.peaks = OrderedDict()
+
+    def stage(self, name, key=None, **args):
+        '''
+        Time a block of code
+
+        Args:
+            name: Name of the stage, e.g. read or difference
+            key: Optional file/variable the stage worked on
+            args: Extra values to keep with the event
+
+        Returns:
+            context: Context manager recording the event on exit
+        '''
+        if not self.enabled:
+            return _NULL_STAGE
+
+        return _Stage(self, name, key, args)
+
+    def add(self, name, start, duration, key=None, pid=None, **args):
+        '''
+        Record an event timed elsewhere
+        '''
+        if not self.enabled:
+            return
+
+        if pid is None:
+            pid = os.getpid()
+
+        self.events.append((name, key, start, duration, pid, args))
+
+    def count(self, name, n=1):
+        '''
+        Add n to a counter
+        '''
+        if not self.enabled:
+            return
+
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def peak(self, name, value):
+        '''
+        Keep the largest value seen for name
+        '''
+        if not self.enabled:
+            return
+
+        if value > self.peaks.get(name, 0):
+            self.peaks[name] = value
+
+    def payload(self):
+        '''
+        Returns:
+            payload: Picklable tuple of everything recorded, None when
+                     disabled, for returning from a worker
+        '''
+        if not self.enabled:
+            return None
+
+        return (self.events, dict(self.counters), dict(self.peaks))
+
+    def merge(self, payload, key=None):
+        '''
+        Add what was recorded by another profiler, e.g. in a worker process
+
+        Args:
+            payload: Tuple from Profiler.payload or None
+            key: File/variable to assign to events recorded without one
+        '''
+        if not self.enabled or payload is None:
+            return
+
+        events, counters, peaks = payload
+
+        for name, k, start, duration, pid, args in events:
+            self.events.append((name, k or key, start, duration, pid, args))
+
+        for name, n in counters.items():
+            self.count(name, n)
+
+        for name, value in peaks.items():
+            self.peak(name, value)
+
+    def report(self):
+        '''
+        Returns:
+            report: ProfileReport of everything recorded so far
+        '''
+        return ProfileReport(self)
+
+
+class ProfileReport():
+    '''
+    Summary of a Profiler.
+
+    Attributes:
+        stages: Ordered dictionary of stage names to a dictionary of the
+                calls, total_s and max_s
+        variables: Ordered dictionary of file/variable keys to a dictionary
+                   of stage names to seconds
+        counters: Dictionary of counter names to totals
+        peaks: Dictionary of peak names to the largest value seen
+    '''
+
+    def __init__(self, profiler):
+        self.origin = profiler.origin
+        self.events = list(profiler.events)
+        self.counters = OrderedDict(profiler.counters)
+        self.peaks = OrderedDict(profiler.peaks)
+        self.stages = OrderedDict()
+        self.variables = OrderedDict()
+
+        for name, key, start, duration, pid, args in self.events:
+            s = self.stages.setdefault(name, {'calls': 0, 'total_s': 0.0,
+                                              'max_s': 0.0})
+            s['calls'] += 1
+            s['total_s'] += duration
+            s['max_s'] = max(s['max_s'], duration)
+
+            if key is not None:
+                v = self.variables.setdefault(key, OrderedDict())
+                v[name] = v.get(name, 0.0) + duration
+
+    def to_dict(self):
+        return {'stages': self.stages,
+                'variables': self.variables,
+                'counters': self.counters,
+                'peaks': self.peaks}
+
+    def to_json(self, path=None):
+        '''
+        Args:
+            path: Optional file to write to
+
+        Returns:
+            text: JSON of the report
+        '''
+        text = json.dumps(self.to_dict(), indent=2)
+
+        if path is not None:
+            with open(path, 'w') as fp:
+                fp.write(text)
+
+        return text
+
+    def to_trace(self, path):
+        '''
+        Write the events in the Chrome trace event format, viewable in
+        chrome://tracing or https://ui.perfetto.dev
+
+        Args:
+            path: File to write to
+        '''
+        trace = []
+
+        for name, key, start, duration, pid, args in self.events:
+            args = dict(args)
+            if key is not None:
+                args['key'] = key
+
+            trace.append({'name': name,
+                          'cat': 'goldmeister',
+                          'ph': 'X',
+                          'ts': (start - self.origin) * 1e6,
+                          'dur': duration * 1e6,
+                          'pid': pid,
+                          'tid': pid,
+                          'args': args})
+
+        with open(path, 'w') as fp:
+            json.dump({'traceEvents': trace,
+                       'otherData': {'counters': self.counters,
+                                     'peaks': self.peaks}}, fp)
+
+    def __str__(self):
+        lines = ['{:<24}{:>8}{:>12}{:>12}'.format('stage', 'calls', 'total s',
+                                                 'max s')]
+
+        for name, s in self.stages.items():
+            lines.append('{:<24}{:>8}{:>12.3f}{:>12.3f}'.format(
+                name, s['calls'], s['total_s'], s['max_s']))
+
+        for name, n in list(self.counters.items()) + \
+                list(self.peaks.items()):
+            lines.append('{:<24}{:>32}'.format(name, n))
+
+        return '\n'.join(lines)
@@ -0,0 +1,151 @@
+'''
+Metadata only comparisons. Variable lists, shapes, dtypes and attributes are
+compared along with file checksums without reading any variable data.
+'''
+
+from collections import OrderedDict
+
+import numpy as np
+
+from .utilities import content_id, file_name
+
+
+def _attrs(obj):
+    return {k: obj.getncattr(k) for k in obj.ncattrs()}
+
+
+def _attrs_differ(a, b):
+    '''
+    Returns:
+        names: Sorted list of attribute names added, removed or changed
+    '''
+    names = []
+
+    for k in sorted(set(a.keys()) | set(b.keys())):
+        if k not in a or k not in b:
+            names.append(k)
+
+        elif not np.array_equal(np.asarray(a[k]), np.asarray(b[k])):
+            names.append(k)
+
+    return names
+
+
+def quick_compare(gold, compare, ignore_vars=()):
+    '''
+    Compare the structure of two open datasets.
+
+    Args:
+        gold: netCDF4.Dataset used as the basis
+        compare: netCDF4.Dataset compared against the gold
+        ignore_vars: Variable names to leave out
+
+    Returns:
+        differences: List of strings describing each difference found
+    '''
+    differences = []
+
+    changed = _attrs_differ(_attrs(gold), _attrs(compare))
+    if changed:
+        differences.append('global attributes differ: {}'
+                           ''.format(', '.join(changed)))
+
+    g_vars = [v for v in gold.variables.keys() if v not in ignore_vars]
+    c_vars = [v for v in compare.variables.keys() if v not in ignore_vars]
+
+    for v in g_vars:
+        if v not in c_vars:
+            differences.append('{}: missing from compare'.format(v))
+
+    for v in c_vars:
+        if v not in g_vars:
+            differences.append('{}: not in gold'.format(v))
+
+    for v in g_vars:
+        if v not in c_vars:
+            continue
+
+        g = gold.variables[v]
+        c = compare.variables[v]
+
+        if g.shape != c.shape:
+            differences.append('{}: shape {} != {}'.format(v, g.shape,
+                                                           c.shape))
+
+        if g.dtype != c.dtype:
+            differences.append('{}: dtype {} != {}'.format(v, g.dtype,
+                                                           c.dtype))
+
+        if g.dimensions != c.dimensions:
+            differences.append('{}: dimensions {} != {}'
+                               ''.format(v, g.dimensions, c.dimensions))
+
+        changed = _attrs_differ(_attrs(g), _attrs(c))
+        if changed:
+            differences.append('{}: attributes differ: {}'
+                               ''.format(v, ', '.join(changed)))
+
+    return differences
+
+
+def quick_compare_files(gold_f, compare_f, pool, ignore_vars=()):
+    '''
+    Compare two files by checksum and then by structure.
+
+    Args:
+        gold_f: Path or BlobFile used as the basis
+        compare_f: Path or BlobFile compared against the gold
+        pool: DatasetPool to open the files with
+        ignore_vars: Variable names to leave out
+
+    Returns:
+        differences: List of strings describing each difference found, empty
+                     when the files are identical
+    '''
+    gold_id = content_id(gold_f)
+    compare_id = content_id(compare_f)
+
+    if gold_id == compare_id:
+        return []
+
+    differences = quick_compare(pool.get(gold_f), pool.get(compare_f),
+                                ignore_vars=ignore_vars)
+
+    differences.append('checksum {} != {}'.format(gold_id[:12],
+                                                  compare_id[:12]))
+
+    return differences
+
+
+def quick_compare_pairs(pairs, pool, ignore_vars=(), log=None):
+    '''
+    Compare each pair of files by checksum and then by structure.
+
+    Args:
+        pairs: List of (gold, compare) paths or BlobFiles
+        pool: DatasetPool to open the files with
+        ignore_vars: Variable names to leave out
+        log: Optional logger to report each file to
+
+    Returns:
+        report: Ordered dictionary of gold file names to a list of the
+                differences found, empty when the files are identical
+    '''
+    report = OrderedDict()
+
+    for gold_f, compare_f in pairs:
+        name = file_name(gold_f)
+        report[name] = quick_compare_files(gold_f, compare_f, pool,
+                                           ignore_vars=ignore_vars)
+
+        if log is None:
+            continue
+
+        if report[name]:
+            log.warning('{} differs:'.format(name))
+            for d in report[name]:
+                log.warning('    {}'.format(d))
+        else:
+            log.info('{} is identical'.format(name))
+
+    return report
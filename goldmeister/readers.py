@@ -0,0 +1,462 @@
+'''
+Readers for each type of gold file. A reader opens a file as a dataset that
+looks like a netCDF4.Dataset, a dictionary of variables each with a name,
+shape, dtype, dimensions, attributes and chunking that only read data when
+sliced. Everything else in goldmeister works through that interface, so lazy,
+parallel and streaming comparisons work the same for every format.
+
+Readers are registered by file_type with register_reader. Optional
+dependencies are imported when a file of that type is first opened.
+'''
+
+from collections import OrderedDict
+from os.path import basename, isdir
+import io
+
+import numpy as np
+
+# file_type to reader class
+READERS = OrderedDict()
+
+
+def register_reader(file_type, *aliases):
+    '''
+    Class decorator registering a reader for a file_type and any aliases
+
+    Args:
+        file_type: Name used for file_type, e.g. netcdf
+        aliases: Other names accepted for the same file_type
+    '''
+    def register(cls):
+        cls.file_type = file_type
+
+        for name in (file_type,) + aliases:
+            READERS[name.lower()] = cls
+
+        return cls
+
+    return register
+
+
+def get_reader(file_type):
+    '''
+    Args:
+        file_type: Registered name of the file type
+
+    Returns:
+        reader: Instance of the reader for file_type
+    '''
+    if file_type is None or file_type.lower() not in READERS:
+        raise ValueError("No reader for file_type {}, available types are {}"
+                         "".format(file_type, ', '.join(file_types())))
+
+    return READERS[file_type.lower()]()
+
+
+def file_types():
+    '''
+    Returns:
+        names: Sorted list of the main name of each registered file type
+    '''
+    return sorted(set(cls.file_type for cls in READERS.values()))
+
+
+def _bounds(index, shape):
+    '''
+    Split an index into the contiguous region it falls in and the index to
+    apply to that region once read, so formats that only read windows can
+    take any index netCDF4 takes.
+
+    Returns:
+        tuple: Tuple of step 1 slices of the region and the tuple to index
+               the region with
+    '''
+    if not isinstance(index, tuple):
+        index = (index,)
+
+    for i, ix in enumerate(index):
+        if ix is Ellipsis:
+            fill = (slice(None),) * (len(shape) - len(index) + 1)
+            index = index[:i] + fill + index[i + 1:]
+            break
+
+    index = index + (slice(None),) * (len(shape) - len(index))
+
+    region = []
+    rest = []
+
+    for ix, n in zip(index, shape):
+        if isinstance(ix, slice) and (ix.step is None or ix.step > 0):
+            start, stop, step = ix.indices(n)
+            region.append(slice(start, max(start, stop)))
+            rest.append(slice(None, None, step))
+
+        elif isinstance(ix, (int, np.integer)):
+            i = int(ix) + n if ix < 0 else int(ix)
+            region.append(slice(i, i + 1))
+            rest.append(0)
+
+        else:
+            region.append(slice(0, n))
+            rest.append(ix)
+
+    return tuple(region), tuple(rest)
+
+
+def mask_fills(data, fills):
+    '''
+    Mask the fill values of an array the way netCDF4 does
+
+    Args:
+        data: Array or masked array
+        fills: List of fill values to mask
+
+    Returns:
+        data: Masked array
+    '''
+    data = np.ma.asarray(data)
+    values = np.ma.getdata(data)
+
+    for fv in fills:
+        if fv is None:
+            continue
+
+        fv = np.asarray(fv)
+
+        if fv.dtype.kind == 'f' and np.isnan(fv).any():
+            continue
+
+        if values.dtype.kind in 'biuf':
+            data = np.ma.masked_where(values == fv.astype(values.dtype),
+                                      data, copy=False)
+
+    return data
+
+
+class Attributes():
+    '''
+    Attribute access with the netCDF4 method names, used by quick_compare
+    '''
+
+    def ncattrs(self):
+        return list(self.attributes.keys())
+
+    def getncattr(self, k):
+        return self.attributes[k]
+
+
+class ReaderVariable(Attributes):
+    '''
+    Base class for the variables of formats read without netCDF4. Subclasses
+    implement _read for a region of step 1 slices.
+
+    Attributes:
+        name: Name of the variable
+        shape: Shape of the variable
+        dtype: Numpy dtype of the data
+        dimensions: Tuple of the dimension names
+        attributes: Dictionary of the variable's attributes
+        fills: Values masked when read
+    '''
+
+    def __init__(self, name, shape, dtype, dimensions=None, attributes=None,
+                 fills=()):
+        self.name = name
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.attributes = OrderedDict() if attributes is None else attributes
+        self.fills = fills
+
+        if dimensions is None:
+            dimensions = tuple('dim_{}'.format(i)
+                               for i in range(len(self.shape)))
+
+        self.dimensions = tuple(dimensions)
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    def chunking(self):
+        '''
+        Returns:
+            chunks: List of the chunk size along each dimension or
+                    'contiguous', the same as netCDF4.Variable.chunking
+        '''
+        return 'contiguous'
+
+    def _read(self, region):
+        raise NotImplementedError()
+
+    def __getitem__(self, index):
+        region, rest = _bounds(index, self.shape)
+        data = mask_fills(self._read(region), self.fills)
+
+        return data[rest]
+
+    def __repr__(self):
+        return '{}({} {} {})'.format(self.__class__.__name__, self.name,
+                                     self.shape, self.dtype)
+
+
+class ReaderDataset(Attributes):
+    '''
+    Open file of a format read without netCDF4
+
+    Attributes:
+        variables: Ordered dictionary of names to ReaderVariables
+        attributes: Dictionary of the global attributes
+    '''
+
+    def __init__(self, variables, attributes=None, closers=()):
+        self.variables = variables
+        self.attributes = OrderedDict() if attributes is None else attributes
+        self._closers = list(closers)
+
+    def close(self):
+        for c in self._closers:
+            c.close()
+
+        self._closers = []
+
+
+def _fills(attributes):
+    '''
+    Returns:
+        fills: List of the _FillValue and missing_value attributes
+    '''
+    fills = []
+
+    for k in ['_FillValue', 'missing_value']:
+        if k in attributes and attributes[k] is not None:
+            fills += list(np.atleast_1d(attributes[k]))
+
+    return fills
+
+
+@register_reader('netcdf', 'nc', 'netcdf4', 'netcdf3')
+class NetCDFReader():
+    '''
+    netCDF3 and netCDF4/HDF5 files read with netCDF4
+    '''
+
+    def open(self, f):
+        '''
+        Args:
+            f: Path or object with an open method such as a
+               goldmeister.gitobjects.BlobFile
+
+        Returns:
+            ds: Open netCDF4.Dataset
+        '''
+        from netCDF4 import Dataset
+
+        if isinstance(f, str):
+            return Dataset(f)
+
+        return f.open()
+
+
+class GeoTiffBand(ReaderVariable):
+
+    def __init__(self, src, band, name, attributes):
+        super().__init__(name, (src.height, src.width), src.dtypes[band - 1],
+                         dimensions=('y', 'x'), attributes=attributes)
+        self.src = src
+        self.band = band
+
+    def chunking(self):
+        return list(self.src.block_shapes[self.band - 1])
+
+    def _read(self, region):
+        from rasterio.windows import Window
+
+        rows, cols = region
+        window = Window(cols.start, rows.start, cols.stop - cols.start,
+                        rows.stop - rows.start)
+
+        # Masked by the nodata value and any internal mask
+        return self.src.read(self.band, window=window, masked=True)
+
+
+@register_reader('geotiff', 'tiff', 'tif')
+class GeoTiffReader():
+    '''
+    GeoTIFF files read with rasterio. Each band is a 2D variable named after
+    its description, or band_<n> when it has none, read by window so the
+    blocks streamed line up with the tiles of the file.
+    '''
+
+    def open(self, f):
+        try:
+            import rasterio
+        except ImportError:
+            raise ImportError("Reading GeoTIFF files requires rasterio, "
+                              "pip install rasterio")
+
+        closers = []
+
+        if isinstance(f, str):
+            src = rasterio.open(f)
+        elif getattr(f, 'cache_dir', None) is not None:
+            src = rasterio.open(f.cache_path())
+        else:
+            memfile = rasterio.io.MemoryFile(f.read_bytes())
+            closers.append(memfile)
+            src = memfile.open()
+
+        closers.insert(0, src)
+
+        variables = OrderedDict()
+        for band in src.indexes:
+            name = src.descriptions[band - 1] or 'band_{}'.format(band)
+
+            attributes = OrderedDict(src.tags(band))
+            if src.nodatavals[band - 1] is not None:
+                attributes['_FillValue'] = src.nodatavals[band - 1]
+
+            variables[name] = GeoTiffBand(src, band, name, attributes)
+
+        attributes = OrderedDict(src.tags())
+        attributes['crs'] = str(src.crs)
+        attributes['transform'] = list(src.transform)[:6]
+
+        return ReaderDataset(variables, attributes=attributes,
+                             closers=closers)
+
+
+class ZarrArray(ReaderVariable):
+
+    def __init__(self, name, array):
+        attributes = OrderedDict(array.attrs)
+        dimensions = attributes.pop('_ARRAY_DIMENSIONS', None)
+        fills = _fills(attributes)
+
+        # xarray stores _FillValue as the fill_value of the array
+        if dimensions is not None and '_FillValue' not in attributes and \
+           array.fill_value is not None:
+            fills.append(array.fill_value)
+
+        if dimensions is None:
+            dimensions = getattr(getattr(array, 'metadata', None),
+                                 'dimension_names', None)
+
+        if dimensions is not None and None in dimensions:
+            dimensions = None
+
+        super().__init__(name, array.shape, array.dtype,
+                         dimensions=dimensions, attributes=attributes,
+                         fills=fills)
+        self.array = array
+
+    def chunking(self):
+        return list(self.array.chunks)
+
+    def _read(self, region):
+        # zarr fetches and decodes every chunk in the region
+        return self.array[region]
+
+
+def _zarr_arrays(group, prefix=''):
+    '''
+    Yield (path, array) of every array in a zarr group and its subgroups
+    '''
+    for name, array in sorted(group.arrays()):
+        yield prefix + name, array
+
+    for name, sub in sorted(group.groups()):
+        for item in _zarr_arrays(sub, prefix=prefix + name + '/'):
+            yield item
+
+
+@register_reader('zarr')
+class ZarrReader():
+    '''
+    Zarr stores read with zarr. Every array in the store and its groups is a
+    variable, named by its path in the store. Streamed blocks are aligned to
+    the zarr chunks so each chunk is decoded once.
+    '''
+
+    def open(self, f):
+        try:
+            import zarr
+        except ImportError:
+            raise ImportError("Reading Zarr stores requires zarr, "
+                              "pip install zarr")
+
+        if isinstance(f, str):
+            name = basename(f.rstrip('/\\'))
+
+        # Stores in git are written out to a directory first
+        elif getattr(f, 'is_tree', False):
+            name = f.name
+            f = f.cache_path()
+
+        else:
+            raise ValueError("Zarr stores are directories and can only be "
+                             "read from a path or a directory in git, not {}"
+                             "".format(f))
+
+        root = zarr.open(f, mode='r')
+        variables = OrderedDict()
+
+        if isinstance(root, zarr.Array):
+            name = name.rsplit('.zarr', 1)[0]
+            variables[name] = ZarrArray(name, root)
+
+        else:
+            for name, array in _zarr_arrays(root):
+                variables[name] = ZarrArray(name, array)
+
+        return ReaderDataset(variables, attributes=OrderedDict(root.attrs))
+
+
+class CSVColumn(ReaderVariable):
+
+    def __init__(self, name, values):
+        super().__init__(name, values.shape, values.dtype,
+                         dimensions=('row',))
+        self.values = values
+
+    def _read(self, region):
+        return self.values[region]
+
+
+@register_reader('csv')
+class CSVReader():
+    '''
+    Delimited text such as station time series with a header row. Each
+    numeric column is a 1D variable, empty values are masked. Text columns
+    such as dates are left out.
+    '''
+    delimiter = ','
+
+    def open(self, f):
+        if isinstance(f, str):
+            if isdir(f):
+                raise ValueError("{} is a directory, not a CSV file"
+                                 "".format(f))
+
+            with open(f, 'r', newline='') as fp:
+                text = fp.read()
+        else:
+            text = f.read_bytes().decode('utf-8')
+
+        table = np.genfromtxt(io.StringIO(text), delimiter=self.delimiter,
+                              names=True, dtype=None, encoding='utf-8',
+                              usemask=True, deletechars='', replace_space=' ',
+                              autostrip=True)
+        table = np.atleast_1d(table)
+
+        variables = OrderedDict()
+        for name in table.dtype.names or []:
+            column = table[name]
+
+            if column.dtype.kind in 'biuf':
+                variables[name] = CSVColumn(name, column)
+
+        return ReaderDataset(variables)
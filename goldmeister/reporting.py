@@ -0,0 +1,100 @@
+'''
+Buffered reporting of the comparison statistics. Each file/variable only
+adds a record while comparing, and the records are logged as a single
+summary table at the end, so thousands of variables cost a list append each
+instead of a dozen formatted log lines.
+'''
+
+from collections import OrderedDict
+
+import numpy as np
+
+from .statistics import has_differences
+
+# Statistics shown for each differing variable in the summary
+SUMMARY_STATS = ['max_abs', 'mean', 'rmse', 'nonzero']
+
+
+def _cell(value):
+    if value is None:
+        return '-'
+
+    if isinstance(value, (float, np.floating)):
+        return '{:.6g}'.format(value)
+
+    return str(value)
+
+
+class StatsReport():
+    '''
+    Statistics of each file/variable reported during a comparison. str() of
+    the report is the summary table, only built when it is logged.
+
+    Attributes:
+        records: Ordered dictionary of keys to a dictionary of the stats,
+                 whether the data was identical, whether it was reported and
+                 the first timestep with differences
+    '''
+
+    def __init__(self):
+        self.records = OrderedDict()
+        self.first_steps = {}
+
+    def add(self, key, stats, identical=False, reported=True):
+        '''
+        Args:
+            key: Key in GoldCompare.data
+            stats: Dictionary of the difference statistics
+            identical: Boolean indicating the data was found to be identical
+            reported: Boolean that is False when only_report_nonzero left the
+                      variable out of the results
+        '''
+        self.records[key] = {'stats': stats, 'identical': identical,
+                             'reported': reported}
+
+    def add_index(self, key, index):
+        '''
+        Args:
+            key: Key in GoldCompare.data
+            index: goldmeister.localize.DifferenceIndex of the key
+        '''
+        if index is not None and index.first_step is not None:
+            self.first_steps[key] = index.first_step
+
+    def clear(self):
+        self.records.clear()
+        self.first_steps.clear()
+
+    def __len__(self):
+        return len(self.records)
+
+    def differing(self):
+        '''
+        Returns:
+            keys: List of the keys with differences
+        '''
+        return [k for k, r in self.records.items()
+                if not r['identical'] and has_differences(r['stats'])]
+
+    def __str__(self):
+        differing = self.differing()
+        identical = len([r for r in self.records.values() if r['identical']])
+
+        lines = ['{} variables compared, {} differ, {} identical'
+                 ''.format(len(self.records), len(differing), identical)]
+
+        if differing:
+            width = max([len(k) for k in differing] + [8])
+            header = ['variable'.ljust(width)] + \
+                ['{:>14}'.format(s) for s in SUMMARY_STATS + ['first_step']]
+            lines.append('  '.join(header))
+
+            for k in differing:
+                stats = self.records[k]['stats']
+                row = [k.ljust(width)] + \
+                    ['{:>14}'.format(_cell(stats.get(s)))
+                     for s in SUMMARY_STATS] + \
+                    ['{:>14}'.format(_cell(self.first_steps.get(k)))]
+                lines.append('  '.join(row))
+
+        return '\n'.join(lines)
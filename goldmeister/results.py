@@ -0,0 +1,324 @@
+'''
+Columnar store of comparison statistics. One row per file/variable held in
+a numpy structured array so thousands of results can be filtered, sorted and
+exported without keeping the data arrays around.
+'''
+
+from collections import OrderedDict
+from fnmatch import fnmatch
+import csv
+import json
+
+import numpy as np
+
+from .statistics import has_differences
+
+# Statistics columns and their types, in the order they are exported
+STAT_COLUMNS = [('max', 'f8'),
+                ('min', 'f8'),
+                ('mean', 'f8'),
+                ('std', 'f8'),
+                ('rmse', 'f8'),
+                ('max_abs', 'f8'),
+                ('nonzero', 'i8'),
+                ('count', 'i8'),
+                ('nan', 'i8'),
+                ('mask_mismatch', 'i8')]
+
+
+def split_key(key):
+    '''
+    Split a key in GoldCompare.data, e.g. file-gold.nc:precip
+
+    Returns:
+        tuple: The file name and variable name
+    '''
+    f, v = key.rsplit(':', 1)
+
+    if f.startswith('file-'):
+        f = f[len('file-'):]
+
+    return f, v
+
+
+def _fill(stats, name, dtype, differs):
+    '''
+    Value of a statistic for a row. Statistics that are not computed for
+    identical data are zero, anything else missing is NaN or -1.
+    '''
+    value = stats.get(name)
+
+    if value is None:
+        if not differs and name != 'count':
+            return 0
+        return np.nan if dtype == 'f8' else -1
+
+    return value
+
+
+class ResultsTable():
+    '''
+    Statistics of each file/variable compared, one row each. Columns are
+    key, file, variable, differs, first_step and the statistics in
+    STAT_COLUMNS. first_step is the first timestep with differences when
+    they were located, otherwise -1.
+
+    Attributes:
+        table: numpy structured array of the rows
+        entries: Optional dictionary of keys to the goldmeister.lazy.Entry
+                 they came from, held by reference for plotting
+    '''
+
+    def __init__(self, table, entries=None):
+        self.table = table
+        self.entries = entries
+
+    @classmethod
+    def from_results(cls, results, keep_entries=False):
+        '''
+        Build a table from the dictionary returned by GoldCompare.compare
+
+        Args:
+            results: Dictionary of keys to entries with stats
+            keep_entries: Boolean flag to keep a reference to each entry and
+                          the arrays it holds
+
+        Returns:
+            table: ResultsTable
+        '''
+        keys = list(results.keys())
+        width = max([len(k) for k in keys] + [1])
+
+        dtype = [('key', 'U{}'.format(width)),
+                 ('file', 'U{}'.format(width)),
+                 ('variable', 'U{}'.format(width)),
+                 ('differs', '?'),
+                 ('first_step', 'i8')] + STAT_COLUMNS
+
+        table = np.zeros(len(keys), dtype=dtype)
+
+        for i, key in enumerate(keys):
+            stats = results[key]['stats']
+            differs = has_differences(stats)
+            f, v = split_key(key)
+
+            index = results[key].get('index')
+            first_step = -1
+            if index is not None and index.first_step is not None:
+                first_step = index.first_step
+
+            table[i] = (key, f, v, differs, first_step) + tuple(
+                _fill(stats, name, t, differs) for name, t in STAT_COLUMNS)
+
+        entries = None
+        if keep_entries:
+            entries = OrderedDict((k, results[k]) for k in keys)
+
+        return cls(table, entries=entries)
+
+    @property
+    def columns(self):
+        return list(self.table.dtype.names)
+
+    def __len__(self):
+        return len(self.table)
+
+    def __iter__(self):
+        for i in range(len(self.table)):
+            yield self.row(i)
+
+    def __getitem__(self, k):
+        '''
+        Returns:
+            values: The column array for a column name, the row dictionary
+                    for a key or a ResultsTable for an index, slice or mask
+        '''
+        if isinstance(k, str):
+            if k in self.table.dtype.names:
+                return self.table[k]
+
+            i = np.nonzero(self.table['key'] == k)[0]
+
+            if len(i) == 0:
+                raise KeyError(k)
+
+            return self.row(i[0])
+
+        return self._subset(k)
+
+    def __repr__(self):
+        return '{}({} rows, {} differ)'.format(self.__class__.__name__,
+                                              len(self),
+                                              int(self.table['differs'].sum()))
+
+    def keys(self):
+        return [str(k) for k in self.table['key']]
+
+    def row(self, i):
+        '''
+        Returns:
+            row: Dictionary of the column values of row i
+        '''
+        r = self.table[i]
+        return OrderedDict((name, r[name].item()) for name in self.columns)
+
+    def _subset(self, index):
+        table = self.table[index]
+
+        if np.isscalar(table) or table.ndim == 0:
+            table = np.atleast_1d(table)
+
+        entries = None
+        if self.entries is not None:
+            entries = OrderedDict((str(k), self.entries[str(k)])
+                                  for k in table['key'])
+
+        return self.__class__(table, entries=entries)
+
+    def where(self, mask):
+        '''
+        Args:
+            mask: Boolean array, e.g. table['max_abs'] > 1e-6
+
+        Returns:
+            table: ResultsTable of the rows where mask is True
+        '''
+        return self._subset(np.asarray(mask, dtype=bool))
+
+    def match(self, pattern):
+        '''
+        Args:
+            pattern: Glob pattern matched against the variable or key
+
+        Returns:
+            table: ResultsTable of the matching rows
+        '''
+        mask = [fnmatch(v, pattern) or fnmatch(k, pattern)
+                for k, v in zip(self.table['key'], self.table['variable'])]
+        return self.where(mask)
+
+    def differing(self):
+        '''
+        Returns:
+            table: ResultsTable of only the rows with differences
+        '''
+        return self.where(self.table['differs'])
+
+    def sort(self, by='max_abs', descending=True):
+        '''
+        Args:
+            by: Column to sort on
+            descending: Boolean flag for largest first, NaNs always last
+
+        Returns:
+            table: Sorted ResultsTable
+        '''
+        values = self.table[by]
+
+        if descending and values.dtype.kind in 'fiu':
+            # Negate so the sort is stable and NaNs stay at the end
+            order = np.argsort(-values, kind='stable')
+        else:
+            order = np.argsort(values, kind='stable')
+            if descending:
+                order = order[::-1]
+
+        return self._subset(order)
+
+    def head(self, n=10):
+        return self._subset(slice(0, n))
+
+    def drop_entries(self):
+        '''
+        Release the references to the data arrays
+        '''
+        self.entries = None
+
+    def to_records(self):
+        '''
+        Returns:
+            records: List of a dictionary per row with NaN as None
+        '''
+        records = []
+
+        for r in self:
+            for k, v in r.items():
+                if isinstance(v, float) and np.isnan(v):
+                    r[k] = None
+            records.append(r)
+
+        return records
+
+    def to_csv(self, path):
+        with open(path, 'w', newline='') as fp:
+            writer = csv.writer(fp)
+            writer.writerow(self.columns)
+
+            for r in self.table:
+                writer.writerow(r.tolist())
+
+    def to_json(self, path=None):
+        '''
+        Args:
+            path: Optional file to write to
+
+        Returns:
+            text: JSON list of the rows
+        '''
+        text = json.dumps(self.to_records(), indent=2)
+
+        if path is not None:
+            with open(path, 'w') as fp:
+                fp.write(text)
+
+        return text
+
+    def to_pandas(self):
+        '''
+        Returns:
+            df: pandas.DataFrame of the rows, requires pandas
+        '''
+        try:
+            import pandas as pd
+        except ImportError:
+            raise ImportError("Converting results to a DataFrame requires "
+                              "pandas, pip install pandas")
+
+        return pd.DataFrame.from_records(self.table)
+
+    def to_arrow(self):
+        '''
+        Returns:
+            table: pyarrow.Table of the rows, requires pyarrow
+        '''
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("Converting results to Arrow requires pyarrow, "
+                              "pip install pyarrow")
+
+        return pa.table({name: self.table[name] for name in self.columns})
+
+    def to_parquet(self, path):
+        '''
+        Write the rows to a Parquet file, requires pyarrow
+        '''
+        table = self.to_arrow()
+
+        import pyarrow.parquet as pq
+
+        pq.write_table(table, path)
+
+    def save(self, path):
+        '''
+        Export by the file extension, .csv, .json or .parquet
+        '''
+        if path.endswith('.csv'):
+            self.to_csv(path)
+        elif path.endswith('.json'):
+            self.to_json(path)
+        elif path.endswith('.parquet'):
+            self.to_parquet(path)
+        else:
+            raise ValueError("Unable to tell the format of {}, use .csv, "
+                             ".json or .parquet".format(path))
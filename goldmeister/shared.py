@@ -0,0 +1,235 @@
+'''
+Handing arrays between processes without copying them. A worker writes its
+difference straight into a memory mapped file and returns a small handle,
+and the parent and the rendering processes map the same file instead of
+pickling the data through a pipe. Files are kept in a scratch directory, in
+the output or in shared memory, and each variable's files are deleted once
+it is done. Arrays already mapped stay valid after their files are deleted,
+their memory is freed when the last of them is dropped.
+'''
+
+from collections import OrderedDict
+from os.path import isdir, join
+import os
+import shutil
+import tempfile
+import weakref
+
+import numpy as np
+
+# RAM backed filesystem used for the shm backing
+SHM_DIR = '/dev/shm'
+
+BACKINGS = ['memmap', 'shm']
+
+
+class SharedArray():
+    '''
+    Handle to an array in a memory mapped file. Handles are small and can be
+    pickled to other processes, which map the same file.
+
+    Attributes:
+        path: File holding the array
+        shape: Shape of the array
+        dtype: Numpy dtype of the array
+    '''
+    __slots__ = ('path', 'shape', 'dtype')
+
+    def __init__(self, path, shape, dtype):
+        self.path = path
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+
+    @classmethod
+    def create(cls, path, shape, dtype):
+        '''
+        Make the file for an array, its pages are only allocated once written
+
+        Returns:
+            handle: SharedArray of the file
+        '''
+        handle = cls(path, shape, dtype)
+
+        if handle.nbytes > 0:
+            with open(path, 'wb') as fp:
+                fp.truncate(handle.nbytes)
+
+        return handle
+
+    @property
+    def nbytes(self):
+        return int(np.prod(self.shape)) * self.dtype.itemsize
+
+    def array(self):
+        '''
+        Returns:
+            data: Writable array mapping the file
+        '''
+        if self.nbytes == 0:
+            return np.empty(self.shape, dtype=self.dtype)
+
+        # A plain ndarray view, the memmap subclass leaks into every result
+        return np.asarray(np.memmap(self.path, dtype=self.dtype, mode='r+',
+                                    shape=self.shape))
+
+    def unlink(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __repr__(self):
+        return '{}({} {} {})'.format(self.__class__.__name__, self.path,
+                                     self.shape, self.dtype)
+
+
+class SharedMasked():
+    '''
+    Handle to a masked array held in SharedArrays of its data and, when
+    anything is masked, its mask
+
+    Attributes:
+        data: SharedArray of the data
+        mask: SharedArray of the mask or None
+    '''
+    __slots__ = ('data', 'mask')
+
+    def __init__(self, data, mask=None):
+        self.data = data
+        self.mask = mask
+
+    @property
+    def nbytes(self):
+        return sum(h.nbytes for h in [self.data, self.mask] if h is not None)
+
+    def array(self):
+        '''
+        Returns:
+            data: Masked array mapping the files, nothing is copied
+        '''
+        mask = np.ma.nomask
+        if self.mask is not None:
+            mask = self.mask.array()
+
+        return np.ma.array(self.data.array(), mask=mask, copy=False)
+
+    def unlink(self):
+        for h in [self.data, self.mask]:
+            if h is not None:
+                h.unlink()
+
+    def __repr__(self):
+        return '{}({!r}, mask={!r})'.format(self.__class__.__name__,
+                                           self.data, self.mask)
+
+
+def share_mask(d, data, path):
+    '''
+    Finish handing off a masked array whose data was computed into a
+    SharedArray, writing its mask next to it when it has one
+
+    Args:
+        d: Masked array backed by data
+        data: SharedArray holding the data of d
+        path: File to write the mask to
+
+    Returns:
+        handle: SharedMasked of d
+    '''
+    mask = np.ma.getmask(d)
+
+    if mask is np.ma.nomask:
+        return SharedMasked(data)
+
+    handle = SharedArray.create(path, d.shape, np.bool_)
+    handle.array()[...] = mask
+
+    return SharedMasked(data, mask=handle)
+
+
+def scratch_root(backing, output, nbytes=0):
+    '''
+    Args:
+        backing: One of BACKINGS
+        output: Output directory of the comparison
+        nbytes: Bytes expected to be held at once
+
+    Returns:
+        directory: Where the scratch directory of a backing is made, the
+                   output for memmap and shared memory for shm when the
+                   system has it with room for nbytes. Writing past the end
+                   of a full shared memory kills the process, so the output
+                   is used instead.
+    '''
+    if backing not in BACKINGS:
+        raise ValueError("Unknown shared backing {}, use one of {}"
+                         "".format(backing, ', '.join(BACKINGS)))
+
+    if backing == 'shm' and isdir(SHM_DIR):
+        st = os.statvfs(SHM_DIR)
+
+        if st.f_bavail * st.f_frsize > nbytes:
+            return SHM_DIR
+
+    return output
+
+
+class SharedStore():
+    '''
+    Scratch directory of the arrays handed between processes during a
+    comparison. Each file/variable's arrays are released when it is done and
+    the directory is removed when the store is closed or garbage collected,
+    or the interpreter exits.
+
+    Attributes:
+        directory: Scratch directory
+        handles: Ordered dictionary of keys to SharedMasked handles
+    '''
+
+    def __init__(self, root):
+        self.directory = tempfile.mkdtemp(prefix='goldmeister-scratch-',
+                                          dir=root)
+        self.handles = OrderedDict()
+        self._closer = weakref.finalize(self, shutil.rmtree, self.directory,
+                                        True)
+
+    def path(self, n):
+        '''
+        Returns:
+            path: Prefix of the files for the nth task, a worker writes
+                  <path>.data and <path>.mask
+        '''
+        return join(self.directory, 'var_{}'.format(n))
+
+    def add(self, key, handle):
+        self.handles[key] = handle
+
+    def get(self, key):
+        '''
+        Returns:
+            handle: SharedMasked of key while its files exist, otherwise None
+        '''
+        return self.handles.get(key)
+
+    def release(self, key):
+        '''
+        Delete the files of a key. Arrays mapping them stay valid.
+        '''
+        handle = self.handles.pop(key, None)
+
+        if handle is not None:
+            handle.unlink()
+
+    def keys(self):
+        return list(self.handles.keys())
+
+    @property
+    def nbytes(self):
+        return sum(h.nbytes for h in self.handles.values())
+
+    def close(self):
+        self.handles.clear()
+        self._closer()
+
+    def __len__(self):
+        return len(self.handles)
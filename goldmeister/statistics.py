@@ -0,0 +1,349 @@
+'''
+Statistics used for describing the differences between gold and compare data.
+'''
+
+from collections import OrderedDict
+
+import numpy as np
+
+
+def _limits(dtype):
+    '''
+    Returns:
+        tuple: Starting values for a min and max reduction of dtype
+    '''
+    if np.issubdtype(dtype, np.integer):
+        info = np.iinfo(dtype)
+        return info.max, info.min
+
+    return np.inf, -np.inf
+
+
+def summarize(dd, valid=None, axis=None, work=None):
+    '''
+    Reduce an array of differences to its statistics, optionally keeping an
+    axis so statistics are computed per timestep. Reductions use the where
+    argument instead of masked arrays and reuse a float64 scratch buffer so
+    no temporaries the size of the data are made beyond work.
+
+    Args:
+        dd: Plain numpy array of differences
+        valid: Boolean array of the values to include, None for all of them
+        axis: Axis to keep, e.g. 0 for per timestep statistics. None reduces
+              to scalars.
+        work: Optional preallocated float64 array the same shape as dd
+
+    Returns:
+        stats: Ordered dictionary of max, min, mean, std, rmse, max_abs,
+               nonzero and count
+    '''
+    if axis is None:
+        reduce_axes = None
+    else:
+        reduce_axes = tuple(i for i in range(dd.ndim) if i != axis)
+
+    kw = {}
+    if valid is None:
+        if axis is None:
+            count = dd.size
+        else:
+            count = np.full(dd.shape[axis], dd.size // max(1, dd.shape[axis]))
+
+        nonzero = np.count_nonzero(dd, axis=reduce_axes)
+    else:
+        kw['where'] = valid
+        count = np.count_nonzero(valid, axis=reduce_axes)
+        nonzero = np.count_nonzero(np.logical_and(dd != 0, valid),
+                                   axis=reduce_axes)
+
+    hi, lo = _limits(dd.dtype)
+    mn = np.min(dd, axis=reduce_axes, initial=hi, **kw)
+    mx = np.max(dd, axis=reduce_axes, initial=lo, **kw)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.sum(dd, axis=reduce_axes, dtype=np.float64, **kw) / count
+
+        # Variance from the values centered in the scratch buffer
+        if work is None or work.shape != dd.shape:
+            work = np.empty(dd.shape, dtype=np.float64)
+
+        if axis is None:
+            np.subtract(dd, mean, out=work)
+        else:
+            shape = [1] * dd.ndim
+            shape[axis] = -1
+            np.subtract(dd, mean.reshape(shape), out=work)
+
+        np.square(work, out=work)
+        var = np.sum(work, axis=reduce_axes, **kw) / count
+
+    std = np.sqrt(var)
+
+    # Nothing valid to describe
+    empty = count == 0
+    if np.any(empty):
+        mn = np.where(empty, np.nan, mn)
+        mx = np.where(empty, np.nan, mx)
+
+    stats = OrderedDict()
+    stats['max'] = mx
+    stats['min'] = mn
+    stats['mean'] = mean
+    stats['std'] = std
+    stats['rmse'] = np.sqrt(var + mean**2)
+    stats['max_abs'] = np.maximum(np.abs(mn), np.abs(mx))
+    stats['nonzero'] = nonzero
+    stats['count'] = count
+
+    # Return scalars as numpy scalars rather than 0d arrays
+    if axis is None:
+        for k, v in stats.items():
+            stats[k] = v[()] if isinstance(v, np.ndarray) else v
+
+    return stats
+
+
+def difference_stats(gold, compare, axis=None, out=None, work=None):
+    '''
+    Compute compare - gold and its statistics. Masked values and NaNs are left
+    out of the statistics and counted separately, along with places where
+    only one of the datasets is masked.
+
+    Args:
+        gold: Array or masked array used as the basis
+        compare: Array or masked array compared to the gold
+        axis: Axis to keep for per timestep statistics, None for scalars
+        out: Optional preallocated array for the difference
+        work: Optional preallocated float64 scratch array for the variance
+
+    Returns:
+        tuple: The masked difference array and an ordered dictionary of
+               statistics, see summarize plus nan and mask_mismatch counts
+    '''
+    if gold.shape != compare.shape:
+        raise ValueError("Cannot compare shape {} to shape {}"
+                         "".format(gold.shape, compare.shape))
+
+    if out is not None and out.shape != gold.shape:
+        out = None
+
+    dd = np.subtract(np.ma.getdata(compare), np.ma.getdata(gold), out=out)
+    mask, stats = describe_difference(dd, gold, compare, axis=axis, work=work)
+
+    return np.ma.array(dd, mask=mask, copy=False), stats
+
+
+def describe_difference(dd, gold, compare, axis=None, work=None):
+    '''
+    Statistics of a difference already computed, e.g. per timestep after
+    difference_stats, without subtracting again
+
+    Args:
+        dd: Plain numpy array of compare - gold
+        gold: Array or masked array used as the basis
+        compare: Array or masked array compared to the gold
+        axis: Axis to keep for per timestep statistics, None for scalars
+        work: Optional preallocated float64 scratch array for the variance
+
+    Returns:
+        tuple: The mask of values masked in either dataset and an ordered
+               dictionary of statistics, see difference_stats
+    '''
+    g_mask = np.ma.getmask(gold)
+    c_mask = np.ma.getmask(compare)
+
+    if axis is None:
+        reduce_axes = None
+    else:
+        reduce_axes = tuple(i for i in range(dd.ndim) if i != axis)
+
+    # Masked in either dataset
+    if g_mask is np.ma.nomask and c_mask is np.ma.nomask:
+        mask = np.ma.nomask
+        mismatch = np.zeros(dd.shape[axis], dtype=int) if axis is not None \
+            else 0
+    else:
+        g_mask = np.ma.getmaskarray(gold)
+        c_mask = np.ma.getmaskarray(compare)
+        mask = np.logical_or(g_mask, c_mask)
+        mismatch = np.count_nonzero(g_mask != c_mask, axis=reduce_axes)
+
+    valid = None
+    nan = np.zeros(dd.shape[axis], dtype=int) if axis is not None else 0
+
+    if np.issubdtype(dd.dtype, np.inexact):
+        nans = np.isnan(dd)
+
+        if mask is not np.ma.nomask:
+            nans &= ~mask
+
+        if nans.any():
+            nan = np.count_nonzero(nans, axis=reduce_axes)
+            valid = ~nans
+
+    if mask is not np.ma.nomask:
+        if valid is None:
+            valid = ~mask
+        else:
+            valid &= ~mask
+
+    stats = summarize(dd, valid=valid, axis=axis, work=work)
+    stats['nan'] = nan
+    stats['mask_mismatch'] = mismatch
+
+    return mask, stats
+
+
+class RunningStats():
+    '''
+    Accumulates difference statistics one block at a time so a variable never
+    has to be held in memory all at once. Blocks are merged using the
+    parallel variance algorithm of Chan et al. so the results match computing
+    the statistics on the full array to floating point tolerance.
+
+    Attributes:
+        count: Number of valid (unmasked) values seen
+        nonzero: Number of valid values that are not zero
+        nan: Number of unmasked NaNs seen
+        mask_mismatch: Number of values masked in only one dataset
+        min: Smallest value seen
+        max: Largest value seen
+        mean: Running mean of the values
+    '''
+
+    def __init__(self):
+        self.count = 0
+        self.nonzero = 0
+        self.nan = 0
+        self.mask_mismatch = 0
+        self.min = None
+        self.max = None
+        self.mean = 0.0
+
+        # Sum of squared distances from the mean
+        self._m2 = 0.0
+
+    def merge(self, stats):
+        '''
+        Add the statistics of a block, as computed by difference_stats
+
+        Args:
+            stats: Dictionary of scalar statistics for a block
+        '''
+        self.nan += int(stats['nan'])
+        self.mask_mismatch += int(stats['mask_mismatch'])
+
+        n = int(stats['count'])
+
+        if n == 0:
+            return
+
+        if self.count == 0:
+            self.min = stats['min']
+            self.max = stats['max']
+        else:
+            self.min = min(self.min, stats['min'])
+            self.max = max(self.max, stats['max'])
+
+        # Merge the block into the running moments
+        total = self.count + n
+        delta = stats['mean'] - self.mean
+        self.mean += delta * n / total
+        self._m2 += stats['std']**2 * n + delta**2 * self.count * n / total
+
+        self.nonzero += int(stats['nonzero'])
+        self.count = total
+
+    def add_zeros(self, n):
+        '''
+        Add n zero values without needing the data, used for blocks that are
+        known to be identical
+
+        Args:
+            n: Number of zeros to add
+        '''
+        if n == 0:
+            return
+
+        if self.count == 0:
+            self.min = 0.0
+            self.max = 0.0
+        else:
+            self.min = min(self.min, 0.0)
+            self.max = max(self.max, 0.0)
+
+        total = self.count + n
+        delta = -self.mean
+        self.mean += delta * n / total
+        self._m2 += delta**2 * self.count * n / total
+        self.count = total
+
+    @property
+    def std(self):
+        if self.count == 0:
+            return np.nan
+        return np.sqrt(self._m2 / self.count)
+
+    @property
+    def rmse(self):
+        if self.count == 0:
+            return np.nan
+        return np.sqrt(self._m2 / self.count + self.mean**2)
+
+    def results(self):
+        '''
+        Returns:
+            stats: Ordered dictionary of the statistics with the same keys as
+                   difference_stats
+        '''
+        stats = OrderedDict()
+        stats['max'] = self.max
+        stats['min'] = self.min
+        stats['mean'] = self.mean
+        stats['std'] = self.std
+        stats['rmse'] = self.rmse
+
+        if self.count == 0:
+            stats['max_abs'] = np.nan
+        else:
+            stats['max_abs'] = max(abs(self.min), abs(self.max))
+
+        stats['nonzero'] = self.nonzero
+        stats['count'] = self.count
+        stats['nan'] = self.nan
+        stats['mask_mismatch'] = self.mask_mismatch
+
+        return stats
+
+
+def identical_stats():
+    '''
+    Returns:
+        stats: Statistics of an all zero difference
+    '''
+    stats = OrderedDict()
+    stats['max'] = 0.0
+    stats['min'] = 0.0
+    stats['mean'] = 0.0
+    stats['std'] = 0.0
+
+    return stats
+
+
+def has_differences(stats):
+    '''
+    Whether statistics describe any difference at all. Uses the nonzero
+    count when available since positive and negative differences can cancel
+    out in the mean.
+
+    Args:
+        stats: Dictionary of difference statistics
+
+    Returns:
+        bool: True if anything differs
+    '''
+    if 'nonzero' in stats:
+        return bool(stats['nonzero'] > 0 or stats.get('nan', 0) > 0 or
+                    stats.get('mask_mismatch', 0) > 0)
+
+    return not (stats['max'] == 0 and stats['min'] == 0)
@@ -0,0 +1,129 @@
+'''
+Tools for comparing variables block by block so that peak memory is bounded
+by a configurable budget rather than the size of the files.
+'''
+
+from itertools import product
+
+import numpy as np
+
+from .statistics import RunningStats, difference_stats
+from .utilities import arrays_identical
+
+# Rough number of bytes held per element of a block while comparing. Covers the
+# gold, compare and difference blocks, a float64 copy and their masks.
+BYTES_PER_ELEMENT = 40
+
+
+def iter_blocks(shape, max_elements, chunking=None):
+    '''
+    Split an array shape into hyperslabs containing at most max_elements
+    values. Slabs are taken along the leading axes (typically time) and are
+    aligned to the file chunking when it fits in the budget so that each
+    chunk is only decompressed once.
+
+    Args:
+        shape: Shape of the array to split
+        max_elements: Maximum number of values in a single block
+        chunking: Optional list of chunk sizes per dimension as returned by
+                  netCDF4.Variable.chunking()
+
+    Yields:
+        blocks: Tuple of slices, one per dimension
+    '''
+
+    ndim = len(shape)
+
+    if ndim == 0:
+        yield ()
+        return
+
+    if 0 in shape:
+        return
+
+    max_elements = max(1, int(max_elements))
+
+    # Walk outward from the fastest axis while whole slabs still fit
+    axis = ndim - 1
+    trailing = 1
+    while axis > 0 and trailing * shape[axis] <= max_elements:
+        trailing *= shape[axis]
+        axis -= 1
+
+    step = min(shape[axis], max(1, max_elements // trailing))
+
+    # Align to the chunks along the split axis when possible
+    if isinstance(chunking, (list, tuple)) and chunking[axis] <= step:
+        step -= step % chunking[axis]
+
+    leading = [range(n) for n in shape[:axis]]
+    trailing_slices = tuple(slice(None) for n in shape[axis + 1:])
+
+    for idx in product(*leading):
+        head = tuple(slice(i, i + 1) for i in idx)
+
+        for start in range(0, shape[axis], step):
+            yield head + (slice(start, start + step),) + trailing_slices
+
+
+def _finite_count(d):
+    '''
+    Returns:
+        count: Number of unmasked values in d that are not NaN or infinite
+    '''
+    if not np.issubdtype(d.dtype, np.inexact):
+        return int(np.ma.count(d))
+
+    return int(np.count_nonzero(np.isfinite(np.ma.filled(d, np.nan))))
+
+
+def stream_variable(gold, compare, max_memory, index=None):
+    '''
+    Compute the statistics of compare - gold without reading either variable
+    entirely into memory.
+
+    Args:
+        gold: netCDF4.Variable used as the basis for comparison
+        compare: netCDF4.Variable being compared against the gold
+        max_memory: Approximate number of bytes allowed for the working set
+        index: Optional goldmeister.localize.DifferenceIndex to add each
+               block's differences to
+
+    Returns:
+        stats: Ordered dictionary of statistics from RunningStats
+    '''
+
+    if gold.shape != compare.shape:
+        raise ValueError("Cannot compare variable {} with shape {} to shape {}"
+                         "".format(gold.name, gold.shape, compare.shape))
+
+    chunking = gold.chunking()
+    max_elements = max_memory // BYTES_PER_ELEMENT
+
+    stats = RunningStats()
+
+    # Buffers reused by every full sized block
+    out = None
+    work = None
+
+    for block in iter_blocks(gold.shape, max_elements, chunking=chunking):
+        g = gold[block]
+        c = compare[block]
+
+        # Skip the subtraction for blocks that have not changed. NaNs and
+        # infinities are left out as when differenced.
+        if arrays_identical(g, c):
+            stats.add_zeros(_finite_count(g))
+            continue
+
+        if out is None:
+            out = np.empty(g.shape, dtype=np.result_type(g.dtype, c.dtype))
+            work = np.empty(g.shape, dtype=np.float64)
+
+        dd, block_stats = difference_stats(g, c, out=out, work=work)
+        stats.merge(block_stats)
+
+        if index is not None:
+            index.add(dd, g, c, block=block)
+
+    return stats.results()
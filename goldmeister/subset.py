@@ -0,0 +1,492 @@
+'''
+Comparing part of the data and aligning datasets on their coordinates.
+Selections are made per dimension, by index or by a range of the values of
+the dimension's coordinate variable, the 1D variable named after it such as
+the time, y and x in ignore_vars. Each variable is then read through a tuple
+of slices so only the selected hyperslab is read from disk.
+
+Aligning cuts the gold and compare to the coordinate values they share, so a
+run that changed the time range or grid extent is compared where it overlaps
+instead of failing on the shapes.
+'''
+
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+# ISO dates accepted as time bounds
+DATE_FORMATS = ['%Y-%m-%d', '%Y-%m-%dT%H', '%Y-%m-%dT%H:%M',
+                '%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%d %H',
+                '%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M:%S.%f']
+
+
+def parse_selection(text):
+    '''
+    Parse a selection from the command line, e.g. time=0:24 or
+    x=500000:510000. Bounds are numbers, ISO dates for time coordinates or
+    left out for the start or end.
+
+    Returns:
+        tuple: The dimension name and a (start, stop) tuple of the bounds
+    '''
+    if '=' not in text or ':' not in text.split('=', 1)[1]:
+        raise ValueError("Selections are DIM=START:STOP, not {}".format(text))
+
+    dim, bounds = text.split('=', 1)
+    start, stop = bounds.split(':', 1)
+
+    def value(b):
+        b = b.strip()
+
+        if not b:
+            return None
+
+        try:
+            return int(b)
+        except ValueError:
+            pass
+
+        try:
+            return float(b)
+        except ValueError:
+            return b
+
+    return dim.strip(), (value(start), value(stop))
+
+
+def compose(selection, index):
+    '''
+    Combine the selection of a variable with an index into the selected
+    data, giving the index into the whole variable
+
+    Args:
+        selection: Tuple of slices with explicit bounds from
+                   variable_selection, one per dimension
+        index: Index into the selected data, anything netCDF4 takes
+
+    Returns:
+        index: Tuple indexing the whole variable
+    '''
+    ndim = len(selection)
+
+    if not isinstance(index, tuple):
+        index = (index,)
+
+    for i, ix in enumerate(index):
+        if ix is Ellipsis:
+            fill = (slice(None),) * (ndim - len(index) + 1)
+            index = index[:i] + fill + index[i + 1:]
+            break
+
+    index = index + (slice(None),) * (ndim - len(index))
+
+    composed = []
+
+    for s, ix in zip(selection, index):
+        positions = range(s.start, s.stop, s.step)
+
+        if isinstance(ix, slice):
+            r = positions[ix]
+            stop = r.stop if r.stop >= 0 else None
+            composed.append(slice(r.start, stop, r.step))
+
+        elif isinstance(ix, (int, np.integer)):
+            composed.append(positions[int(ix)])
+
+        else:
+            composed.append(np.asarray(positions)[ix])
+
+    return tuple(composed)
+
+
+def coordinate(ds, dim):
+    '''
+    Returns:
+        variable: The coordinate variable of dim in ds, None when there is none
+    '''
+    v = ds.variables.get(dim)
+
+    if v is None or tuple(v.dimensions) != (dim,):
+        return None
+
+    return v
+
+
+def _units(v):
+    if 'units' in v.ncattrs():
+        return v.getncattr('units')
+
+    return None
+
+
+def _calendar(v):
+    if 'calendar' in v.ncattrs():
+        return v.getncattr('calendar')
+
+    return 'standard'
+
+
+def coordinate_values(v):
+    '''
+    Args:
+        v: Coordinate variable
+
+    Returns:
+        values: 1D float64 array of the coordinates
+    '''
+    return np.ma.filled(np.ma.asarray(v[:], dtype=np.float64), np.nan)
+
+
+def convert_times(values, units, to_units, calendar='standard'):
+    '''
+    Convert time coordinates between units, e.g. hours since 2000-01-01 to
+    days since 2000-01-01. Other coordinates are returned as they are.
+    '''
+    if units is None or to_units is None or units == to_units or \
+       ' since ' not in units or ' since ' not in to_units:
+        return values
+
+    from netCDF4 import date2num, num2date
+
+    return np.asarray(date2num(num2date(values, units, calendar), to_units,
+                               calendar), dtype=np.float64)
+
+
+def _bound(v, value):
+    '''
+    Convert a coordinate bound to the units of v, parsing ISO dates for time
+    coordinates
+    '''
+    if value is None or not isinstance(value, str):
+        return value
+
+    units = _units(v)
+
+    if units is None or ' since ' not in units:
+        raise ValueError("{} is not a time coordinate, {} must be a number"
+                         "".format(v.name, value))
+
+    from netCDF4 import date2num
+
+    return float(date2num(parse_date(value), units, _calendar(v)))
+
+
+def parse_date(value):
+    '''
+    Parse an ISO date, with or without a time, see DATE_FORMATS
+
+    Returns:
+        date: datetime.datetime
+    '''
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+
+    raise ValueError("{} is not an ISO date such as 2020-10-01 or "
+                     "2020-10-01T12:00".format(value))
+
+
+def as_slice(indices, dim):
+    '''
+    Returns:
+        slice: Slice selecting indices, which must be evenly spaced
+    '''
+    indices = np.asarray(indices)
+
+    if indices.size == 1:
+        return slice(int(indices[0]), int(indices[0]) + 1)
+
+    step = int(indices[1] - indices[0])
+
+    if step <= 0 or not np.all(np.diff(indices) == step):
+        raise ValueError("Coordinates of {} can not be aligned with a regular "
+                         "slice".format(dim))
+
+    return slice(int(indices[0]), int(indices[-1]) + 1, step)
+
+
+def match_coordinates(gold, compare, dim):
+    '''
+    Find the coordinate values shared by the gold and compare. Values match
+    when they are within a thousandth of the smallest spacing.
+
+    Args:
+        gold: 1D array of the gold coordinates
+        compare: 1D array of the compare coordinates
+        dim: Name of the dimension, for errors
+
+    Returns:
+        tuple: Slices of the gold and compare selecting the shared values
+    '''
+    spacing = [np.abs(np.diff(c)) for c in [gold, compare] if c.size > 1]
+    spacing = np.concatenate(spacing) if spacing else np.array([])
+    spacing = spacing[spacing > 0]
+    tol = 1e-3 * spacing.min() if spacing.size else 0
+
+    order = np.argsort(compare, kind='stable')
+    ordered = compare[order]
+
+    pos = np.clip(np.searchsorted(ordered, gold), 1, max(1, ordered.size - 1))
+    lower = np.clip(pos - 1, 0, ordered.size - 1)
+    upper = np.clip(pos, 0, ordered.size - 1)
+    nearest = np.where(np.abs(ordered[lower] - gold) <=
+                       np.abs(ordered[upper] - gold), lower, upper)
+
+    found = np.abs(ordered[nearest] - gold) <= tol
+
+    if not found.any():
+        raise ValueError("The gold and compare share no {} coordinates"
+                         "".format(dim))
+
+    gold_index = np.nonzero(found)[0]
+    compare_index = order[nearest[found]]
+
+    # Descending coordinates are matched in the same direction on both sides
+    if compare_index.size > 1 and compare_index[1] < compare_index[0]:
+        raise ValueError("Coordinates of {} run in opposite directions in "
+                         "the gold and compare".format(dim))
+
+    return as_slice(gold_index, dim), as_slice(compare_index, dim)
+
+
+class Subset():
+    '''
+    Part of each file to compare and whether to align the gold and compare
+    on their coordinates
+
+    Attributes:
+        isel: Ordered dictionary of dimensions to slices of their indices
+        sel: Ordered dictionary of dimensions to (start, stop) tuples of
+             coordinate values, inclusive
+        align: Boolean flag to cut the gold and compare to the coordinate
+               values they share
+    '''
+
+    def __init__(self, isel=None, sel=None, align=False):
+        self.isel = OrderedDict()
+        self.sel = OrderedDict()
+        self.align = align
+
+        for dim, s in sorted((isel or {}).items()):
+            if isinstance(s, (tuple, list)):
+                s = slice(*s)
+
+            if not isinstance(s, slice):
+                raise ValueError("Index selection of {} must be a slice, "
+                                 "not {}".format(dim, s))
+
+            self.isel[dim] = s
+
+        for dim, bounds in sorted((sel or {}).items()):
+            if isinstance(bounds, slice):
+                bounds = (bounds.start, bounds.stop)
+
+            if dim in self.isel:
+                raise ValueError("{} is selected by both index and coordinate"
+                                 "".format(dim))
+
+            self.sel[dim] = tuple(bounds)
+
+    def __bool__(self):
+        return bool(self.isel or self.sel or self.align)
+
+    def signature(self):
+        '''
+        Returns:
+            text: Description of the subset for cache keys and the manifest,
+                  empty when everything is compared
+        '''
+        parts = ['{}={}:{}:{}'.format(d, s.start, s.stop, s.step)
+                 for d, s in self.isel.items()]
+        parts += ['{}~{}:{}'.format(d, lo, hi)
+                  for d, (lo, hi) in self.sel.items()]
+
+        if self.align:
+            parts.append('align')
+
+        return ';'.join(parts)
+
+    def dataset_slices(self, ds):
+        '''
+        Work out the slice of each selected dimension in a dataset, reading
+        only its coordinate variables
+
+        Args:
+            ds: Open netCDF4.Dataset or goldmeister.readers.ReaderDataset
+
+        Returns:
+            tuple: Ordered dictionary of dimensions to slices and, when
+                   aligning, a dictionary of dimensions to the selected
+                   coordinate values, their units and calendar
+        '''
+        slices = OrderedDict()
+        coords = {}
+
+        for dim, s in self.isel.items():
+            slices[dim] = s
+
+        for dim, (lo, hi) in self.sel.items():
+            v = coordinate(ds, dim)
+
+            if v is None:
+                raise ValueError("There is no coordinate variable for {} to "
+                                 "select by".format(dim))
+
+            values = coordinate_values(v)
+            lo = -np.inf if lo is None else _bound(v, lo)
+            hi = np.inf if hi is None else _bound(v, hi)
+            lo, hi = min(lo, hi), max(lo, hi)
+
+            inside = np.nonzero((values >= lo) & (values <= hi))[0]
+
+            if inside.size == 0:
+                raise ValueError("No {} coordinates between {} and {}"
+                                 "".format(dim, lo, hi))
+
+            slices[dim] = slice(int(inside.min()), int(inside.max()) + 1)
+
+        if self.align:
+            for dim in ds_dimensions(ds):
+                v = coordinate(ds, dim)
+
+                if v is not None:
+                    values = coordinate_values(v)[slices.get(dim, slice(None))]
+                    coords[dim] = (values, _units(v), _calendar(v))
+
+        return slices, coords
+
+    def align_slices(self, gold_coords, compare_coords):
+        '''
+        Slices into the selected data of the gold and compare keeping the
+        coordinate values they share
+
+        Args:
+            gold_coords: Dictionary of the gold coordinates from
+                         dataset_slices
+            compare_coords: The same for the compare
+
+        Returns:
+            tuple: Dictionaries of dimensions to slices of the selected gold
+                   and compare data, only dimensions that need cutting
+        '''
+        gold_align = OrderedDict()
+        compare_align = OrderedDict()
+
+        for dim in [d for d in gold_coords if d in compare_coords]:
+            g, units, calendar = gold_coords[dim]
+            c, c_units, c_calendar = compare_coords[dim]
+            c = convert_times(c, c_units, units, c_calendar)
+
+            if g.shape == c.shape and np.array_equal(g, c):
+                continue
+
+            gold_align[dim], compare_align[dim] = match_coordinates(g, c, dim)
+
+        return gold_align, compare_align
+
+
+def ds_dimensions(ds):
+    '''
+    Returns:
+        dimensions: List of the dimension names used by the variables of ds
+    '''
+    dims = OrderedDict()
+
+    for v in ds.variables.values():
+        for d in v.dimensions:
+            dims[d] = True
+
+    return list(dims.keys())
+
+
+def variable_selection(dimensions, slices, shape):
+    '''
+    Args:
+        dimensions: Tuple of the dimension names of a variable
+        slices: Dictionary of dimensions to slices
+        shape: Shape of the variable
+
+    Returns:
+        tuple: Tuple of slices with explicit bounds, one per dimension, and
+               the selected shape. The tuple is None when the whole variable
+               is selected.
+    '''
+    if slices is None or not any(d in slices for d in dimensions):
+        return None, tuple(shape)
+
+    selection = tuple(slice(*slices.get(d, slice(None)).indices(n))
+                      for d, n in zip(dimensions, shape))
+
+    return selection, selected_shape(selection)
+
+
+def selected_shape(selection):
+    '''
+    Returns:
+        shape: Shape of the data selected by a tuple of slices with explicit
+               bounds
+    '''
+    return tuple(len(range(s.start, s.stop, s.step)) for s in selection)
+
+
+def narrow(selection, index):
+    '''
+    Select part of a selection
+
+    Args:
+        selection: Tuple of slices with explicit bounds
+        index: Tuple of slices into the selected data
+
+    Returns:
+        selection: Tuple of slices with explicit bounds of the whole variable
+    '''
+    index = tuple(index) + (slice(None),) * (len(selection) - len(index))
+    narrowed = []
+
+    for s, ix in zip(selection, index):
+        r = range(s.start, s.stop, s.step)[ix]
+        narrowed.append(slice(r.start, r.stop, r.step))
+
+    return tuple(narrowed)
+
+
+def whole(shape):
+    '''
+    Returns:
+        selection: Tuple of slices with explicit bounds selecting everything
+    '''
+    return tuple(slice(0, n, 1) for n in shape)
+
+
+class SubsetVariable():
+    '''
+    Selected part of a netCDF4.Variable, or anything sliced like one, used
+    when streaming. Blocks are read from the variable through the selection.
+
+    Attributes:
+        variable: Whole variable
+        selection: Tuple of slices of the variable
+    '''
+
+    def __init__(self, variable, selection):
+        self.variable = variable
+        self.selection = selection
+        self.name = variable.name
+        self.shape = selected_shape(selection)
+
+    @property
+    def dtype(self):
+        return np.dtype(self.variable.dtype)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    def chunking(self):
+        return self.variable.chunking()
+
+    def __getitem__(self, index):
+        return self.variable[compose(self.selection, index)]
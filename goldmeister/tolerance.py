@@ -0,0 +1,239 @@
+'''
+Tolerance checks for deciding whether differences in gold files are
+acceptable, e.g. float noise from compiler or BLAS changes.
+'''
+
+from collections import OrderedDict
+from fnmatch import fnmatch
+
+import numpy as np
+
+from .lazy import LazyVariable
+from .streaming import BYTES_PER_ELEMENT, iter_blocks
+from .utilities import arrays_identical
+
+
+class Tolerance():
+    '''
+    Thresholds a difference must be within. A value passes when
+    abs(compare - gold) <= atol + rtol * abs(gold), the same as numpy.isclose,
+    or when it is within ulp units in the last place of the gold. The
+    defaults require the data to be exactly equal.
+
+    Attributes:
+        atol: Absolute tolerance
+        rtol: Relative tolerance
+        ulp: Units in the last place allowed for floats, None to not use
+    '''
+
+    def __init__(self, atol=0.0, rtol=0.0, ulp=None):
+        self.atol = atol
+        self.rtol = rtol
+        self.ulp = ulp
+
+    def __repr__(self):
+        return 'Tolerance(atol={}, rtol={}, ulp={})'.format(self.atol,
+                                                            self.rtol,
+                                                            self.ulp)
+
+
+def find_tolerance(key, tolerances):
+    '''
+    Find the tolerance for a file/variable. Patterns are matched in order
+    against the variable name and then the whole key, the first match is
+    used.
+
+    Args:
+        key: Key in GoldCompare.data, e.g. file-gold.nc:temperature
+        tolerances: Dictionary of glob patterns to a Tolerance or a dictionary
+                    of its keyword arguments
+
+    Returns:
+        tol: Tolerance for the key, exact equality when nothing matches
+    '''
+    variable = key.split(':')[-1]
+
+    for pattern, tol in (tolerances or {}).items():
+        if fnmatch(variable, pattern) or fnmatch(key, pattern):
+            if isinstance(tol, dict):
+                tol = Tolerance(**tol)
+            return tol
+
+    return Tolerance()
+
+
+class Verdict():
+    '''
+    Pass/fail result of checking one file/variable against its tolerance.
+
+    Attributes:
+        key: Key in GoldCompare.data
+        passed: Boolean, True when every value is within tolerance
+        identical: Boolean, True when the data is identical
+        violations: Number of values outside the tolerance. When stopping at
+                    the first violation this only counts the block it was in.
+        first_violation: Index of the first value outside the tolerance
+        max_abs: Largest absolute difference among the blocks checked
+        tolerance: Tolerance used
+        reason: Short description of why it failed
+    '''
+
+    def __init__(self, key, tolerance, passed=True, identical=False,
+                 violations=0, first_violation=None, max_abs=0.0,
+                 reason=None):
+        self.key = key
+        self.tolerance = tolerance
+        self.passed = passed
+        self.identical = identical
+        self.violations = violations
+        self.first_violation = first_violation
+        self.max_abs = max_abs
+        self.reason = reason
+
+    def __bool__(self):
+        return self.passed
+
+    def __repr__(self):
+        if self.passed:
+            status = 'identical' if self.identical else 'pass'
+        else:
+            status = 'FAIL ({})'.format(self.reason)
+
+        return 'Verdict({}: {})'.format(self.key, status)
+
+
+def _ordered_ints(x):
+    '''
+    Map floats onto integers so the distance between two values is their
+    number of units in the last place apart
+    '''
+    int_type = np.dtype('i{}'.format(x.dtype.itemsize))
+    i = x.view(int_type).astype(np.int64)
+    return np.where(i < 0, np.iinfo(int_type).min - i, i)
+
+
+def violations(gold, compare, tol):
+    '''
+    Find the values of compare outside the tolerance of gold. Values masked
+    in only one of the arrays and NaNs in only one are always violations.
+
+    Args:
+        gold: Array or masked array
+        compare: Array or masked array of the same shape
+        tol: Tolerance
+
+    Returns:
+        tuple: Boolean array of violations and the max absolute difference
+    '''
+    g = np.ma.getdata(gold)
+    c = np.ma.getdata(compare)
+
+    # Memory mapped netCDF3 data is big endian, the bits are compared below
+    if not g.dtype.isnative:
+        g = g.astype(g.dtype.newbyteorder('='))
+    if not c.dtype.isnative:
+        c = c.astype(c.dtype.newbyteorder('='))
+
+    g_mask = np.ma.getmaskarray(gold)
+    c_mask = np.ma.getmaskarray(compare)
+    both_masked = g_mask & c_mask
+
+    with np.errstate(invalid='ignore', over='ignore'):
+        err = np.abs(c.astype(np.float64) - g)
+        bad = err > tol.atol + tol.rtol * np.abs(g.astype(np.float64))
+
+        if tol.ulp is not None and np.issubdtype(g.dtype, np.floating) and \
+           g.dtype == c.dtype:
+            ulps = np.abs(_ordered_ints(c) - _ordered_ints(g))
+            bad &= ulps > tol.ulp
+
+    # NaNs in both places are equal, in one place they are not
+    if np.issubdtype(g.dtype, np.inexact) or np.issubdtype(c.dtype,
+                                                          np.inexact):
+        g_nan = np.isnan(g)
+        c_nan = np.isnan(c)
+        bad |= g_nan != c_nan
+        bad &= ~(g_nan & c_nan)
+        err[g_nan | c_nan] = 0
+
+    bad |= g_mask != c_mask
+    bad &= ~both_masked
+    err[g_mask | c_mask] = 0
+
+    max_abs = err.max() if err.size else 0.0
+
+    return bad, max_abs
+
+
+def check_variable(key, gold, compare, tol, max_memory=256 * 1024**2,
+                   stop_early=True):
+    '''
+    Check a variable against a tolerance block by block, reading the blocks
+    from disk when given LazyVariables. Identical blocks are skipped and
+    the check stops at the first block with a violation when stop_early.
+
+    Args:
+        key: Key in GoldCompare.data
+        gold: Array or LazyVariable used as the basis
+        compare: Array or LazyVariable compared against the gold
+        tol: Tolerance
+        max_memory: Approximate bytes to hold per block
+        stop_early: Boolean flag to stop at the first block with a violation
+
+    Returns:
+        verdict: Verdict for the variable
+    '''
+    verdict = Verdict(key, tol, identical=True)
+
+    if tuple(gold.shape) != tuple(compare.shape):
+        verdict.passed = False
+        verdict.identical = False
+        verdict.reason = 'shape {} != {}'.format(gold.shape, compare.shape)
+        return verdict
+
+    def read(d, block):
+        if isinstance(d, LazyVariable):
+            return d.read(block)
+        return d[block]
+
+    for block in iter_blocks(gold.shape, max_memory // BYTES_PER_ELEMENT):
+        g = read(gold, block)
+        c = read(compare, block)
+
+        if arrays_identical(g, c):
+            continue
+
+        verdict.identical = False
+        bad, max_abs = violations(g, c, tol)
+        verdict.max_abs = max(verdict.max_abs, float(max_abs))
+
+        n_bad = int(np.count_nonzero(bad))
+
+        if n_bad > 0:
+            if verdict.passed:
+                offsets = [s.start or 0 for s in block]
+                first = np.unravel_index(np.argmax(bad), np.shape(bad))
+                verdict.first_violation = tuple(
+                    int(o + i) for o, i in zip(offsets, first))
+
+            verdict.passed = False
+            verdict.violations += n_bad
+            verdict.reason = '{} values outside {}'.format(verdict.violations,
+                                                           tol)
+            if stop_early:
+                break
+
+    return verdict
+
+
+def summarize_verdicts(verdicts):
+    '''
+    Args:
+        verdicts: Dictionary of keys to Verdict
+
+    Returns:
+        tuple: Boolean of whether everything passed and an ordered
+               dictionary of the keys that failed
+    '''
+    failed = OrderedDict((k, v) for k, v in verdicts.items() if not v.passed)
+    return len(failed) == 0, failed
@@ -1,22 +1,204 @@
+from collections import OrderedDict
+from os.path import basename, getmtime, getsize, isdir, join, relpath
+from functools import lru_cache
+import hashlib
 import logging
-import logging.config
+import os
 import coloredlogs
+import numpy as np
+
+from .readers import get_reader
+
+# Names of the loggers colored logs have been installed in
+_installed = set()
+
 
 def get_logger(name, level='DEBUG'):
     """
-    Retrieve the logger with colored logs in it.
+    Retrieve the logger with colored logs in it. The handler is installed the
+    first time a logger is asked for, later calls only set the level so
+    constructing many comparisons does not reconfigure logging each time.
     """
-    # logging.config.dictConfig({
-    #     'version': 1,
-    #     'disable_existing_loggers': True,
-    # })
-    logging.config.dictConfig({
-        'version': 1,
-        'disable_existing_loggers': True,
-    })
-    log = logging.getLogger(__name__)
+    log = logging.getLogger(name)
+    level = level.upper()
+
+    if name not in _installed:
+        fmt = '%(name)s %(levelname)s %(message)s'
+        coloredlogs.install(fmt=fmt, level=level, logger=log)
+        _installed.add(name)
+
+    else:
+        log.setLevel(level)
 
-    fmt = '%(name)s %(levelname)s %(message)s'
-    coloredlogs.install(fmt=fmt, level=level.upper(), logger=log)
+        for handler in log.handlers:
+            handler.setLevel(level)
 
     return log
+
+
+def open_dataset(f, file_type='netcdf'):
+    """
+    Open a file from a path or from a goldmeister.gitobjects.BlobFile with
+    the reader registered for file_type, see goldmeister.readers
+    """
+    return get_reader(file_type).open(f)
+
+
+def file_name(f):
+    """
+    Retrieve the base filename of a path or an object with a name attribute
+    """
+    if isinstance(f, str):
+        return basename(f)
+
+    return f.name
+
+
+def file_digest(path, block_size=2**20):
+    """
+    Compute the sha256 hex digest of a file reading it in blocks
+    """
+    h = hashlib.sha256()
+
+    with open(path, 'rb') as fp:
+        for block in iter(lambda: fp.read(block_size), b''):
+            h.update(block)
+
+    return h.hexdigest()
+
+
+def tree_files(path):
+    """
+    List the files under a directory, e.g. a Zarr store, in a stable order
+    """
+    files = []
+
+    for root, dirs, names in os.walk(path):
+        dirs.sort()
+        files += [join(root, n) for n in sorted(names)]
+
+    return files
+
+
+def tree_digest(path, block_size=2**20):
+    """
+    Compute the sha256 hex digest of the names and content of every file
+    under a directory
+    """
+    h = hashlib.sha256()
+
+    for f in tree_files(path):
+        h.update(relpath(f, path).replace(os.sep, '/').encode())
+        h.update(file_digest(f, block_size=block_size).encode())
+
+    return h.hexdigest()
+
+
+def tree_stamp(path):
+    """
+    Latest modification time, total size and number of the files under a
+    directory, which change whenever its content does
+    """
+    files = tree_files(path)
+    stats = [os.stat(f) for f in files]
+
+    return (max([s.st_mtime_ns for s in stats] + [0]),
+            sum(s.st_size for s in stats), len(files))
+
+
+@lru_cache(maxsize=1024)
+def _cached_digest(path, mtime, size):
+    return file_digest(path)
+
+
+@lru_cache(maxsize=256)
+def _cached_tree_digest(path, stamp):
+    return tree_digest(path)
+
+
+def content_id(f):
+    """
+    Retrieve an id for the content of a file, the blob id for git blobs and
+    the sha256 digest for paths. Digests are remembered until the file is
+    modified.
+    """
+    if hasattr(f, 'oid'):
+        return f.oid
+
+    if isdir(f):
+        return _cached_tree_digest(f, tree_stamp(f))
+
+    return _cached_digest(f, getmtime(f), getsize(f))
+
+
+def files_identical(a, b):
+    """
+    Check whether two files have identical content. Git blobs are compared by
+    id, paths by size and then digest. Anything else is assumed to differ.
+    """
+    if hasattr(a, 'oid') and hasattr(b, 'oid'):
+        return a.oid == b.oid
+
+    if isinstance(a, str) and isinstance(b, str):
+        if isdir(a) or isdir(b):
+            return isdir(a) and isdir(b) and content_id(a) == content_id(b)
+
+        if getsize(a) != getsize(b):
+            return False
+
+        return content_id(a) == content_id(b)
+
+    return False
+
+
+def arrays_identical(a, b, block_size=2**20):
+    """
+    Check whether two arrays are identical byte for byte, including their
+    masks. NaNs in the same place compare as identical. Arrays of the same
+    type in different byte orders, e.g. memory mapped netCDF3 data, are
+    compared in the byte order of a.
+    """
+    if a.shape != b.shape or \
+       a.dtype.newbyteorder('=') != b.dtype.newbyteorder('='):
+        return False
+
+    mask_a = np.ma.getmask(a)
+    mask_b = np.ma.getmask(b)
+
+    if mask_a is not np.ma.nomask or mask_b is not np.ma.nomask:
+        if not np.array_equal(np.ma.getmaskarray(a), np.ma.getmaskarray(b)):
+            return False
+
+    data_a = np.ascontiguousarray(np.ma.getdata(a)).reshape(-1)
+    data_b = np.ascontiguousarray(np.ma.getdata(b)).reshape(-1)
+    step = max(1, block_size // max(1, a.dtype.itemsize))
+
+    # Compare in blocks to exit early on the first difference
+    for i in range(0, data_a.size, step):
+        block_b = data_b[i:i + step]
+
+        if block_b.dtype != data_a.dtype:
+            block_b = block_b.astype(data_a.dtype)
+
+        if not np.array_equal(data_a[i:i + step].view(np.uint8),
+                              block_b.view(np.uint8)):
+            return False
+
+    return True
+
+
+def plain(value):
+    '''
+    Convert numpy scalars and arrays, including those in dictionaries, to
+    values json can write
+    '''
+    if isinstance(value, dict):
+        return OrderedDict((k, plain(v)) for k, v in value.items())
+
+    if isinstance(value, np.ndarray):
+        return np.ma.filled(np.ma.asarray(value, dtype=float), np.nan).tolist()
+
+    if hasattr(value, 'item'):
+        return value.item()
+
+    return value
@@ -33,8 +33,18 @@ setup(
         'Programming Language :: Python :: 3.7',
         'Programming Language :: Python :: 3.8',
     ],
+    entry_points={
+        'console_scripts': [
+            'goldmeister=goldmeister.cli:main',
+        ],
+    },
     description="Python package for comparing dataset changes in a repos that have output files they check",
     install_requires=requirements,
+    extras_require={
+        'tables': ['pandas', 'pyarrow'],
+        'geotiff': ['rasterio'],
+        'zarr': ['zarr'],
+    },
     license="CC0 1.0",
     long_description=readme + '\n\n' + history,
     include_package_data=True,
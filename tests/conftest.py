@@ -0,0 +1,127 @@
+'''
+Shared fixtures writing small pairs of gold and compare files.
+'''
+
+import os
+import shutil
+
+from netCDF4 import Dataset
+import numpy as np
+import pytest
+
+# Figures are rendered without a display
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+
+def write_file(path, perturb=False, file_format='NETCDF4', seed=0):
+    '''
+    Write a file with a masked 3D variable, an integer variable and a
+    variable that never changes. The perturbed copy only differs in temp and
+    cnt.
+    '''
+    rng = np.random.RandomState(seed)
+
+    ds = Dataset(path, 'w', format=file_format)
+    ds.createDimension('time', 4)
+    ds.createDimension('y', 10)
+    ds.createDimension('x', 12)
+
+    ds.createVariable('time', 'f8', ('time',))[:] = np.arange(4)
+    ds.createVariable('y', 'f8', ('y',))[:] = np.arange(10) * 10.0
+    ds.createVariable('x', 'f8', ('x',))[:] = np.arange(12) * 10.0
+
+    temp = rng.normal(size=(4, 10, 12)).astype('f4')
+    mask = rng.random_sample(temp.shape) < 0.1
+    cnt = rng.randint(-100, 100, size=(10, 12)).astype('i2')
+    same = rng.normal(size=(10, 12))
+
+    if perturb:
+        temp[2, 3:6, 4:7] += 1.0
+        temp[3, 0, 0] -= 2.0
+        cnt[5, 5] += 3
+
+    v = ds.createVariable('temp', 'f4', ('time', 'y', 'x'),
+                          fill_value=-9999.0)
+    v[:] = np.ma.masked_array(temp, mask=mask)
+    ds.createVariable('cnt', 'i2', ('y', 'x'))[:] = cnt
+    ds.createVariable('same', 'f8', ('y', 'x'))[:] = same
+    ds.close()
+
+    return path
+
+
+def write_pair(root, file_format='NETCDF4', perturb=True):
+    '''
+    Returns:
+        tuple: Paths to the gold and compare files, both named x.nc
+    '''
+    paths = []
+
+    for side, changed in [('gold', False), ('compare', perturb)]:
+        d = os.path.join(str(root), side)
+        os.makedirs(d, exist_ok=True)
+        paths.append(write_file(os.path.join(d, 'x.nc'), perturb=changed,
+                                file_format=file_format))
+
+    return tuple(paths)
+
+
+def commit_file(repo, src, name, message, branch='main'):
+    '''
+    Commit a copy of src as name on a branch, made from HEAD when missing
+    '''
+    import pygit2
+
+    sig = pygit2.Signature('gold', 'gold@localhost', 0, 0)
+    shutil.copyfile(src, os.path.join(repo.workdir, name))
+    repo.index.add(name)
+    repo.index.write()
+    tree = repo.index.write_tree()
+
+    ref = 'refs/heads/{}'.format(branch)
+    parents = []
+    if ref in repo.references:
+        parents = [repo.references[ref].target]
+    elif not repo.head_is_unborn:
+        parents = [repo.head.target]
+
+    return repo.create_commit(ref, sig, sig, message, tree, parents)
+
+
+@pytest.fixture
+def pair(tmp_path):
+    return write_pair(tmp_path)
+
+
+@pytest.fixture
+def same_pair(tmp_path):
+    return write_pair(tmp_path, perturb=False)
+
+
+@pytest.fixture
+def nc3_pair(tmp_path):
+    return write_pair(tmp_path, file_format='NETCDF3_CLASSIC')
+
+
+@pytest.fixture
+def git_repo(tmp_path, pair):
+    '''
+    Repository with the gold x.nc on main and the compare on a feature
+    branch made from it. main is checked out.
+
+    Returns:
+        repo: pygit2.Repository
+    '''
+    pygit2 = pytest.importorskip('pygit2')
+    gold, compare = pair
+
+    repo = pygit2.init_repository(str(tmp_path / 'repo'),
+                                  initial_head='main')
+    commit_file(repo, gold, 'x.nc', 'gold')
+    repo.branches.local.create('feature', repo.head.peel(pygit2.Commit))
+    commit_file(repo, compare, 'x.nc', 'compare', branch='feature')
+
+    # Back to the gold in the working tree
+    repo.checkout('refs/heads/main', strategy=pygit2.GIT_CHECKOUT_FORCE)
+
+    return repo
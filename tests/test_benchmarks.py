@@ -0,0 +1,66 @@
+'''
+Tests for the benchmark suite in benchmarks/
+'''
+
+from os.path import abspath, dirname, join
+import json
+import multiprocessing
+import subprocess
+import sys
+
+from netCDF4 import Dataset
+import numpy as np
+
+BENCHMARKS = join(dirname(dirname(abspath(__file__))), 'benchmarks')
+sys.path.insert(0, BENCHMARKS)
+
+from datasets import Case, make_pair  # noqa: E402
+from run import wait_for_records  # noqa: E402
+
+
+def test_make_pair(tmp_path):
+    case = Case('tiny', nt=3, ny=4, nx=5, nvars=4, changed=0.5)
+    gold, compare = make_pair(case, str(tmp_path))
+
+    with Dataset(gold) as g, Dataset(compare) as c:
+        changed = [v for v in g.variables if v.startswith('var') and
+                   not np.array_equal(g.variables[v][:], c.variables[v][:])]
+
+        assert g.variables['var000'].shape == (3, 4, 5)
+
+    assert len(changed) == 2
+
+
+def test_run(tmp_path):
+    output = str(tmp_path / 'bench.json')
+    subprocess.check_call([sys.executable, join(BENCHMARKS, 'run.py'),
+                           '--case', 'small_f4', '-o', output],
+                          stdout=subprocess.DEVNULL)
+
+    with open(output) as fp:
+        report = json.load(fp)
+
+    assert [c['name'] for c in report['cases']] == ['small_f4']
+
+    stages = [r['stage'] for r in report['results']]
+    for stage in ['generate', 'construct', 'compare', 'stream_compare',
+                  'git_compare']:
+        assert stage in stages
+
+    assert not any(r['failed'] for r in report['results'])
+
+
+def exit_early(code):
+    sys.exit(code)
+
+
+def test_killed_process_is_recorded():
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    p = ctx.Process(target=exit_early, args=(3,))
+    p.start()
+
+    records = wait_for_records(Case('killed'), p, queue, poll=0.1)
+
+    assert records[0]['failed']
+    assert records[0]['exitcode'] == 3
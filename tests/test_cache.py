@@ -0,0 +1,79 @@
+'''
+Tests for goldmeister.cache and reusing cached comparisons
+'''
+
+import numpy as np
+
+from goldmeister.cache import StatsCache
+from goldmeister.compare import GoldFilesCompare
+
+
+def test_put_get(tmp_path):
+    cache = StatsCache(str(tmp_path / 'cache.sqlite'))
+    preview = np.arange(6.0).reshape(2, 3)
+
+    cache.put('g', 'c', 'temp', 'full', {'max': np.float32(1.5), 'count': 3},
+              preview=preview, extras={'identical': False})
+    stats, cached_preview, extras = cache.get('g', 'c', 'temp', 'full')
+
+    assert dict(stats) == {'max': 1.5, 'count': 3}
+    np.testing.assert_array_equal(cached_preview, preview)
+    assert extras == {'identical': False}
+
+    # Other modes and contents are misses
+    assert cache.get('g', 'c', 'temp', 'full+timesteps') == (None, None,
+                                                              None)
+    assert cache.get('g', 'other', 'temp', 'full') == (None, None, None)
+
+    cache.invalidate('c')
+    assert cache.get('g', 'c', 'temp', 'full') == (None, None, None)
+    cache.close()
+
+
+def test_evict_least_recently_used(tmp_path):
+    cache = StatsCache(str(tmp_path / 'cache.sqlite'), max_size=2000)
+
+    for i in range(100):
+        cache.put_digest('f{}'.format(i), 'v', 'x' * 64)
+
+    # Digests count towards the size and are evicted oldest first
+    assert cache.size() > cache.max_size
+    assert cache.evict() > 0
+    assert cache.size() <= cache.max_size
+    assert cache.get_digest('f0', 'v') is None
+    assert cache.get_digest('f99', 'v') == 'x' * 64
+
+    cache.put('g', 'c', 'temp', 'full', {'max': 1.0})
+    cache.evict()
+    assert cache.get('g', 'c', 'temp', 'full')[0] is not None
+    cache.close()
+
+
+def test_compare_hits_cache(tmp_path, pair):
+    gold, compare = pair
+    kwargs = dict(gold_files=[gold], compare_files=[compare],
+                  file_type='netcdf', output_dir=str(tmp_path / 'out'),
+                  cache_path=str(tmp_path / 'cache.sqlite'),
+                  timestep_stats=True, log_level='ERROR')
+
+    first = GoldFilesCompare(**kwargs)
+    expected = first.compare()
+    assert not first.cached
+
+    second = GoldFilesCompare(**kwargs)
+    results = second.compare()
+
+    assert sorted(second.cached.keys()) == ['file-x.nc:cnt', 'file-x.nc:temp']
+    assert 'file-x.nc:same' in second.identical
+
+    for key in ['file-x.nc:cnt', 'file-x.nc:temp']:
+        assert results[key]['stats']['max'] == \
+            expected[key]['stats']['max']
+
+    np.testing.assert_allclose(results['file-x.nc:temp']['timesteps']['max'],
+                               expected['file-x.nc:temp']['timesteps']['max'])
+
+    # Statistics of other options are cached separately
+    kwargs['timestep_stats'] = False
+    third = GoldFilesCompare(**kwargs)
+    assert not third.cached
@@ -0,0 +1,64 @@
+'''
+Tests for checkpointing and resuming a stopped comparison
+'''
+
+import json
+import os
+
+import pytest
+
+import goldmeister.compare
+from goldmeister.compare import GoldFilesCompare
+
+
+@pytest.mark.parametrize('pipeline', [False, True])
+def test_checkpoint_resume(tmp_path, pair, monkeypatch, pipeline):
+    gold, compare = pair
+    kwargs = dict(gold_files=[gold], compare_files=[compare],
+                  file_type='netcdf', output_dir=str(tmp_path / 'out'),
+                  checkpoint=True, log_level='ERROR')
+
+    def run(gc):
+        return gc.pipeline_compare() if pipeline else gc.compare()
+
+    expected = run(GoldFilesCompare(**dict(kwargs, checkpoint=False,
+                                           output_dir=str(tmp_path / 'x'))))
+
+    original = goldmeister.compare.difference
+    calls = []
+    stop = [2]
+
+    def crash(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == stop[0]:
+            raise RuntimeError('stopped')
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(goldmeister.compare, 'difference', crash)
+
+    with pytest.raises(RuntimeError):
+        run(GoldFilesCompare(**kwargs))
+
+    # The journal keeps what was compared before stopping
+    journal = os.path.join(str(tmp_path / 'out'), 'journal.jsonl')
+    with open(journal) as fp:
+        assert len([json.loads(line) for line in fp if line.strip()]) > 0
+
+    del calls[:]
+    stop[0] = None
+    gc = GoldFilesCompare(**kwargs)
+    results = run(gc)
+
+    # The variable compared before stopping is not read again
+    assert len(calls) == len(expected) - 1
+    assert sorted(results.keys()) == sorted(expected.keys())
+
+    for key in results.keys():
+        assert results[key]['stats']['max'] == \
+            pytest.approx(expected[key]['stats']['max'])
+
+    # Everything is in the manifest once closed
+    gc.close()
+    assert not os.path.exists(journal)
+    assert os.path.isfile(os.path.join(str(tmp_path / 'out'),
+                                       'manifest.json'))
@@ -0,0 +1,80 @@
+'''
+Tests for the goldmeister command line exit statuses
+'''
+
+import os
+
+import pytest
+
+from goldmeister.cli import main, parse_tolerance
+from goldmeister.compare import GoldCompare
+from goldmeister.lazy import DatasetPool
+
+
+def run(gold, compare, tmp_path, *args):
+    return main(['files', '--gold', gold, '--compare', compare,
+                 '-o', str(tmp_path / 'out'), '--log-level', 'ERROR'] +
+                list(args))
+
+
+def test_no_differences(tmp_path, same_pair):
+    assert run(*same_pair, tmp_path) == 0
+    assert run(*same_pair, tmp_path, '--streaming') == 0
+    assert run(*same_pair, tmp_path, '--quick') == 0
+
+
+def test_differences(tmp_path, pair):
+    assert run(*pair, tmp_path) == 1
+    assert run(*pair, tmp_path, '--streaming') == 1
+    assert run(*pair, tmp_path, '--pipeline') == 1
+    assert run(*pair, tmp_path, '--quick') == 1
+
+
+def test_quick_reads_nothing(tmp_path, pair, git_repo, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError('--quick read the data')
+
+    monkeypatch.setattr(GoldCompare, '__init__', fail)
+    monkeypatch.setattr(DatasetPool, 'read', fail)
+
+    # The output of an earlier run is left in place
+    out = tmp_path / 'out'
+    out.mkdir()
+    (out / 'keep.png').write_bytes(b'png')
+
+    assert run(*pair, tmp_path, '--quick') == 1
+    assert (out / 'keep.png').read_bytes() == b'png'
+
+    gold = os.path.join(git_repo.workdir, 'x.nc')
+    for new, status in [('main', 0), ('feature', 1)]:
+        assert main(['git', git_repo.workdir, '--gold', gold, '--old', 'main',
+                     '--new', new, '--quick', '-o', str(out),
+                     '--log-level', 'ERROR']) == status
+
+    assert os.listdir(str(out)) == ['keep.png']
+
+
+def test_verify(tmp_path, pair):
+    assert run(*pair, tmp_path, '--verify') == 1
+    assert run(*pair, tmp_path, '--verify', '--atol', '0.5') == 1
+    assert run(*pair, tmp_path, '--verify', '--atol', '5') == 0
+    assert run(*pair, tmp_path, '--verify', '--tolerance',
+               'temp:atol=5', '--tolerance', 'cnt:atol=3') == 0
+
+
+@pytest.mark.parametrize('args', [['--max-memory', 'lots'],
+                                  ['--pipeline', '--streaming'],
+                                  ['--pipeline', '--verify'],
+                                  ['--file-type', 'nope'],
+                                  ['--quick', '--profile', 'p.json'],
+                                  ['--tolerance', 'temp:tol=1']])
+def test_bad_arguments(tmp_path, pair, args):
+    with pytest.raises(SystemExit) as e:
+        run(*pair, tmp_path, *args)
+
+    assert e.value.code == 2
+
+
+def test_parse_tolerance():
+    assert parse_tolerance('precip*:atol=1e-6,ulp=4') == \
+        ('precip*', {'atol': 1e-6, 'ulp': 4})
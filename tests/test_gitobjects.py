@@ -0,0 +1,159 @@
+'''
+Tests for goldmeister.gitobjects and comparing revisions of a repository
+'''
+
+import os
+
+from netCDF4 import Dataset
+import numpy as np
+import pytest
+
+from goldmeister.compare import GoldFilesCompare, GoldGitBranchCompare
+from goldmeister.gitobjects import BlobFile, resolve_commit
+
+
+def test_blob_file(tmp_path, git_repo, pair):
+    commit = resolve_commit(git_repo, 'feature')
+    blob = BlobFile(git_repo, commit, 'x.nc')
+
+    assert blob.name == 'x.nc'
+    with open(pair[1], 'rb') as fp:
+        assert blob.read_bytes() == fp.read()
+
+    with blob.open() as ds, Dataset(pair[1]) as expected:
+        np.testing.assert_array_equal(ds.variables['cnt'][:],
+                                      expected.variables['cnt'][:])
+
+    # Cached blobs are written once and named after their id
+    blob.cache_dir = str(tmp_path / 'blobs')
+    path = blob.cache_path()
+    assert os.path.basename(path) == blob.oid + '.nc'
+
+    with blob.open() as ds:
+        assert ds.filepath() == path
+
+
+def test_missing_revision_and_file(git_repo):
+    with pytest.raises(ValueError):
+        resolve_commit(git_repo, 'nope')
+
+    with pytest.raises(ValueError):
+        BlobFile(git_repo, resolve_commit(git_repo, 'main'), 'nope.nc')
+
+
+@pytest.mark.parametrize('checkout', [False, True])
+def test_branch_compare_matches_files(tmp_path, git_repo, pair, checkout):
+    gold, compare = pair
+    kwargs = dict(file_type='netcdf', log_level='ERROR')
+
+    expected = GoldFilesCompare(gold_files=[gold], compare_files=[compare],
+                                output_dir=str(tmp_path / 'files'),
+                                **kwargs).compare()
+
+    gc = GoldGitBranchCompare(repo_path=git_repo.workdir,
+                              gold_files=[os.path.join(git_repo.workdir,
+                                                       'x.nc')],
+                              old_branch='main', new_branch='feature',
+                              checkout=checkout,
+                              output_dir=str(tmp_path / 'git'), **kwargs)
+    results = gc.compare()
+    gc.close()
+
+    assert sorted(results.keys()) == sorted(expected.keys())
+
+    for key in results.keys():
+        for k in ['max', 'min', 'mean', 'std']:
+            np.testing.assert_allclose(results[key]['stats'][k],
+                                       expected[key]['stats'][k])
+
+
+def test_checkout_compares_back_to_back(tmp_path, git_repo, pair):
+    gold, compare = pair
+    kwargs = dict(file_type='netcdf', log_level='ERROR')
+    path = os.path.join(git_repo.workdir, 'x.nc')
+
+    # Each comparison checks out both branches, none reads stale files
+    for n, (old, new, files) in enumerate([('main', 'feature', pair),
+                                           ('feature', 'main', pair[::-1]),
+                                           ('main', 'feature', pair)]):
+        expected = GoldFilesCompare(gold_files=[files[0]],
+                                    compare_files=[files[1]],
+                                    output_dir=str(tmp_path / 'files'),
+                                    **kwargs).compare()
+
+        gc = GoldGitBranchCompare(repo_path=git_repo.workdir,
+                                  gold_files=[path], old_branch=old,
+                                  new_branch=new, checkout=True,
+                                  output_dir=str(tmp_path / str(n)), **kwargs)
+        results = gc.compare()
+
+        for key in ['file-x.nc:temp', 'file-x.nc:cnt']:
+            for k in ['max', 'min', 'mean', 'count']:
+                np.testing.assert_allclose(results[key]['stats'][k],
+                                           expected[key]['stats'][k],
+                                           err_msg='{} {} {}'.format(n, key,
+                                                                     k))
+
+
+def commit_store(repo, temp, message, branch):
+    '''
+    Write a zarr store holding temp into the working tree and commit it
+    '''
+    zarr = pytest.importorskip('zarr')
+    import pygit2
+
+    root = zarr.open_group(os.path.join(repo.workdir, 'x.zarr'), mode='w')
+    root.create_array('temp', shape=temp.shape, chunks=(1, 5, 6),
+                      dtype=temp.dtype)[:] = temp
+
+    sig = pygit2.Signature('gold', 'gold@localhost', 0, 0)
+    repo.index.add_all(['x.zarr'])
+    repo.index.write()
+    tree = repo.index.write_tree()
+
+    ref = 'refs/heads/{}'.format(branch)
+    parents = []
+    if ref in repo.references:
+        parents = [repo.references[ref].target]
+    elif not repo.head_is_unborn:
+        parents = [repo.head.target]
+
+    return repo.create_commit(ref, sig, sig, message, tree, parents)
+
+
+@pytest.mark.parametrize('blob_cache', [False, True])
+def test_zarr_from_git(tmp_path, blob_cache):
+    pygit2 = pytest.importorskip('pygit2')
+
+    repo = pygit2.init_repository(str(tmp_path / 'repo'),
+                                  initial_head='main')
+    temp = np.ones((4, 10, 12))
+    commit_store(repo, temp, 'gold', 'main')
+
+    changed = temp.copy()
+    changed[3, 9, 11] = 2.5
+    repo.branches.local.create('feature', repo.head.peel(pygit2.Commit))
+    commit_store(repo, changed, 'compare', 'feature')
+
+    cache = str(tmp_path / 'blobs') if blob_cache else None
+    blob = BlobFile(repo, resolve_commit(repo, 'feature'), 'x.zarr',
+                    cache_dir=cache)
+    assert blob.is_tree
+
+    # Stores are written out once, named after their tree id
+    path = blob.cache_path()
+    assert os.path.basename(path) == blob.oid + '.zarr'
+    assert blob.cache_path() == path
+
+    gc = GoldGitBranchCompare(repo_path=repo.workdir,
+                              gold_files=[os.path.join(repo.workdir,
+                                                       'x.zarr')],
+                              old_branch='main', new_branch='feature',
+                              checkout=False, blob_cache=cache,
+                              file_type='zarr', log_level='ERROR',
+                              output_dir=str(tmp_path / 'out'))
+    stats = gc.compare()['file-x.zarr:temp']['stats']
+    gc.close()
+
+    assert stats['max'] == 1.5
+    assert stats['nonzero'] == 1
@@ -0,0 +1,93 @@
+'''
+Tests for goldmeister.history and following gold files over a commit range
+'''
+
+import csv
+import os
+
+import pygit2
+import pytest
+
+from goldmeister.compare import GoldHistoryCompare
+from goldmeister.history import changed_commits, commit_range
+
+from .conftest import commit_file, write_file
+
+
+@pytest.fixture
+def history(tmp_path, pair):
+    '''
+    main with the gold, a commit not touching it, the compare and then a
+    file with different data everywhere
+
+    Returns:
+        tuple: The repository and its commits, oldest first
+    '''
+    gold, compare = pair
+    other = write_file(str(tmp_path / 'other.nc'), seed=1)
+    readme = str(tmp_path / 'README')
+    with open(readme, 'w') as fp:
+        fp.write('gold files\n')
+
+    repo = pygit2.init_repository(str(tmp_path / 'repo'),
+                                  initial_head='main')
+    commits = [commit_file(repo, gold, 'x.nc', 'gold'),
+               commit_file(repo, readme, 'README', 'readme'),
+               commit_file(repo, compare, 'x.nc', 'perturb'),
+               commit_file(repo, other, 'x.nc', 'rewrite')]
+
+    return repo, [str(c) for c in commits]
+
+
+def test_changed_commits(history):
+    repo, commits = history
+    start = repo[commits[0]]
+    end = repo[commits[-1]]
+
+    assert [str(c.id) for c in commit_range(repo, start, end)] == commits[1:]
+
+    changes = changed_commits(repo, start, end, ['x.nc'])
+    assert [(str(c.id), paths) for c, paths in changes] == \
+        [(commits[2], ['x.nc']), (commits[3], ['x.nc'])]
+
+
+def history_compare(tmp_path, repo, commits):
+    return GoldHistoryCompare(repo_path=repo.workdir,
+                              gold_files=[os.path.join(repo.workdir,
+                                                       'x.nc')],
+                              old_branch=commits[0], new_branch='main',
+                              file_type='netcdf',
+                              output_dir=str(tmp_path / 'out'),
+                              log_level='ERROR')
+
+
+def test_scan(tmp_path, history):
+    repo, commits = history
+    gc = history_compare(tmp_path, repo, commits)
+    drift = gc.scan()
+
+    assert gc.revisions == commits[2:]
+
+    temp = drift['file-x.nc:temp']
+    assert [p['commit'] for p in temp] == commits[2:]
+    assert [p['subject'] for p in temp] == ['perturb', 'rewrite']
+    assert temp[0]['stats']['max'] == pytest.approx(1.0)
+    assert temp[1]['changed']
+
+    # same only changes in the rewrite
+    assert [p['changed'] for p in drift['file-x.nc:same']] == [False, True]
+
+    with open(str(tmp_path / 'out' / 'drift.csv')) as fp:
+        rows = list(csv.DictReader(fp))
+    assert len(rows) == 2 * len(drift)
+
+
+def test_bisect(tmp_path, history):
+    repo, commits = history
+    gc = history_compare(tmp_path, repo, commits)
+
+    assert gc.bisect('file-x.nc:temp') == commits[2]
+    assert gc.bisect('file-x.nc:same') == commits[3]
+
+    with pytest.raises(KeyError):
+        gc.bisect('file-x.nc:nope')
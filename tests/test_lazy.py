@@ -0,0 +1,146 @@
+'''
+Tests for goldmeister.lazy, reading data only when it is needed
+'''
+
+import pickle
+import threading
+
+from netCDF4 import Dataset
+import numpy as np
+
+from goldmeister.compare import GoldFilesCompare
+from goldmeister.lazy import (DatasetPool, Entry, LazyVariable, ZeroDifference,
+                              materialize)
+
+from .conftest import write_file
+
+
+def test_pool_keeps_most_recent(tmp_path):
+    paths = [write_file(str(tmp_path / '{}.nc'.format(i))) for i in range(3)]
+    pool = DatasetPool(max_open=2)
+
+    first = pool.get(paths[0])
+    assert pool.get(paths[0]) is first
+
+    pool.get(paths[1])
+    pool.get(paths[0])
+    pool.get(paths[2])
+
+    # The least recently used file is closed
+    assert len(pool) == 2
+    assert first.isopen()
+    assert paths[1] not in pool._datasets
+
+    pool.close()
+    assert len(pool) == 0
+    assert not first.isopen()
+
+
+def test_pool_read_from_threads(tmp_path):
+    paths = [write_file(str(tmp_path / '{}.nc'.format(i)), seed=i)
+             for i in range(3)]
+    expected = []
+    for path in paths:
+        with Dataset(path) as ds:
+            expected.append(ds.variables['temp'][:].filled(0))
+
+    # One open file at a time so every read closes another thread's file
+    pool = DatasetPool(max_open=1)
+    errors = []
+
+    def read(n):
+        try:
+            for i in range(20):
+                j = (n + i) % len(paths)
+                data = pool.read(paths[j], 'temp', (i % 4,))
+                np.testing.assert_array_equal(data.filled(0),
+                                              expected[j][i % 4])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=read, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert len(pool) == 1
+    pool.close()
+
+
+def test_lazy_variable(pair):
+    gold = pair[0]
+    pool = DatasetPool()
+
+    with Dataset(gold) as ds:
+        v = ds.variables['temp']
+        handle = LazyVariable.from_variable(gold, v, pool=pool)
+        expected = v[:]
+
+    assert len(pool) == 0
+    assert handle.shape == (4, 10, 12)
+    assert handle.nbytes == 4 * 10 * 12 * 4
+
+    np.testing.assert_array_equal(handle.read().filled(0), expected.filled(0))
+    np.testing.assert_array_equal(handle.read((1, slice(2, 4))),
+                                  expected[1, 2:4])
+    assert len(pool) == 1
+
+    # Handles sent to other processes read through their own pool
+    copy = pickle.loads(pickle.dumps(handle))
+    assert copy.pool is None
+    np.testing.assert_array_equal(materialize(copy).filled(0),
+                                  expected.filled(0))
+    pool.close()
+
+
+def test_entry():
+    gold = np.arange(3)
+    entry = Entry(gold=gold, stats={'max': 1})
+
+    assert entry['gold'] is gold
+    assert entry.get('compare') is None
+    assert entry.get('stats') == {'max': 1}
+    assert 'difference' in entry
+
+    entry['difference'] = gold
+    assert entry.difference is gold
+
+
+def test_data_is_read_on_request(tmp_path, pair):
+    gold, compare = pair
+    gc = GoldFilesCompare(gold_files=[gold], compare_files=[compare],
+                          file_type='netcdf', output_dir=str(tmp_path / 'out'),
+                          log_level='ERROR')
+
+    data = gc.data['file-x.nc:temp']
+    assert isinstance(data.gold, LazyVariable)
+    assert isinstance(data.compare, LazyVariable)
+
+    with Dataset(compare) as ds:
+        np.testing.assert_array_equal(data['compare'].filled(0),
+                                      ds.variables['temp'][:].filled(0))
+
+    assert [d[0] for d in gc.describe()] == list(gc.data.keys())
+    gc.close()
+    assert len(gc.pool) == 0
+
+
+def test_zero_difference(tmp_path, pair):
+    gold, compare = pair
+    gc = GoldFilesCompare(gold_files=[gold], compare_files=[compare],
+                          file_type='netcdf', output_dir=str(tmp_path / 'out'),
+                          log_level='ERROR')
+    results = gc.compare()
+
+    entry = results['file-x.nc:temp']
+    expected = entry['compare'] - entry['gold']
+    np.testing.assert_allclose(entry['difference'].compressed(),
+                               expected.compressed())
+
+    # The variable that never changes is not read to difference it
+    zeros = results['file-x.nc:same'].difference
+    assert isinstance(zeros, ZeroDifference)
+    assert zeros.shape == (10, 12)
+    assert not np.any(materialize(zeros))
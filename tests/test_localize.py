@@ -0,0 +1,80 @@
+'''
+Tests for goldmeister.localize and locating differences during a compare
+'''
+
+import numpy as np
+import pytest
+
+from goldmeister.compare import GoldFilesCompare
+from goldmeister.localize import DifferenceIndex
+
+
+def make_difference(shape=(4, 10, 12)):
+    gold = np.zeros(shape)
+    compare = gold.copy()
+    compare[1, 2:5, 3:6] = 1
+    compare[1, 4, 4] = 5
+    compare[3, 7, 0] = -2
+    return gold, compare
+
+
+def test_index():
+    gold, compare = make_difference()
+    index = DifferenceIndex(gold.shape, top_k=2)
+    index.add(np.ma.masked_array(compare - gold), gold, compare)
+
+    assert list(index.steps) == [1, 3]
+    assert index.first_step == 1
+    assert index.last_step == 3
+    assert list(index.nonzero[[1, 3]]) == [9, 1]
+    assert index.extent == (2, 7, 0, 5)
+    assert index.top() == [(5.0, (1, 4, 4)), (2.0, (3, 7, 0))]
+
+
+@pytest.mark.parametrize('step', [1, 2, 3])
+def test_blocks_match_whole(step):
+    gold, compare = make_difference()
+    whole = DifferenceIndex(gold.shape, top_k=3)
+    whole.add(np.ma.masked_array(compare - gold), gold, compare)
+
+    blocked = DifferenceIndex(gold.shape, top_k=3)
+    for t in range(0, gold.shape[0], step):
+        for y in range(0, gold.shape[1], 4):
+            block = (slice(t, t + step), slice(y, y + 4), slice(0, 12))
+            dd = np.ma.masked_array(compare[block] - gold[block])
+            blocked.add(dd, gold[block], compare[block], block=block)
+
+    assert blocked.to_dict() == whole.to_dict()
+
+
+def test_mask_mismatch_and_round_trip():
+    gold = np.ma.masked_array(np.zeros((5, 6)))
+    compare = gold.copy()
+    compare[2, 3] = np.ma.masked
+
+    index = DifferenceIndex(gold.shape)
+    index.add(compare - gold, gold, compare)
+
+    # A 2D variable is a single timestep
+    assert list(index.steps) == [0]
+    assert index.extent == (2, 2, 3, 3)
+    assert index.top() == []
+
+    copy = DifferenceIndex.from_dict(index.to_dict())
+    assert copy.to_dict() == index.to_dict()
+
+
+def test_compare_locates(tmp_path, pair):
+    gold, compare = pair
+    results = GoldFilesCompare(gold_files=[gold], compare_files=[compare],
+                               file_type='netcdf',
+                               output_dir=str(tmp_path / 'out'),
+                               locate=True, top_k=3,
+                               log_level='ERROR').compare()
+
+    index = results['file-x.nc:temp']['index']
+    assert list(index.steps) == [2, 3]
+    assert index.extent == (0, 5, 0, 6)
+    assert index.top()[0] == (2.0, (3, 0, 0))
+
+    assert results['file-x.nc:cnt']['index'].extent == (5, 5, 5, 5)
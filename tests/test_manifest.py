@@ -0,0 +1,80 @@
+'''
+Tests for goldmeister.manifest and incremental comparisons
+'''
+
+import os
+
+import numpy as np
+
+import goldmeister.compare
+from goldmeister.compare import GoldFilesCompare
+from goldmeister.manifest import Manifest
+
+from .conftest import write_file
+
+
+def test_manifest_round_trip(tmp_path, pair):
+    gold, compare = pair
+    options = {'mode': 'full'}
+
+    manifest = Manifest(str(tmp_path), options)
+    ids = (manifest.file_id(gold), manifest.file_id(compare))
+    manifest.update('file-x.nc:temp', ids, {'max': np.float32(2.0)},
+                    identical=False)
+    manifest.save()
+
+    loaded = Manifest(str(tmp_path), options)
+    loaded.load()
+    record = loaded.get('file-x.nc:temp', ids)
+
+    assert record['stats']['max'] == 2.0
+    assert not record['identical']
+    assert loaded.get('file-x.nc:temp', (ids[1], ids[0])) is None
+
+    # Records made with other options are not used
+    other = Manifest(str(tmp_path), {'mode': 'streaming'})
+    other.load()
+    assert other.get('file-x.nc:temp', ids) is None
+
+
+def test_incremental(tmp_path, pair, monkeypatch):
+    gold, compare = pair
+    output = str(tmp_path / 'out')
+    kwargs = dict(gold_files=[gold], compare_files=[compare],
+                  file_type='netcdf', output_dir=output, incremental=True,
+                  log_level='ERROR')
+
+    gc = GoldFilesCompare(**kwargs)
+    expected = gc.compare()
+    figures = gc.render_results(expected, max_size=8)
+    gc.close()
+    mtimes = {f: os.path.getmtime(f) for f in figures}
+
+    original = goldmeister.compare.difference
+    calls = []
+
+    def count(*args, **kwargs):
+        calls.append(args)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(goldmeister.compare, 'difference', count)
+
+    # Nothing changed, nothing is read or rendered again
+    gc = GoldFilesCompare(**kwargs)
+    results = gc.compare()
+    assert gc.render_results(results, max_size=8) == figures
+    gc.close()
+
+    assert calls == []
+    assert {f: os.path.getmtime(f) for f in figures} == mtimes
+    for key, entry in expected.items():
+        assert results[key]['stats']['max'] == entry['stats']['max']
+
+    # A changed input is compared again
+    write_file(compare, perturb=True, seed=1)
+    gc = GoldFilesCompare(**kwargs)
+    results = gc.compare()
+    gc.close()
+
+    assert len(calls) == 3
+    assert results['file-x.nc:same']['stats']['max'] != 0
@@ -0,0 +1,84 @@
+'''
+Tests for goldmeister.mapped, reading netCDF3 variables as memory maps
+'''
+
+from netCDF4 import Dataset
+import numpy as np
+import pytest
+
+from goldmeister.compare import GoldFilesCompare
+from goldmeister.mapped import MappedVariable, read_mapped, variable_layout
+
+from .conftest import write_file
+
+
+@pytest.fixture
+def nc3(tmp_path):
+    return write_file(str(tmp_path / 'x.nc'), file_format='NETCDF3_CLASSIC')
+
+
+@pytest.mark.parametrize('name', ['temp', 'cnt', 'same'])
+def test_read_mapped_matches_netcdf4(nc3, name):
+    with Dataset(nc3) as ds:
+        v = ds.variables[name]
+        layout = variable_layout(nc3, v)
+        expected = v[:]
+
+        assert layout is not None
+        data = read_mapped(layout)
+
+        np.testing.assert_array_equal(np.ma.getmaskarray(data),
+                                      np.ma.getmaskarray(expected))
+        np.testing.assert_array_equal(data.filled(0), expected.filled(0))
+
+
+def test_mapped_variable_slices(nc3):
+    with Dataset(nc3) as ds:
+        v = ds.variables['temp']
+        mapped = MappedVariable('temp', variable_layout(nc3, v))
+
+        assert mapped.shape == v.shape
+        assert mapped.dtype.newbyteorder('=') == v.dtype
+
+        index = (slice(1, 3), slice(None), slice(2, 5))
+        np.testing.assert_array_equal(mapped[index].filled(0),
+                                      v[index].filled(0))
+
+
+def test_unmapped_variables(tmp_path):
+    nc4 = write_file(str(tmp_path / 'nc4.nc'))
+    path = str(tmp_path / 'record.nc')
+
+    with Dataset(path, 'w', format='NETCDF3_CLASSIC') as ds:
+        ds.createDimension('time', None)
+        ds.createVariable('rec', 'f4', ('time',))[:] = np.arange(3)
+        scaled = ds.createVariable('scaled', 'i2', ('time',))
+        scaled.scale_factor = 0.5
+
+    # Only classic files without records or scaling are mapped
+    with Dataset(nc4) as ds:
+        assert variable_layout(nc4, ds.variables['temp']) is None
+
+    with Dataset(path) as ds:
+        assert variable_layout(path, ds.variables['rec']) is None
+        assert variable_layout(path, ds.variables['scaled']) is None
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_compare_parity(tmp_path, nc3_pair, streaming):
+    gold, compare = nc3_pair
+    results = []
+
+    for memory_map in [False, True]:
+        gc = GoldFilesCompare(gold_files=[gold], compare_files=[compare],
+                              file_type='netcdf',
+                              output_dir=str(tmp_path / str(memory_map)),
+                              streaming=streaming, memory_map=memory_map,
+                              log_level='ERROR')
+        results.append(gc.compare())
+
+    expected, mapped = results
+    for key, entry in expected.items():
+        for name, value in entry['stats'].items():
+            np.testing.assert_allclose(mapped[key]['stats'][name], value,
+                                       rtol=1e-10, err_msg=key + ' ' + name)
@@ -0,0 +1,71 @@
+'''
+Tests for goldmeister.parallel, spreading comparisons over processes
+'''
+
+import os
+
+import numpy as np
+import pytest
+
+from goldmeister.compare import GoldFilesCompare
+from goldmeister.parallel import list_variables, pool_map
+
+from .conftest import write_pair
+
+
+def worker_pid(n):
+    return n * n, os.getpid()
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_pool_map_keeps_order(workers):
+    results = pool_map(worker_pid, [(n,) for n in range(8)], workers)
+
+    assert [r[0] for r in results] == [n * n for n in range(8)]
+
+    pids = set(r[1] for r in results)
+    if workers == 1:
+        assert pids == {os.getpid()}
+    else:
+        assert os.getpid() not in pids
+
+
+def test_list_variables(pair):
+    assert list_variables(pair[0], ['time', 'y', 'x']) == ['temp', 'cnt',
+                                                           'same']
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_workers_match_serial(tmp_path, streaming):
+    gold, compare = [], []
+    for i in range(3):
+        g, c = write_pair(tmp_path / str(i))
+        gold.append(g)
+        compare.append(c)
+
+    # Files need different names to have different keys
+    for files in [gold, compare]:
+        for i, f in enumerate(files):
+            renamed = f.replace('x.nc', 'x{}.nc'.format(i))
+            os.rename(f, renamed)
+            files[i] = renamed
+
+    kwargs = dict(gold_files=gold, compare_files=compare, file_type='netcdf',
+                  streaming=streaming, log_level='ERROR')
+    expected = GoldFilesCompare(output_dir=str(tmp_path / 'serial'),
+                                **kwargs).compare()
+    results = GoldFilesCompare(output_dir=str(tmp_path / 'workers'),
+                               workers=2, **kwargs).compare()
+
+    assert len(results) == 9
+    assert sorted(results.keys()) == sorted(expected.keys())
+
+    for key in results.keys():
+        for k, v in expected[key]['stats'].items():
+            np.testing.assert_allclose(results[key]['stats'][k], v,
+                                       err_msg=key + ' ' + k)
+
+        if not streaming:
+            np.testing.assert_array_equal(
+                np.ma.filled(results[key]['difference'], 0),
+                np.ma.filled(expected[key]['difference'], 0))
@@ -0,0 +1,129 @@
+'''
+Tests for goldmeister.pipeline and overlapped comparisons
+'''
+
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from goldmeister.compare import GoldFilesCompare
+from goldmeister.pipeline import BackgroundWorker, prefetch
+
+
+def test_prefetch_order_and_depth():
+    started = []
+
+    def read(i):
+        started.append(i)
+        return i * i
+
+    results = []
+    for value in prefetch(read, range(10), depth=2):
+        # The reader never gets more than depth ahead plus the one it holds
+        time.sleep(0.01)
+        assert len(started) <= len(results) + 4
+        results.append(value)
+
+    assert results == [i * i for i in range(10)]
+
+
+def test_prefetch_reads_in_background():
+    threads = set()
+
+    def read(i):
+        threads.add(threading.current_thread().name)
+        return i
+
+    assert list(prefetch(read, range(3))) == [0, 1, 2]
+    assert threads == {'goldmeister-prefetch'}
+
+
+def test_prefetch_raises():
+    def read(i):
+        if i == 2:
+            raise KeyError(i)
+        return i
+
+    results = []
+    with pytest.raises(KeyError):
+        for value in prefetch(read, range(5)):
+            results.append(value)
+
+    assert results == [0, 1]
+
+
+def test_prefetch_stops_early():
+    started = []
+
+    def read(i):
+        started.append(i)
+        return i
+
+    for value in prefetch(read, range(1000), depth=1):
+        if value == 3:
+            break
+
+    # Closing the generator stops the thread without reading everything
+    assert len(started) < 10
+    assert not any(t.name == 'goldmeister-prefetch'
+                   for t in threading.enumerate())
+
+
+def test_background_worker():
+    worker = BackgroundWorker(lambda a, b: a + b, maxsize=1)
+    for i in range(5):
+        worker.submit(i, 1)
+    assert worker.close() == [1, 2, 3, 4, 5]
+
+    def fail(i):
+        raise ValueError(i)
+
+    worker = BackgroundWorker(fail)
+    worker.submit(1)
+    with pytest.raises(ValueError):
+        worker.close()
+
+
+def test_pipeline_matches_compare(tmp_path, pair):
+    gold, compare = pair
+    kwargs = dict(gold_files=[gold], compare_files=[compare],
+                  file_type='netcdf', log_level='ERROR')
+
+    expected = GoldFilesCompare(output_dir=str(tmp_path / 'serial'),
+                                **kwargs).compare()
+
+    output = str(tmp_path / 'pipeline')
+    gc = GoldFilesCompare(output_dir=output, prefetch=1, **kwargs)
+    results = gc.pipeline_compare(render=True, max_size=8)
+
+    assert list(results.keys()) == list(expected.keys())
+    for key, entry in results.items():
+        for name, value in expected[key]['stats'].items():
+            np.testing.assert_allclose(entry['stats'][name], value)
+
+    # Only the differing variables are rendered
+    assert sorted(os.listdir(output)) == ['x.nc_cnt.png', 'x.nc_temp.png']
+    gc.close()
+
+
+def test_pipeline_records_each_variable_once(tmp_path, pair, monkeypatch):
+    gold, compare = pair
+    gc = GoldFilesCompare(gold_files=[gold], compare_files=[compare],
+                          file_type='netcdf', output_dir=str(tmp_path / 'out'),
+                          checkpoint=True, log_level='ERROR')
+
+    updates = []
+    original = gc.manifest.update
+
+    def update(key, *args, **kwargs):
+        updates.append(key)
+        return original(key, *args, **kwargs)
+
+    monkeypatch.setattr(gc.manifest, 'update', update)
+    results = gc.pipeline_compare()
+
+    assert sorted(updates) == sorted(results.keys())
+    gc.close()
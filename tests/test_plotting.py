@@ -0,0 +1,58 @@
+'''
+Tests for goldmeister.plotting, rendering figures without a display
+'''
+
+import os
+
+import numpy as np
+
+from goldmeister.compare import GoldFilesCompare
+from goldmeister.plotting import (downsample, prepare_panel, reduce_image,
+                                  render_figure)
+
+
+def test_reduce_image():
+    d = np.arange(3 * 40 * 50, dtype=float).reshape(3, 40, 50)
+    image = reduce_image(d, max_size=20)
+
+    assert image.shape == (20, 17)
+    np.testing.assert_array_equal(image, d.mean(axis=0)[::2, ::3])
+    assert downsample(np.arange(10), 2).shape == (10,)
+    assert reduce_image(d).shape == (40, 50)
+
+
+def test_prepare_panel_histogram():
+    d = np.ma.masked_array([1.0, 2.0, 3.0, 100.0], mask=[0, 0, 0, 1])
+    panel = prepare_panel(d.reshape(2, 2), 'histogram', bins=2)
+    counts, edges = panel['data']
+
+    assert counts.sum() == 3
+    assert edges[0] == 1.0 and edges[-1] == 3.0
+    assert 'Max: 3.000E+00' in panel['legend']
+
+
+def test_render_figure(tmp_path):
+    d = np.random.RandomState(0).normal(size=(20, 30))
+    panels = [prepare_panel(d, 'difference'),
+              prepare_panel(d, 'histogram'),
+              prepare_panel(d[0], 'difference')]
+    path = render_figure(str(tmp_path / 'fig.png'), 'title', panels)
+
+    with open(path, 'rb') as fp:
+        assert fp.read(8) == b'\x89PNG\r\n\x1a\n'
+
+
+def test_render_results(tmp_path, pair):
+    gold, compare = pair
+    gc = GoldFilesCompare(gold_files=[gold], compare_files=[compare],
+                          file_type='netcdf', output_dir=str(tmp_path / 'out'),
+                          only_report_nonzero=True, workers=2,
+                          log_level='ERROR')
+    results = gc.compare()
+    files = gc.render_results(results, plot_original_data=True,
+                              include_hist=True, max_size=8)
+
+    # The same names as plot_results
+    assert sorted(os.path.basename(f) for f in files) == ['x.nc_cnt.png',
+                                                           'x.nc_temp.png']
+    assert all(os.path.getsize(f) > 0 for f in files)
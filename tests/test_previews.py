@@ -0,0 +1,132 @@
+'''
+Tests for goldmeister.previews
+'''
+
+import os
+
+import numpy as np
+import pytest
+
+from goldmeister.compare import GoldFilesCompare
+from goldmeister.previews import (PreviewStore, histogram, pyramid,
+                                  read_previews)
+
+
+def make_difference(seed=0):
+    rng = np.random.RandomState(seed)
+    dd = np.ma.masked_array(rng.normal(size=(2, 100, 130)))
+    dd[:, :10, :10] = np.ma.masked
+    dd[1, 50, 50] = np.nan
+    return dd
+
+
+def test_pyramid():
+    dd = make_difference()
+    levels = pyramid(dd, max_size=64, min_size=16)
+
+    assert [f for f, mean, max_abs in levels] == [3, 6, 12]
+    assert [mean.shape for f, mean, max_abs in levels] == \
+        [(34, 44), (17, 22), (9, 11)]
+
+    # A tile is the mean and largest absolute difference over time
+    factor, mean, max_abs = levels[0]
+    tile = dd[:, 30:33, 60:63]
+    assert mean[10, 20] == pytest.approx(tile.mean(), rel=1e-5)
+    assert max_abs[10, 20] == pytest.approx(np.abs(tile).max(), rel=1e-5)
+
+    # Tiles with nothing finite are NaN
+    assert np.isnan(mean[0, 0]) and np.isnan(max_abs[0, 0])
+
+
+def test_histogram():
+    dd = np.ma.masked_array([0.0, 0.0, 1.0, 2.0, 3.0, np.nan],
+                            mask=[0, 0, 0, 0, 1, 0])
+    counts, edges, zeros = histogram(dd, stats={'min': 0.0, 'max': 2.0},
+                                     bins=4)
+
+    assert zeros == 2
+    assert list(counts) == [0, 0, 1, 1]
+    assert list(edges) == [0, 0.5, 1, 1.5, 2]
+
+
+def write_run(output, keys, seed, close=True):
+    store = PreviewStore(output, max_size=64, min_size=16, sync=True)
+    for n, key in enumerate(keys):
+        store.add(key, make_difference(seed + n), {'max': float(seed)})
+
+    if close:
+        return store.close()
+
+    # A run stopped part way leaves the file open behind it
+    store.ds.close()
+
+
+def test_store_round_trip(tmp_path):
+    path = write_run(str(tmp_path), ['a', 'b'], 0)
+    previews = read_previews(path)
+
+    assert list(previews.keys()) == ['a', 'b']
+    assert previews['a']['shape'] == (2, 100, 130)
+    assert previews['a']['stats'] == {'max': 0.0}
+    assert len(previews['a']['levels']) == 3
+    assert previews['b']['hist_counts'].sum() + previews['b']['zeros'] == \
+        2 * 100 * 130 - 2 * 100 - 1
+
+
+def test_keep(tmp_path):
+    output = str(tmp_path)
+    write_run(output, ['a', 'b'], 0)
+    first = read_previews(os.path.join(output, 'previews.nc'))
+
+    # Only a is redone, b is copied from the previous run
+    store = PreviewStore(output, max_size=64, min_size=16)
+    store.add('a', make_difference(10), {'max': 10.0})
+    store.keep(['b'])
+    path = store.close()
+
+    previews = read_previews(path)
+    assert list(previews.keys()) == ['a', 'b']
+    assert previews['a']['stats'] == {'max': 10.0}
+    np.testing.assert_array_equal(previews['b']['levels'][1][1],
+                                  first['b']['levels'][1][1])
+    assert os.listdir(output) == ['previews.nc']
+
+
+def test_resume_partial(tmp_path):
+    output = str(tmp_path)
+    write_run(output, ['a', 'b'], 0)
+
+    # The second run redoes a and is stopped before it closes the file
+    write_run(output, ['a'], 20, close=False)
+    assert sorted(os.listdir(output)) == ['previews.nc',
+                                          'previews.nc.previous']
+
+    # The newest preview of each key is kept, a from the stopped run
+    store = PreviewStore(output, max_size=64, min_size=16)
+    assert [os.path.basename(p) for p in store.previous] == []
+    store.keep(['a', 'b'])
+    assert [os.path.basename(p) for p in store.previous] == \
+        ['previews.nc.partial0', 'previews.nc.previous']
+    path = store.close()
+
+    previews = read_previews(path)
+    assert previews['a']['stats'] == {'max': 20.0}
+    assert previews['b']['stats'] == {'max': 0.0}
+    assert os.listdir(output) == ['previews.nc']
+
+
+def test_compare_previews(tmp_path, pair):
+    gold, compare = pair
+    output = str(tmp_path / 'out')
+    gc = GoldFilesCompare(gold_files=[gold], compare_files=[compare],
+                          file_type='netcdf', output_dir=output,
+                          previews=True, log_level='ERROR')
+    results = gc.compare()
+
+    previews = read_previews(os.path.join(output, 'previews.nc'))
+
+    # Identical variables have no previews
+    assert sorted(previews.keys()) == ['file-x.nc:cnt', 'file-x.nc:temp']
+    assert previews['file-x.nc:temp']['shape'] == (4, 10, 12)
+    assert previews['file-x.nc:cnt']['stats']['max'] == \
+        results['file-x.nc:cnt']['stats']['max']
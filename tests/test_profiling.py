@@ -0,0 +1,74 @@
+'''
+Tests for goldmeister.profiling
+'''
+
+import json
+
+from goldmeister.compare import GoldFilesCompare
+from goldmeister.profiling import Profiler
+
+
+def test_disabled_profiler_records_nothing():
+    prof = Profiler(enabled=False)
+
+    with prof.stage('read'):
+        pass
+    prof.count('bytes_read', 10)
+
+    assert prof.events == []
+    assert prof.payload() is None
+    assert prof.report().stages == {}
+
+
+def test_merge_worker_payload():
+    worker = Profiler()
+    with worker.stage('difference'):
+        pass
+    worker.count('bytes_read', 10)
+    worker.peak('array_bytes', 5)
+
+    prof = Profiler()
+    prof.count('bytes_read', 1)
+    prof.peak('array_bytes', 7)
+    prof.merge(worker.payload(), key='file-x.nc:temp')
+
+    report = prof.report()
+    assert report.stages['difference']['calls'] == 1
+    assert list(report.variables.keys()) == ['file-x.nc:temp']
+    assert report.counters['bytes_read'] == 11
+    assert report.peaks['array_bytes'] == 7
+
+
+def test_compare_profile(tmp_path, pair):
+    gold, compare = pair
+    gc = GoldFilesCompare(gold_files=[gold], compare_files=[compare],
+                          file_type='netcdf', output_dir=str(tmp_path / 'out'),
+                          profile=True, workers=2, log_level='ERROR')
+    gc.compare()
+    report = gc.profile_report()
+
+    for stage in ['initialize', 'compare', 'read', 'difference']:
+        assert stage in report.stages
+
+    assert 'file-x.nc:temp' in report.variables
+    assert report.counters['bytes_read'] > 0
+
+    report.to_trace(str(tmp_path / 'trace.json'))
+    with open(str(tmp_path / 'trace.json')) as fp:
+        trace = json.load(fp)
+
+    assert all(e['ph'] == 'X' for e in trace['traceEvents'])
+    assert json.loads(report.to_json())['counters'] == report.counters
+
+
+def test_stream_compare_profile(tmp_path, pair):
+    gold, compare = pair
+    gc = GoldFilesCompare(gold_files=[gold], compare_files=[compare],
+                          file_type='netcdf', output_dir=str(tmp_path / 'out'),
+                          streaming=True, profile=True, log_level='ERROR')
+    gc.compare()
+    report = gc.profile_report()
+
+    assert 'stream' in report.stages
+    assert 'file-x.nc:temp' in report.variables
+    assert report.counters['bytes_read'] > 0
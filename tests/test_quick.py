@@ -0,0 +1,49 @@
+'''
+Tests for goldmeister.quick, comparing files without reading their data
+'''
+
+import shutil
+
+from netCDF4 import Dataset
+
+from goldmeister.compare import GoldFilesCompare
+from goldmeister.lazy import DatasetPool
+from goldmeister.quick import quick_compare_files
+
+from .conftest import write_file
+
+
+def test_quick_compare(tmp_path):
+    gold = write_file(str(tmp_path / 'gold.nc'))
+    copy = str(tmp_path / 'copy.nc')
+    shutil.copyfile(gold, copy)
+    changed = write_file(str(tmp_path / 'changed.nc'))
+
+    with Dataset(changed, 'a') as ds:
+        ds.setncattr('history', 'rerun')
+        ds.variables['temp'].setncattr('units', 'K')
+        ds.createVariable('extra', 'f4', ('y',))
+
+    pool = DatasetPool()
+    assert quick_compare_files(gold, copy, pool) == []
+
+    differences = quick_compare_files(gold, changed, pool)
+    pool.close()
+
+    assert 'global attributes differ: history' in differences
+    assert 'temp: attributes differ: units' in differences
+    assert 'extra: not in gold' in differences
+    assert differences[-1].startswith('checksum')
+
+
+def test_quick_ignores_data(tmp_path, pair):
+    gold, compare = pair
+    gc = GoldFilesCompare(gold_files=[gold], compare_files=[compare],
+                          file_type='netcdf', output_dir=str(tmp_path / 'out'),
+                          log_level='ERROR')
+
+    # Only the checksums differ, the structure is the same
+    report = gc.quick_compare()
+    assert list(report.keys()) == ['x.nc']
+    assert len(report['x.nc']) == 1
+    assert report['x.nc'][0].startswith('checksum')
@@ -0,0 +1,138 @@
+'''
+Tests for goldmeister.readers and comparing formats other than netCDF
+'''
+
+import numpy as np
+import pytest
+
+from goldmeister.compare import GoldFilesCompare
+from goldmeister.readers import file_types, get_reader
+
+
+def mkdir(tmp_path, name):
+    path = tmp_path / name
+    path.mkdir(exist_ok=True)
+    return path
+
+
+def compare_stats(tmp_path, gold, compare, file_type, **kwargs):
+    gc = GoldFilesCompare(gold_files=[gold], compare_files=[compare],
+                          file_type=file_type,
+                          output_dir=str(tmp_path / 'out'),
+                          log_level='ERROR', **kwargs)
+    results = gc.compare()
+    gc.close()
+    return {k: v['stats'] for k, v in results.items()}
+
+
+def test_get_reader():
+    assert {'netcdf', 'geotiff', 'zarr', 'csv'} <= set(file_types())
+    assert get_reader('TIF').file_type == 'geotiff'
+
+    with pytest.raises(ValueError):
+        get_reader('grib')
+
+
+def write_tiff(path, data, nodata=-9999.0):
+    rasterio = pytest.importorskip('rasterio')
+    transform = rasterio.transform.from_origin(500000, 4000000, 30, 30)
+
+    with rasterio.open(path, 'w', driver='GTiff', width=data.shape[2],
+                       height=data.shape[1], count=data.shape[0],
+                       dtype='float32', nodata=nodata, tiled=True,
+                       blockxsize=16, blockysize=16, crs='EPSG:32611',
+                       transform=transform) as dst:
+        dst.write(data)
+        dst.set_band_description(1, 'elevation')
+
+    return path
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_geotiff(tmp_path, streaming):
+    data = np.arange(2 * 32 * 48, dtype=np.float32).reshape(2, 32, 48)
+    data[0, 0, 0] = -9999
+    changed = data.copy()
+    changed[1, 20, 30] += 4
+
+    gold = write_tiff(str(mkdir(tmp_path, 'gold') / 'x.tif'), data)
+    compare = write_tiff(str(mkdir(tmp_path, 'compare') / 'x.tif'), changed)
+
+    ds = get_reader('geotiff').open(gold)
+    assert list(ds.variables.keys()) == ['elevation', 'band_2']
+    assert ds.variables['elevation'].chunking() == [16, 16]
+    assert ds.variables['elevation'][0:2, 0:2].mask.tolist() == \
+        [[True, False], [False, False]]
+    ds.close()
+
+    stats = compare_stats(tmp_path, gold, compare, 'geotiff',
+                          streaming=streaming, max_memory=4096)
+
+    assert stats['file-x.tif:band_2']['max'] == 4
+    assert stats['file-x.tif:band_2']['nonzero'] == 1
+    assert stats['file-x.tif:elevation'].get('nonzero', 0) == 0
+
+
+def write_zarr(path, temp):
+    zarr = pytest.importorskip('zarr')
+
+    root = zarr.open_group(path, mode='w')
+    root.attrs['title'] = 'gold'
+    array = root.create_array('temp', shape=temp.shape, chunks=(1, 5, 6),
+                              dtype=temp.dtype)
+    array[:] = temp
+    array.attrs['_ARRAY_DIMENSIONS'] = ['time', 'y', 'x']
+    sub = root.create_group('surface')
+    sub.create_array('snow', shape=(10,), dtype='i4')[:] = np.arange(10)
+
+    return path
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_zarr(tmp_path, streaming):
+    temp = np.ones((4, 10, 12))
+    changed = temp.copy()
+    changed[3, 9, 11] = 2.5
+
+    gold = write_zarr(str(mkdir(tmp_path, 'gold') / 'x.zarr'), temp)
+    compare = write_zarr(str(mkdir(tmp_path, 'compare') / 'x.zarr'), changed)
+
+    ds = get_reader('zarr').open(gold)
+    assert list(ds.variables.keys()) == ['temp', 'surface/snow']
+    assert ds.variables['temp'].dimensions == ('time', 'y', 'x')
+    assert ds.variables['temp'].chunking() == [1, 5, 6]
+    assert ds.getncattr('title') == 'gold'
+    ds.close()
+
+    stats = compare_stats(tmp_path, gold, compare, 'zarr',
+                          streaming=streaming, max_memory=400)
+
+    assert stats['file-x.zarr:temp']['max'] == 1.5
+    assert stats['file-x.zarr:temp']['nonzero'] == 1
+    assert stats['file-x.zarr:surface/snow'].get('nonzero', 0) == 0
+
+
+def test_csv(tmp_path):
+    gold = mkdir(tmp_path, 'gold') / 'x.csv'
+    compare = mkdir(tmp_path, 'compare') / 'x.csv'
+    gold.write_text('date,air temp,flow\n'
+                    '2020-01-01,1.5,10\n'
+                    '2020-01-02,,11\n'
+                    '2020-01-03,3.5,12\n')
+    compare.write_text('date,air temp,flow\n'
+                       '2020-01-01,1.5,10\n'
+                       '2020-01-02,,14\n'
+                       '2020-01-03,3.5,12\n')
+
+    ds = get_reader('csv').open(str(gold))
+    # The text column is left out and empty values are masked
+    assert list(ds.variables.keys()) == ['air temp', 'flow']
+    assert ds.variables['air temp'][:].mask.tolist() == [False, True, False]
+
+    stats = compare_stats(tmp_path, str(gold), str(compare), 'csv')
+
+    assert stats['file-x.csv:flow']['max'] == 3
+    assert stats['file-x.csv:air temp'].get('nonzero', 0) == 0
+
+    with pytest.raises(ValueError):
+        get_reader('csv').open(str(tmp_path))
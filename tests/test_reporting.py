@@ -0,0 +1,70 @@
+'''
+Tests for goldmeister.reporting and the summary logged after a compare
+'''
+
+import logging
+
+import numpy as np
+
+from goldmeister.compare import GoldFilesCompare
+from goldmeister.localize import DifferenceIndex
+from goldmeister.reporting import StatsReport
+
+
+def test_report():
+    report = StatsReport()
+    report.add('file-x.nc:temp', {'max_abs': 1.5, 'mean': 0.25,
+                                  'rmse': 0.5, 'nonzero': 3})
+    report.add('file-x.nc:same', {'max_abs': 0}, identical=True)
+    report.add('file-x.nc:zero', {'max_abs': 0.0, 'nonzero': 0},
+               reported=False)
+
+    index = DifferenceIndex((3, 2, 2))
+    dd = np.ma.masked_array(np.zeros((3, 2, 2)))
+    dd[2, 1, 1] = 1
+    index.add(dd, np.zeros((3, 2, 2)), dd.data)
+    report.add_index('file-x.nc:temp', index)
+
+    assert len(report) == 3
+    assert report.differing() == ['file-x.nc:temp']
+
+    lines = str(report).splitlines()
+    assert lines[0] == '3 variables compared, 1 differ, 1 identical'
+    assert lines[1].split() == ['variable', 'max_abs', 'mean', 'rmse',
+                                'nonzero', 'first_step']
+    assert lines[2].split() == ['file-x.nc:temp', '1.5', '0.25', '0.5', '3',
+                                '2']
+
+    report.clear()
+    assert len(report) == 0
+    assert str(report) == '0 variables compared, 0 differ, 0 identical'
+
+
+def test_summary_logged_once(tmp_path, pair, caplog):
+    gold, compare = pair
+    gc = GoldFilesCompare(gold_files=[gold], compare_files=[compare],
+                          file_type='netcdf',
+                          output_dir=str(tmp_path / 'out'),
+                          log_level='INFO')
+
+    with caplog.at_level(logging.INFO, logger='gold.compare'):
+        gc.compare()
+
+    messages = [r.getMessage() for r in caplog.records]
+    summaries = [m for m in messages if m.startswith('Difference statistics')]
+
+    # One table instead of a block of lines per variable
+    assert len(summaries) == 1
+    assert '3 variables compared, 2 differ, 1 identical' in summaries[0]
+    assert not any('Difference Statistics' in m for m in messages)
+
+
+def test_only_report_nonzero(tmp_path, pair):
+    gold, compare = pair
+    gc = GoldFilesCompare(gold_files=[gold], compare_files=[compare],
+                          file_type='netcdf', output_dir=str(tmp_path / 'out'),
+                          only_report_nonzero=True, log_level='ERROR')
+    results = gc.compare()
+
+    assert sorted(results.keys()) == ['file-x.nc:cnt', 'file-x.nc:temp']
+    assert gc.report.records['file-x.nc:same']['reported'] is False
@@ -0,0 +1,104 @@
+'''
+Tests for goldmeister.results
+'''
+
+import csv
+import json
+
+import numpy as np
+import pytest
+
+from goldmeister.compare import GoldFilesCompare
+from goldmeister.results import split_key
+
+
+def test_split_key():
+    assert split_key('file-gold.nc:precip') == ('gold.nc', 'precip')
+    assert split_key('a:b:c') == ('a:b', 'c')
+
+
+@pytest.fixture
+def table(tmp_path, pair):
+    gold, compare = pair
+    gc = GoldFilesCompare(gold_files=[gold], compare_files=[compare],
+                          file_type='netcdf',
+                          output_dir=str(tmp_path / 'out'),
+                          log_level='ERROR')
+    return gc.results_table(gc.compare())
+
+
+def test_from_results(table):
+    assert len(table) == 3
+    assert table.keys() == ['file-x.nc:temp', 'file-x.nc:cnt',
+                            'file-x.nc:same']
+    assert list(table['variable']) == ['temp', 'cnt', 'same']
+    assert list(table['differs']) == [True, True, False]
+
+    row = table['file-x.nc:cnt']
+    assert row['file'] == 'x.nc'
+    assert row['max_abs'] == 3
+    assert row['nonzero'] == 1
+
+    # Identical data is not read, its differences are zero and the count
+    # is unknown
+    same = table['file-x.nc:same']
+    assert same['max_abs'] == 0
+    assert same['count'] == -1
+
+    with pytest.raises(KeyError):
+        table['file-x.nc:nope']
+
+
+def test_filter_sort(table):
+    assert table.differing().keys() == ['file-x.nc:temp', 'file-x.nc:cnt']
+    assert table.match('te*').keys() == ['file-x.nc:temp']
+    assert table.where(table['max_abs'] > 2.5).keys() == ['file-x.nc:cnt']
+
+    ordered = table.sort('max_abs')
+    assert ordered.keys() == ['file-x.nc:cnt', 'file-x.nc:temp',
+                              'file-x.nc:same']
+    assert table.sort('max_abs', descending=False).keys()[0] == \
+        'file-x.nc:same'
+    assert ordered.head(1).keys() == ['file-x.nc:cnt']
+
+
+def test_keep_entries(tmp_path, pair):
+    gold, compare = pair
+    gc = GoldFilesCompare(gold_files=[gold], compare_files=[compare],
+                          file_type='netcdf',
+                          output_dir=str(tmp_path / 'out'),
+                          log_level='ERROR')
+    results = gc.compare()
+    table = gc.results_table(results, keep_entries=True)
+
+    assert table.differing().entries['file-x.nc:cnt'] is \
+        results['file-x.nc:cnt']
+    table.drop_entries()
+    assert table.entries is None
+
+
+def test_export(tmp_path, table):
+    table.save(str(tmp_path / 'r.csv'))
+    with open(str(tmp_path / 'r.csv')) as fp:
+        rows = list(csv.DictReader(fp))
+    assert [r['variable'] for r in rows] == ['temp', 'cnt', 'same']
+    assert float(rows[1]['max_abs']) == 3
+
+    records = json.loads(table.to_json(str(tmp_path / 'r.json')))
+    assert records[0]['key'] == 'file-x.nc:temp'
+
+    with pytest.raises(ValueError):
+        table.save(str(tmp_path / 'r.txt'))
+
+
+def test_pandas_arrow(tmp_path, table):
+    pd = pytest.importorskip('pandas')
+    df = table.to_pandas()
+    assert isinstance(df, pd.DataFrame)
+    assert list(df['variable']) == ['temp', 'cnt', 'same']
+
+    pq = pytest.importorskip('pyarrow.parquet')
+    path = str(tmp_path / 'r.parquet')
+    table.save(path)
+    np.testing.assert_array_equal(
+        pq.read_table(path).column('max_abs').to_numpy(), table['max_abs'])
@@ -0,0 +1,48 @@
+'''
+Tests for comparing one gold revision against many
+'''
+
+import csv
+import os
+
+import numpy as np
+
+from goldmeister.compare import GoldFilesCompare, GoldRevisionsCompare
+
+
+def test_compare_revisions(tmp_path, git_repo, pair):
+    gold, compare = pair
+    git_repo.branches.local.create('copy', git_repo.head.peel())
+
+    expected = GoldFilesCompare(gold_files=[gold], compare_files=[compare],
+                                file_type='netcdf',
+                                output_dir=str(tmp_path / 'files'),
+                                log_level='ERROR').compare()
+
+    output = str(tmp_path / 'revisions')
+    gc = GoldRevisionsCompare(repo_path=git_repo.workdir,
+                              gold_files=[os.path.join(git_repo.workdir,
+                                                       'x.nc')],
+                              old_branch='main',
+                              new_branches=['feature', 'copy'],
+                              file_type='netcdf', output_dir=output,
+                              log_level='ERROR')
+    summary = gc.compare_revisions()
+
+    assert list(summary.keys()) == ['feature', 'copy']
+
+    for key, stats in summary['feature'].items():
+        np.testing.assert_allclose(stats['max'], expected[key]['stats']['max'])
+
+    # The copy has the same blob as the gold so nothing is read
+    assert gc.identical == set(summary['copy'].keys())
+
+    with open(os.path.join(output, 'summary.csv')) as fp:
+        rows = list(csv.DictReader(fp))
+
+    assert [r['revision'] for r in rows] == ['feature', 'copy']
+    assert [int(r['differing']) for r in rows] == [2, 0]
+    assert rows[0]['largest'] == 'file-x.nc:cnt'
+
+    for revision in ['feature', 'copy']:
+        assert os.path.isfile(os.path.join(output, revision, 'stats.csv'))
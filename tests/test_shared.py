@@ -0,0 +1,114 @@
+'''
+Tests for goldmeister.shared and handing differences between processes
+'''
+
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from goldmeister.compare import GoldFilesCompare
+from goldmeister.shared import (SharedArray, SharedStore, scratch_root,
+                                share_mask)
+
+
+def test_shared_array(tmp_path):
+    handle = SharedArray.create(str(tmp_path / 'a.data'), (3, 4), 'f4')
+    handle.array()[...] = np.arange(12).reshape(3, 4)
+
+    # A pickled handle maps the same file
+    copy = pickle.loads(pickle.dumps(handle))
+    assert type(copy.array()) is np.ndarray
+    np.testing.assert_array_equal(copy.array(),
+                                  np.arange(12).reshape(3, 4))
+    assert copy.nbytes == 48
+
+    empty = SharedArray.create(str(tmp_path / 'e.data'), (0, 4), 'f8')
+    assert empty.array().shape == (0, 4)
+
+
+def test_share_mask(tmp_path):
+    data = SharedArray.create(str(tmp_path / 'v.data'), (5,), 'f8')
+    data.array()[...] = np.arange(5.0)
+    d = np.ma.masked_array(data.array(), mask=[0, 1, 0, 0, 1])
+
+    handle = share_mask(d, data, str(tmp_path / 'v.mask'))
+    shared = pickle.loads(pickle.dumps(handle)).array()
+    assert shared.mask.tolist() == [False, True, False, False, True]
+    assert shared.compressed().tolist() == [0, 2, 3]
+
+    # Nothing is written for data without a mask
+    plain = share_mask(data.array(), data, str(tmp_path / 'p.mask'))
+    assert plain.mask is None
+    assert not os.path.exists(str(tmp_path / 'p.mask'))
+
+
+def test_store(tmp_path):
+    store = SharedStore(str(tmp_path))
+    data = SharedArray.create(store.path(0) + '.data', (4,), 'i8')
+    handle = share_mask(np.ma.masked_array(data.array()), data,
+                        store.path(0) + '.mask')
+    store.add('a', handle)
+
+    mapped = store.get('a').array()
+    mapped[...] = 7
+    assert store.keys() == ['a'] and store.nbytes == 32
+
+    # Mapped arrays outlive their files
+    store.release('a')
+    assert len(store) == 0
+    assert not os.listdir(store.directory)
+    assert mapped.tolist() == [7, 7, 7, 7]
+
+    store.close()
+    assert not os.path.isdir(store.directory)
+
+
+def test_scratch_root(tmp_path):
+    output = str(tmp_path)
+
+    assert scratch_root('memmap', output) == output
+    # Too big for shared memory falls back to the output
+    assert scratch_root('shm', output, nbytes=2 ** 62) == output
+
+    with pytest.raises(ValueError):
+        scratch_root('pipe', output)
+
+
+@pytest.mark.parametrize('shared', ['memmap', 'shm', None])
+def test_compare_shared(tmp_path, pair, shared):
+    gold, compare = pair
+    kwargs = dict(gold_files=[gold], compare_files=[compare],
+                  file_type='netcdf', log_level='ERROR')
+
+    expected = GoldFilesCompare(output_dir=str(tmp_path / 'serial'),
+                                **kwargs).compare()
+
+    output = str(tmp_path / 'out')
+    gc = GoldFilesCompare(output_dir=output, workers=2, shared=shared,
+                          profile=True, **kwargs)
+    results = gc.compare()
+
+    for key, entry in expected.items():
+        np.testing.assert_array_equal(results[key]['difference'],
+                                      entry['difference'])
+        np.testing.assert_array_equal(np.ma.getmaskarray(
+            results[key]['difference']),
+            np.ma.getmaskarray(entry['difference']))
+
+    shared_bytes = gc.profiler.counters.get('bytes_shared', 0)
+    assert (shared_bytes > 0) == (shared is not None)
+
+    # The scratch directory goes with the store
+    gc.close()
+    assert not any(f.startswith('goldmeister-scratch-')
+                   for f in os.listdir(output))
+
+
+def test_bad_backing(tmp_path, pair):
+    gold, compare = pair
+    with pytest.raises(ValueError):
+        GoldFilesCompare(gold_files=[gold], compare_files=[compare],
+                         file_type='netcdf', shared='pipe',
+                         output_dir=str(tmp_path / 'out'), log_level='ERROR')
@@ -0,0 +1,104 @@
+'''
+Tests for goldmeister.statistics
+'''
+
+import numpy as np
+import pytest
+
+from goldmeister.statistics import (RunningStats, describe_difference,
+                                    difference_stats, has_differences,
+                                    identical_stats)
+
+
+def masked_pair(seed=0):
+    rng = np.random.RandomState(seed)
+    gold = rng.normal(size=(3, 8, 9))
+    compare = gold + rng.normal(scale=0.1, size=gold.shape)
+    mask = rng.random_sample(gold.shape) < 0.2
+
+    return (np.ma.masked_array(gold, mask=mask),
+            np.ma.masked_array(compare, mask=mask))
+
+
+def test_difference_stats_matches_get_stats():
+    analysis = pytest.importorskip('spatialnc.analysis')
+    gold, compare = masked_pair()
+
+    dd, stats = difference_stats(gold, compare)
+    expected = analysis.get_stats(compare - gold)
+
+    for k in ['max', 'min', 'mean', 'std']:
+        np.testing.assert_allclose(stats[k], expected[k], rtol=1e-12)
+
+    assert stats['count'] == np.count_nonzero(~gold.mask)
+    np.testing.assert_array_equal(dd.mask, gold.mask)
+
+
+def test_difference_stats_masked_arithmetic():
+    gold, compare = masked_pair(seed=1)
+    dd, stats = difference_stats(gold, compare)
+    expected = compare - gold
+
+    np.testing.assert_allclose(stats['max'], expected.max())
+    np.testing.assert_allclose(stats['min'], expected.min())
+    np.testing.assert_allclose(stats['mean'], expected.mean())
+    np.testing.assert_allclose(stats['std'], expected.std())
+    np.testing.assert_allclose(stats['rmse'],
+                               np.sqrt((expected**2).mean()))
+    assert stats['mask_mismatch'] == 0
+
+
+def test_difference_stats_per_timestep():
+    gold, compare = masked_pair(seed=2)
+    dd, stats = difference_stats(gold, compare, axis=0)
+    expected = compare - gold
+
+    for t in range(gold.shape[0]):
+        np.testing.assert_allclose(stats['max'][t], expected[t].max())
+        np.testing.assert_allclose(stats['mean'][t], expected[t].mean())
+        np.testing.assert_allclose(stats['std'][t], expected[t].std())
+
+    # The same statistics from the difference already computed
+    mask, described = describe_difference(np.ma.getdata(dd), gold, compare,
+                                          axis=0)
+    np.testing.assert_array_equal(mask, np.ma.getmaskarray(dd))
+    for k, v in stats.items():
+        np.testing.assert_allclose(described[k], v, err_msg=k)
+
+
+def test_difference_stats_nan_and_mask_mismatch():
+    gold = np.ma.masked_array([1.0, 2.0, np.nan, 4.0],
+                              mask=[False, False, False, False])
+    compare = np.ma.masked_array([1.0, 3.0, 5.0, 4.0],
+                                 mask=[False, False, False, True])
+    dd, stats = difference_stats(gold, compare)
+
+    assert stats['nan'] == 1
+    assert stats['mask_mismatch'] == 1
+    assert stats['count'] == 2
+    assert stats['max'] == 1.0
+
+
+def test_difference_stats_shape_mismatch():
+    with pytest.raises(ValueError):
+        difference_stats(np.zeros(3), np.zeros(4))
+
+
+def test_running_stats_matches_whole_array():
+    gold, compare = masked_pair(seed=3)
+    expected = difference_stats(gold, compare)[1]
+
+    running = RunningStats()
+    for t in range(gold.shape[0]):
+        running.merge(difference_stats(gold[t], compare[t])[1])
+    stats = running.results()
+
+    for k in ['max', 'min', 'mean', 'std', 'rmse', 'count']:
+        np.testing.assert_allclose(stats[k], expected[k])
+
+
+def test_identical_stats_have_no_differences():
+    assert not has_differences(identical_stats())
+
+    gold, compare = masked_pair()
+    assert has_differences(difference_stats(gold, compare)[1])
@@ -0,0 +1,110 @@
+'''
+Tests for goldmeister.streaming, comparing block by block
+'''
+
+from netCDF4 import Dataset
+import numpy as np
+import pytest
+
+from goldmeister.compare import GoldFilesCompare
+from goldmeister.statistics import difference_stats
+from goldmeister.streaming import iter_blocks, stream_variable
+
+
+@pytest.mark.parametrize('shape, max_elements', [((4, 10, 12), 1000),
+                                                 ((4, 10, 12), 120),
+                                                 ((4, 10, 12), 50),
+                                                 ((4, 10, 12), 7),
+                                                 ((30,), 8)])
+def test_iter_blocks_cover_once(shape, max_elements):
+    seen = np.zeros(shape, dtype=int)
+
+    for block in iter_blocks(shape, max_elements):
+        assert seen[block].size <= max(max_elements, 1)
+        seen[block] += 1
+
+    assert (seen == 1).all()
+
+
+def test_iter_blocks_align_to_chunks():
+    blocks = list(iter_blocks((10, 4, 4), 16 * 5, chunking=[2, 4, 4]))
+
+    assert [b[0] for b in blocks] == [slice(0, 4), slice(4, 8),
+                                      slice(8, 12)]
+
+
+@pytest.mark.parametrize('max_memory', [40 * 10, 40 * 120, 40 * 10**6])
+def test_stream_variable_matches_in_memory(pair, max_memory):
+    gold_f, compare_f = pair
+
+    with Dataset(gold_f) as g, Dataset(compare_f) as c:
+        for name in ['temp', 'cnt']:
+            stats = stream_variable(g.variables[name], c.variables[name],
+                                    max_memory)
+            expected = difference_stats(g.variables[name][:],
+                                        c.variables[name][:])[1]
+
+            for k in ['max', 'min', 'mean', 'std', 'count', 'nonzero']:
+                np.testing.assert_allclose(stats[k], expected[k],
+                                           rtol=1e-10, err_msg=k)
+
+
+def test_stream_variable_shape_mismatch(tmp_path, pair):
+    gold_f = pair[0]
+
+    with Dataset(gold_f) as g:
+        with pytest.raises(ValueError):
+            stream_variable(g.variables['temp'], g.variables['cnt'], 1000)
+
+
+def test_streaming_compare(tmp_path, pair):
+    gold, compare = pair
+    kwargs = dict(gold_files=[gold], compare_files=[compare],
+                  file_type='netcdf', log_level='ERROR')
+
+    expected = GoldFilesCompare(output_dir=str(tmp_path / 'memory'),
+                                **kwargs).compare()
+    results = GoldFilesCompare(output_dir=str(tmp_path / 'streaming'),
+                               streaming=True, max_memory=40 * 50,
+                               **kwargs).compare()
+
+    assert sorted(results.keys()) == sorted(expected.keys())
+
+    for key in ['file-x.nc:temp', 'file-x.nc:cnt']:
+        assert results[key]['difference'] is None
+        for k in ['max', 'min', 'mean', 'std']:
+            np.testing.assert_allclose(results[key]['stats'][k],
+                                       expected[key]['stats'][k],
+                                       rtol=1e-10)
+
+
+def test_stream_variable_nan_parity(tmp_path):
+    rng = np.random.RandomState(0)
+    gold = rng.normal(size=(4, 10, 12))
+    gold[0, :2, :3] = np.nan
+    gold[1, 4, 4] = np.inf
+    gold[3, 5, 5] = np.nan
+    compare = gold.copy()
+    compare[2] += 0.5
+
+    paths = []
+    for name, data in [('gold', gold), ('compare', compare)]:
+        path = str(tmp_path / '{}.nc'.format(name))
+        with Dataset(path, 'w') as ds:
+            for d, n in zip(['time', 'y', 'x'], data.shape):
+                ds.createDimension(d, n)
+            v = ds.createVariable('v', 'f8', ('time', 'y', 'x'),
+                                  fill_value=-9999.0)
+            v[:] = np.ma.masked_array(data, mask=data > 2)
+        paths.append(path)
+
+    # Timesteps 0, 1 and 3 are identical blocks holding the NaNs
+    with Dataset(paths[0]) as g, Dataset(paths[1]) as c:
+        stats = stream_variable(g.variables['v'], c.variables['v'],
+                                8 * 10 * 12)
+        expected = difference_stats(g.variables['v'][:],
+                                    c.variables['v'][:])[1]
+
+    for k in ['max', 'min', 'mean', 'std', 'rmse', 'count', 'nonzero']:
+        np.testing.assert_allclose(stats[k], expected[k], rtol=1e-10,
+                                   err_msg=k)
@@ -0,0 +1,165 @@
+'''
+Tests for goldmeister.subset and comparing part of the data
+'''
+
+import os
+
+from netCDF4 import Dataset
+import numpy as np
+import pytest
+
+from goldmeister.compare import GoldFilesCompare
+from goldmeister.subset import (Subset, compose, match_coordinates, narrow,
+                                parse_date, parse_selection)
+
+
+def test_parse_selection():
+    assert parse_selection('time=0:24') == ('time', (0, 24))
+    assert parse_selection('x=500000.5:') == ('x', (500000.5, None))
+    assert parse_selection('time=2020-10-01:2020-10-02T12') == \
+        ('time', ('2020-10-01', '2020-10-02T12'))
+
+    with pytest.raises(ValueError):
+        parse_selection('time=3')
+
+    assert parse_date('2020-10-01T12').hour == 12
+    with pytest.raises(ValueError):
+        parse_date('yesterday')
+
+
+def test_subset():
+    subset = Subset(isel={'time': (0, 24)}, sel={'x': slice(0, 100)},
+                    align=True)
+    assert subset.isel['time'] == slice(0, 24)
+    assert subset.signature() == 'time=0:24:None;x~0:100;align'
+    assert not Subset()
+    assert Subset().signature() == ''
+
+    with pytest.raises(ValueError):
+        Subset(isel={'time': 3})
+
+    with pytest.raises(ValueError):
+        Subset(isel={'x': slice(0, 2)}, sel={'x': (0, 10)})
+
+
+def test_compose_narrow():
+    selection = (slice(2, 8, 1), slice(0, 10, 2))
+    data = np.arange(100).reshape(10, 10)
+
+    assert np.array_equal(data[compose(selection, (slice(1, 3), 2))],
+                          data[2:8, 0:10:2][1:3, 2])
+    assert np.array_equal(data[compose(selection, Ellipsis)],
+                          data[2:8, 0:10:2])
+    assert narrow(selection, (slice(1, 3),)) == (slice(3, 5, 1),
+                                                 slice(0, 10, 2))
+
+
+def test_match_coordinates():
+    gold = np.arange(0, 10.0)
+    compare = np.arange(4, 16.0) + 1e-6
+
+    assert match_coordinates(gold, compare, 'time') == (slice(4, 10, 1),
+                                                        slice(0, 6, 1))
+
+    with pytest.raises(ValueError):
+        match_coordinates(gold, compare + 100, 'time')
+
+    with pytest.raises(ValueError):
+        match_coordinates(gold, gold[::-1], 'time')
+
+
+def read_temp(path):
+    with Dataset(path) as ds:
+        return ds.variables['temp'][:]
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_isel(tmp_path, pair, streaming):
+    gold, compare = pair
+    results = GoldFilesCompare(gold_files=[gold], compare_files=[compare],
+                               file_type='netcdf',
+                               output_dir=str(tmp_path / 'out'),
+                               isel={'time': slice(2, 4)},
+                               streaming=streaming, max_memory=400,
+                               log_level='ERROR').compare()
+
+    dd = read_temp(compare)[2:4] - read_temp(gold)[2:4]
+    stats = results['file-x.nc:temp']['stats']
+
+    assert stats['count'] == dd.count()
+    assert stats['max'] == pytest.approx(dd.max())
+    assert stats['min'] == pytest.approx(dd.min())
+
+    # Variables without the dimension are compared whole
+    assert results['file-x.nc:cnt']['stats']['max'] == 3
+
+
+def write_series(path, start, n, change=None):
+    '''
+    Hourly temp starting start hours after 2020-01-01, the same values at
+    the same times in every file
+    '''
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with Dataset(path, 'w') as ds:
+        ds.createDimension('time', n)
+        ds.createDimension('x', 3)
+
+        t = ds.createVariable('time', 'f8', ('time',))
+        t.units = 'hours since 2020-01-01'
+        t[:] = np.arange(start, start + n)
+
+        temp = np.arange(start, start + n)[:, None] * np.ones(3)
+        if change is not None:
+            temp[change] += 1
+
+        ds.createVariable('temp', 'f8', ('time', 'x'))[:] = temp
+
+    return path
+
+
+def test_sel_dates(tmp_path):
+    gold = write_series(str(tmp_path / 'gold' / 'x.nc'), 0, 10)
+    compare = write_series(str(tmp_path / 'compare' / 'x.nc'), 0, 10,
+                           change=(1, 0))
+
+    kwargs = dict(gold_files=[gold], compare_files=[compare],
+                  file_type='netcdf', output_dir=str(tmp_path / 'out'),
+                  log_level='ERROR')
+
+    stats = GoldFilesCompare(sel={'time': ('2020-01-01T02', None)},
+                             **kwargs).compare()['file-x.nc:temp']['stats']
+    # The change is before the selection so the data read is identical
+    assert stats['max'] == 0
+    assert stats.get('nonzero', 0) == 0
+
+    stats = GoldFilesCompare(sel={'time': (0, 1)},
+                             **kwargs).compare()['file-x.nc:temp']['stats']
+    assert stats['count'] == 2 * 3
+    assert stats['max'] == 1
+
+    with pytest.raises(ValueError):
+        GoldFilesCompare(sel={'x': (0, 1)}, **kwargs).compare()
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_align(tmp_path, streaming):
+    gold = write_series(str(tmp_path / 'gold' / 'x.nc'), 0, 10)
+    # Runs 4 hours later with a change at hour 6
+    compare = write_series(str(tmp_path / 'compare' / 'x.nc'), 4, 12,
+                           change=(2, 1))
+
+    kwargs = dict(gold_files=[gold], compare_files=[compare],
+                  file_type='netcdf', output_dir=str(tmp_path / 'out'),
+                  streaming=streaming, log_level='ERROR')
+
+    with pytest.raises(ValueError):
+        GoldFilesCompare(**kwargs).compare()
+
+    results = GoldFilesCompare(align=True, **kwargs).compare()
+    stats = results['file-x.nc:temp']['stats']
+
+    # Hours 4 to 9 are shared
+    assert stats['count'] == 6 * 3
+    assert stats['max'] == 1
+    assert stats['nonzero'] == 1
@@ -0,0 +1,131 @@
+'''
+Tests for goldmeister.tolerance
+'''
+
+import numpy as np
+import pytest
+
+from goldmeister.compare import GoldFilesCompare
+from goldmeister.tolerance import (Tolerance, check_variable, find_tolerance,
+                                   summarize_verdicts)
+
+
+@pytest.fixture
+def data():
+    gold = np.linspace(1.0, 100.0, 60, dtype=np.float32).reshape(3, 4, 5)
+    compare = gold.copy()
+    compare[1, 2, 3] += 0.01
+    return gold, compare
+
+
+def test_identical(data):
+    gold, compare = data
+    verdict = check_variable('f:v', gold, gold.copy(), Tolerance())
+
+    assert verdict.passed
+    assert verdict.identical
+
+
+@pytest.mark.parametrize('tol, passed', [(Tolerance(), False),
+                                         (Tolerance(atol=0.02), True),
+                                         (Tolerance(atol=0.005), False),
+                                         (Tolerance(rtol=1e-3), True),
+                                         (Tolerance(rtol=1e-5), False)])
+def test_atol_rtol(data, tol, passed):
+    gold, compare = data
+    verdict = check_variable('f:v', gold, compare, tol)
+
+    assert verdict.passed == passed
+    assert not verdict.identical
+    assert verdict.max_abs == pytest.approx(0.01, rel=1e-3)
+
+    if not passed:
+        assert verdict.violations == 1
+        assert verdict.first_violation == (1, 2, 3)
+
+
+def test_ulp():
+    gold = np.array([1.0, 2.0, 3.0], dtype=np.float32)
+    compare = gold.copy()
+    compare[1] = np.nextafter(np.nextafter(compare[1], np.float32(3)),
+                              np.float32(3))
+
+    assert check_variable('f:v', gold, compare, Tolerance(ulp=2)).passed
+    assert not check_variable('f:v', gold, compare, Tolerance(ulp=1)).passed
+
+    # Across zero the units in the last place are counted through it
+    gold = np.array([-0.0, 0.0], dtype=np.float64)
+    compare = np.array([np.nextafter(0.0, 1.0), np.nextafter(0.0, -1.0)])
+    assert check_variable('f:v', gold, compare, Tolerance(ulp=1)).passed
+
+
+def test_masks_and_nans():
+    gold = np.ma.masked_array([1.0, np.nan, 3.0], mask=[False, False, True])
+    same = np.ma.masked_array([1.0, np.nan, 5.0], mask=[False, False, True])
+    unmasked = np.ma.masked_array([1.0, np.nan, 3.0], mask=False)
+
+    # Only the masked value differs and NaNs in both places are equal
+    assert check_variable('f:v', gold, same, Tolerance()).passed
+
+    verdict = check_variable('f:v', gold, unmasked, Tolerance(atol=1.0))
+    assert not verdict.passed
+    assert verdict.first_violation == (2,)
+
+
+def test_blocks_and_stop_early(data):
+    gold, compare = data
+    compare[2, 0, 0] += 1.0
+
+    verdict = check_variable('f:v', gold, compare, Tolerance(),
+                             max_memory=8 * 20, stop_early=False)
+    assert verdict.violations == 2
+    assert verdict.first_violation == (1, 2, 3)
+    assert verdict.max_abs == pytest.approx(1.0)
+
+    verdict = check_variable('f:v', gold, compare, Tolerance(),
+                             max_memory=8 * 20)
+    assert verdict.violations == 1
+
+
+def test_shape_mismatch():
+    verdict = check_variable('f:v', np.zeros(3), np.zeros(4), Tolerance())
+
+    assert not verdict.passed
+    assert 'shape' in verdict.reason
+
+
+def test_find_tolerance():
+    tolerances = {'precip*': {'atol': 1e-6}, 'file-b.nc:*': Tolerance(ulp=4)}
+
+    assert find_tolerance('file-a.nc:precip_rate', tolerances).atol == 1e-6
+    assert find_tolerance('file-b.nc:temp', tolerances).ulp == 4
+    assert find_tolerance('file-a.nc:temp', tolerances).atol == 0.0
+
+
+def test_summarize_verdicts(data):
+    gold, compare = data
+    verdicts = {k: check_variable(k, gold, c, Tolerance())
+                for k, c in [('f:a', gold), ('f:b', compare)]}
+    passed, failed = summarize_verdicts(verdicts)
+
+    assert not passed
+    assert list(failed.keys()) == ['f:b']
+
+
+def test_verify(tmp_path, pair):
+    gold, compare = pair
+    kwargs = dict(gold_files=[gold], compare_files=[compare],
+                  file_type='netcdf', output_dir=str(tmp_path / 'out'),
+                  log_level='ERROR')
+
+    passed, verdicts = GoldFilesCompare(**kwargs).verify()
+    assert not passed
+    assert verdicts['file-x.nc:same'].identical
+    assert not verdicts['file-x.nc:temp'].passed
+    assert not verdicts['file-x.nc:cnt'].passed
+
+    tolerances = {'temp': {'atol': 2.5}, 'cnt': Tolerance(atol=3)}
+    passed, verdicts = GoldFilesCompare(tolerances=tolerances,
+                                        **kwargs).verify()
+    assert passed
+    assert verdicts['file-x.nc:cnt'].max_abs == 3
@@ -0,0 +1,77 @@
+'''
+Tests for goldmeister.utilities and skipping identical data
+'''
+
+import shutil
+
+import numpy as np
+
+import goldmeister.compare
+from goldmeister.compare import GoldFilesCompare
+from goldmeister.statistics import has_differences
+from goldmeister.utilities import (arrays_identical, content_id,
+                                   files_identical)
+
+
+def test_files_identical(tmp_path, pair):
+    gold, compare = pair
+    copy = str(tmp_path / 'copy.nc')
+    shutil.copyfile(gold, copy)
+
+    assert files_identical(gold, copy)
+    assert content_id(gold) == content_id(copy)
+    assert not files_identical(gold, compare)
+
+
+def test_arrays_identical():
+    a = np.ma.masked_array([1.0, np.nan, 3.0], mask=[0, 0, 1])
+
+    assert arrays_identical(a, a.copy())
+
+    # Masked values are compared by the mask only where it differs
+    b = a.copy()
+    b.mask = [0, 0, 0]
+    assert not arrays_identical(a, b)
+
+    c = a.copy()
+    c[0] = 1.0 + 1e-15
+    assert not arrays_identical(a, c)
+
+    assert not arrays_identical(np.zeros(3), np.zeros(4))
+    assert not arrays_identical(np.zeros(3), np.zeros(3, dtype='f4'))
+
+    # Byte order does not matter
+    big = np.arange(5, dtype='>f8')
+    assert arrays_identical(np.arange(5, dtype='<f8'), big)
+
+
+def test_identical_files_are_not_read(tmp_path, same_pair, monkeypatch):
+    calls = []
+    monkeypatch.setattr(goldmeister.compare, 'difference',
+                        lambda *args: calls.append(args))
+
+    gold, compare = same_pair
+    gc = GoldFilesCompare(gold_files=[gold], compare_files=[compare],
+                          file_type='netcdf', output_dir=str(tmp_path / 'out'),
+                          log_level='ERROR')
+    results = gc.compare()
+
+    assert calls == []
+    assert gc.identical == set(results.keys())
+    assert not any(has_differences(r['stats']) for r in results.values())
+
+
+def test_identical_variables(tmp_path, pair):
+    gold, compare = pair
+    gc = GoldFilesCompare(gold_files=[gold], compare_files=[compare],
+                          file_type='netcdf', output_dir=str(tmp_path / 'out'),
+                          log_level='ERROR')
+    results = gc.compare()
+
+    assert gc.identical == {'file-x.nc:same'}
+    assert not has_differences(results['file-x.nc:same']['stats'])
+
+    # The zeros are masked like the gold
+    dd = results['file-x.nc:same']['difference']
+    assert dd.shape == (10, 12)
+    assert not np.any(dd)